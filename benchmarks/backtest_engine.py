@@ -0,0 +1,85 @@
+"""
+Measures how many candles per second Executor.offline can backtest with the
+event loop engine and the fast engine, for a strategy with one and with
+several listeners on its enter event, and checks that both engines produced
+the same trades.
+
+Usage: python3 backtest_engine.py [candle_count]
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+sys.path.append('../')
+
+from hfstrategy import Strategy, Executor
+from hfstrategy.utils import executor
+from bfxhfindicators import EMA
+
+def write_candles(path, count):
+  random.seed(1)
+  price = 6500.0
+  candles = []
+  for n in range(count):
+    open_price = price
+    price = max(100, price + random.gauss(0, 8))
+    candles += [[1533859200000 + n * 60000, open_price, price,
+                max(open_price, price) + 2, min(open_price, price) - 2, 1]]
+  candles.reverse()
+  with open(path, 'w') as f:
+    json.dump(candles, f)
+
+def create_strategy(listener_count):
+  strategy = Strategy(symbol='tBTCUSD', logLevel='ERROR',
+    indicators={ 'emaS': EMA(20), 'emaL': EMA(100) })
+
+  @strategy.on_enter
+  async def enter(update):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.crossed(emaL.v()):
+      amount = 1 if emaS.v() > emaL.v() else -1
+      await strategy.open_position_market(mtsCreate=update.mts, amount=amount)
+
+  for _ in range(listener_count - 1):
+    async def listener(update):
+      pass
+    strategy.on_enter(listener)
+
+  @strategy.on_update
+  async def update(update, position):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.crossed(emaL.v()):
+      await strategy.close_position_market(mtsCreate=update.mts)
+  return strategy
+
+def run(label, path, engine, listener_count, candle_count):
+  strategy = create_strategy(listener_count)
+  exe = Executor(strategy, timeframe='1m', show_chart=False, engine=engine)
+  start = time.perf_counter()
+  exe.offline(file=path)
+  elapsed = time.perf_counter() - start
+  print("  {:<12} {:>12.0f} candles/sec".format(label, candle_count / elapsed))
+  return [(o.mts_create, o.amount_filled, o.price_avg)
+          for pos in strategy.closedPositions for o in pos.orders.values()]
+
+def main():
+  candle_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+  path = os.path.join(tempfile.mkdtemp(), 'candles.json')
+  write_candles(path, candle_count)
+  # only measure the backtest itself, not the results table
+  executor._finish = lambda *args, **kwargs: None
+  print("{} candles".format(candle_count))
+  for listener_count in [1, 3]:
+    print("{} enter listener(s)".format(listener_count))
+    trades = run('event loop', path, Executor.Engine.EVENT_LOOP,
+                 listener_count, candle_count)
+    fast_trades = run('fast', path, Executor.Engine.FAST,
+                      listener_count, candle_count)
+    print("  {} trades, identical: {}".format(len(trades), trades == fast_trades))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,52 @@
+"""
+Measures how long it takes to read every candle of a json candle file
+compared with a memory-mapped candle file of the same candles, both as rows
+for Executor.offline and as the NumPy array shared by a ParameterSweep.
+
+Usage: python3 candle_file.py [candle_count]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+sys.path.append('../')
+
+from hfstrategy.utils.candle_loader import iter_json_rows
+from hfstrategy.utils.candle_file import CandleFile, json_to_candle_file
+from hfstrategy.utils.executor import _read_candle_file
+
+def measure(name, fn):
+  start = time.perf_counter()
+  fn()
+  print("{:<24} {:>8.3f}s".format(name, time.perf_counter() - start))
+
+def consume(rows):
+  for _ in rows:
+    pass
+
+def main():
+  candle_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  directory = tempfile.mkdtemp()
+  json_path = os.path.join(directory, 'candles.json')
+  path = os.path.join(directory, 'candles.bin')
+  with open(json_path, 'w') as f:
+    json.dump([[(candle_count - i) * 60000, 6000.5, 6001.25, 6010, 5990, 12.345]
+               for i in range(candle_count)], f)
+  start = time.perf_counter()
+  json_to_candle_file(json_path, path, 'tBTCUSD', '1m')
+  print("{} candles, converted in {:.3f}s, json {:.1f} MB, candle file {:.1f} MB".format(
+    candle_count, time.perf_counter() - start, os.path.getsize(json_path) / 1e6,
+    os.path.getsize(path) / 1e6))
+  try:
+    measure('json rows', lambda: consume(iter_json_rows(json_path)))
+    measure('candle file rows', lambda: consume(CandleFile(path).iter_rows()))
+    measure('json array', lambda: _read_candle_file(json_path))
+    measure('candle file array', lambda: CandleFile(path).rows.sum())
+  finally:
+    os.remove(json_path)
+    os.remove(path)
+    os.rmdir(directory)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,53 @@
+"""
+Measures the peak memory and time of loading a candle file with json.load
+and reversing it, compared with streaming it with iter_json_rows.
+
+Usage: python3 candle_loader.py [candle_count] [chunk_size]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+sys.path.append('../')
+
+from hfstrategy.utils.candle_loader import iter_json_rows
+
+def json_load(path):
+  with open(path, 'r') as f:
+    candles = json.load(f)
+  candles.reverse()
+  for _ in candles:
+    pass
+
+def stream(path, chunk_size):
+  for _ in iter_json_rows(path, chunk_size=chunk_size):
+    pass
+
+def measure(name, fn, *args):
+  tracemalloc.start()
+  start = time.perf_counter()
+  fn(*args)
+  elapsed = time.perf_counter() - start
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  print("{:<10} {:>8.2f}s {:>10.1f} MB peak".format(name, elapsed, peak / 1e6))
+
+def main():
+  candle_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1 << 20
+  fd, path = tempfile.mkstemp(suffix='.json')
+  with os.fdopen(fd, 'w') as f:
+    # newest first like the Bitfinex REST api
+    json.dump([[(candle_count - i) * 60000, 6000.5, 6001.25, 6010, 5990, 12.345]
+               for i in range(candle_count)], f)
+  print("{} candles, {:.1f} MB file".format(candle_count, os.path.getsize(path) / 1e6))
+  try:
+    measure('json.load', json_load, path)
+    measure('stream', stream, path, chunk_size)
+  finally:
+    os.remove(path)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,61 @@
+"""
+Measures the insert and range-read rates of the local candle database with
+SQLite's default pragmas compared with DB_PRAGMAS (WAL, synchronous=normal,
+larger cache and mmap).
+
+Usage: python3 database.py [candle_count]
+"""
+import os
+import sys
+import time
+import tempfile
+sys.path.append('../')
+
+from peewee import SqliteDatabase
+
+from hfstrategy.utils import db
+
+def measure(name, count, fn):
+  start = time.perf_counter()
+  fn()
+  elapsed = time.perf_counter() - start
+  print("{:<32} {:>8.3f}s {:>12,.0f} candles/s".format(name, elapsed, count / elapsed))
+
+def consume(rows):
+  for _ in rows:
+    pass
+
+def run(name, path, pragmas, candles):
+  database = SqliteDatabase(path, pragmas=pragmas)
+  with database.bind_ctx([db.Candle]):
+    database.create_tables([db.Candle])
+    count = len(candles)
+    measure(name + ' insert', count, lambda: db.store_candles(candles, 'tBTCUSD', '1m'))
+    measure(name + ' upsert', count, lambda: db.store_candles(candles, 'tBTCUSD', '1m'))
+    measure(name + ' read', count,
+      lambda: consume(db.iter_candles(None, None, 'tBTCUSD', '1m')))
+    measure(name + ' read arrays', count,
+      lambda: consume(db.iter_candle_arrays(None, None, 'tBTCUSD', '1m')))
+    # a tenth of the candles from the middle of the range
+    start = candles[count // 2][0]
+    end = candles[count // 2 + count // 10 - 1][0]
+    measure(name + ' read 10% range', count // 10,
+      lambda: consume(db.iter_candles(start, end, 'tBTCUSD', '1m')))
+  database.close()
+
+def main():
+  candle_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  candles = [((i + 1) * 60000, 6000.5, 6001.25, 6010, 5990, 12.345)
+             for i in range(candle_count)]
+  directory = tempfile.mkdtemp()
+  print("{} candles, batches of {}".format(candle_count, db.STORE_BATCH_SIZE))
+  try:
+    for name, pragmas in [('default', {}), ('tuned', db.DB_PRAGMAS)]:
+      run(name, os.path.join(directory, name + '.db'), pragmas, candles)
+  finally:
+    for file in os.listdir(directory):
+      os.remove(os.path.join(directory, file))
+    os.rmdir(directory)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,58 @@
+"""
+Microbenchmarks for executing strategy events. Compares the old
+asyncio.gather based execution with the EventDispatcher in both
+concurrent and sequential modes for different numbers of listeners.
+
+Usage: python3 event_dispatch.py [emit_count]
+"""
+import sys
+import time
+import asyncio
+sys.path.append('../')
+
+from hfstrategy.strategy.event_dispatcher import EventDispatcher, DispatchMode
+
+async def legacy_execute_events(events, event, *args, **kwargs):
+  # the pre EventDispatcher implementation, kept here for comparison
+  listeners = events.listeners(event)
+  await asyncio.gather(*[f(*args, **kwargs) for f in listeners])
+
+async def coroutine_listener(update):
+  pass
+
+def create_lambda_dispatcher(mode, listener_count):
+  dispatcher = EventDispatcher(mode=mode)
+  for _ in range(listener_count):
+    # register copies so pyee doesn't de-duplicate them
+    dispatcher.on('update', lambda u: coroutine_listener(u))
+  return dispatcher
+
+def create_coroutine_dispatcher(mode, listener_count):
+  dispatcher = EventDispatcher(mode=mode)
+  for _ in range(listener_count):
+    async def listener(update):
+      pass
+    dispatcher.on('update', listener)
+  return dispatcher
+
+async def run(label, execute, emit_count):
+  start = time.perf_counter()
+  for n in range(emit_count):
+    await execute('update', n)
+  elapsed = time.perf_counter() - start
+  print("{:<32} {:>12.0f} emits/sec".format(label, emit_count / elapsed))
+
+async def main():
+  emit_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  for listener_count in [0, 1, 3]:
+    print("{} listener(s)".format(listener_count))
+    legacy = create_coroutine_dispatcher(DispatchMode.CONCURRENT, listener_count)
+    await run('  gather', lambda *a: legacy_execute_events(legacy, *a), emit_count)
+    for mode in [DispatchMode.CONCURRENT, DispatchMode.SEQUENTIAL]:
+      d = create_coroutine_dispatcher(mode, listener_count)
+      await run('  dispatch ' + mode.lower(), d.dispatch, emit_count)
+    d = create_lambda_dispatcher(DispatchMode.SEQUENTIAL, listener_count)
+    await run('  dispatch sequential (lambdas)', d.dispatch, emit_count)
+
+if __name__ == '__main__':
+  asyncio.get_event_loop().run_until_complete(main())
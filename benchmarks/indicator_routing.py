@@ -0,0 +1,61 @@
+"""
+Measures how many ticks per second the strategy can push through its
+indicators using the old per-tick scan and the cached routing table. Trades
+and candles are measured separately since most indicators only subscribe to
+candle data, in which case trades skip them entirely.
+
+Usage: python3 indicator_routing.py [indicator_count] [tick_count]
+"""
+import sys
+import time
+sys.path.append('../')
+
+from hfstrategy import Strategy
+from bfxhfindicators import EMA
+
+def legacy_update_indicator_data(strategy, dataType, data):
+  # the pre routing-table implementation, kept here for comparison
+  for key in strategy.indicators:
+    i = strategy.indicators[key]
+    dt = i.get_data_type()
+    dk = i.get_data_key()
+    if dt == '*' or dt == dataType:
+      if dk == '*':
+        i.update(data)
+      else:
+        d = data.get(dk)
+        if d:
+          i.update(d)
+
+def create_strategy(indicator_count):
+  indicators = {}
+  for n in range(indicator_count):
+    indicators['ema%d' % n] = EMA(10 + n)
+  return Strategy(symbol='tBTCUSD', indicators=indicators, logLevel='ERROR')
+
+def generate_ticks(count):
+  return [{ 'mts': 1533919680000 + n, 'price': 6000 + (n % 100), 'amount': 0.1,
+            'close': 6000 + (n % 100), 'symbol': 'tBTCUSD' } for n in range(count)]
+
+def run(label, dataType, update_fn, ticks):
+  start = time.perf_counter()
+  for t in ticks:
+    update_fn(dataType, t)
+  elapsed = time.perf_counter() - start
+  print("{:<8} {:<8} {:>12.0f} ticks/sec".format(dataType, label, len(ticks) / elapsed))
+
+def main():
+  indicator_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+  tick_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+  ticks = generate_ticks(tick_count)
+  print("{} indicators, {} ticks".format(indicator_count, tick_count))
+
+  for dataType in ['trade', 'candle']:
+    strategy = create_strategy(indicator_count)
+    run('before', dataType,
+        lambda dt, d: legacy_update_indicator_data(strategy, dt, d), ticks)
+    strategy = create_strategy(indicator_count)
+    run('after', dataType, strategy._update_indicator_data, ticks)
+
+if __name__ == '__main__':
+  main()
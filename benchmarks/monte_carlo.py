@@ -0,0 +1,43 @@
+"""
+Measures how long MonteCarlo takes to resample a backtest, compared with
+resampling in a Python loop (timed on a fraction of the runs and scaled up).
+
+Usage: python3 monte_carlo.py [trade_count] [resamples]
+"""
+import sys
+import time
+import random
+sys.path.append('../')
+
+import numpy as np
+from hfstrategy.utils.monte_carlo import MonteCarlo
+
+def python_loop(trades, resamples):
+  # resample and walk each sequence one trade at a time
+  rng = random.Random(1)
+  for _ in range(resamples):
+    balance = peak = drawdown = 0
+    for pl in rng.choices(trades, k=len(trades)):
+      balance += pl
+      peak = max(peak, balance)
+      drawdown = max(drawdown, peak - balance)
+
+def main():
+  trade_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  resamples = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+  trades = np.random.default_rng(1).normal(1, 20, trade_count)
+  print("{} trades, {} resamples".format(trade_count, resamples))
+  sample = max(1, resamples // 100)
+  start = time.perf_counter()
+  python_loop(list(trades), sample)
+  elapsed = (time.perf_counter() - start) * resamples / sample
+  print("  {:<12} {:>8.2f} sec (estimated)".format('python loop', elapsed))
+  for method in [MonteCarlo.Method.BOOTSTRAP, MonteCarlo.Method.SHUFFLE]:
+    start = time.perf_counter()
+    MonteCarlo(trades, resamples=resamples, method=method, seed=1,
+      starting_balance=1000).run()
+    elapsed = time.perf_counter() - start
+    print("  {:<12} {:>8.2f} sec".format(method.lower(), elapsed))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,54 @@
+import sys
+sys.path.append('../')
+
+from hfstrategy import Strategy, ParameterSweep
+from bfxhfindicators import EMA
+
+def create_strategy(emaS, emaL):
+  strategy = Strategy(
+    symbol='tBTCUSD',
+    indicators={
+      'emaL': EMA(emaL),
+      'emaS': EMA(emaS)
+    },
+    exchange_type=Strategy.ExchangeType.EXCHANGE,
+    logLevel='INFO'
+  )
+
+  @strategy.on_enter
+  async def enter(update):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.crossed(emaL.v()):
+      if emaS.v() > emaL.v():
+        await strategy.open_long_position_market(mtsCreate=update.mts, amount=1)
+      else:
+        await strategy.open_short_position_market(mtsCreate=update.mts, amount=1)
+
+  @strategy.on_update_short
+  async def update_short(update, position):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.v() > emaL.v():
+      await strategy.close_position_market(mtsCreate=update.mts)
+
+  @strategy.on_update_long
+  async def update_long(update, position):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.v() < emaL.v():
+      await strategy.close_position_market(mtsCreate=update.mts)
+
+  return strategy
+
+def progress(completed, total, row):
+  print("{}/{} emaS={} emaL={} net P/L {}".format(
+    completed, total, row['emaS'], row['emaL'], round(row['net_pl'], 2)))
+
+if __name__ == '__main__':
+  sweep = ParameterSweep(create_strategy, {
+    'emaS': [10, 20, 30],
+    'emaL': [50, 100, 150, 200]
+  }, timeframe='30m', seed=1)
+  results = sweep.run(file='btc_candle_data.json', on_progress=progress)
+  print(results.sort('net_pl').to_table(limit=10))
@@ -5,5 +5,8 @@ from hfstrategy.strategy.strategy import Strategy
 from hfstrategy.strategy.position_manager import PositionError
 from hfstrategy.strategy.position import Position
 from .utils.executor import Executor
+from .utils.parameter_sweep import ParameterSweep
+from .utils.walk_forward import WalkForward
+from .utils.monte_carlo import MonteCarlo
 
 NAME = 'hfstrategy'
@@ -5,5 +5,7 @@ different data models.
 
 from .events import Events
 from .price_update import PriceUpdate
+from .indicator_values import IndicatorValues
+from .candle_buffer import CandleBuffer
 
 NAME = 'models'
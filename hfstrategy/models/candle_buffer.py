@@ -0,0 +1,152 @@
+"""
+The candle buffer class is a bounded, columnar store of the most recent
+candles for a single symbol and timeframe.
+"""
+import numpy as np
+
+class CandleBuffer:
+  """
+  Fixed capacity ring buffer of candles backed by one NumPy array per column
+  (mts/open/high/low/close/volume). Once full, appending a new candle evicts
+  the oldest one.
+
+  The columns are stored in arrays of twice the capacity and compacted back
+  to the start once the end is reached, so the live window is always
+  contiguous and column(), last() and window() can return views instead of
+  copies. Views are only valid until the next append; copy them if they need
+  to outlive the current tick.
+  """
+  COLUMNS = ('mts', 'open', 'high', 'low', 'close', 'volume')
+
+  def __init__(self, symbol, tf, capacity=10000):
+    if capacity <= 0:
+      raise ValueError('CandleBuffer capacity must be positive')
+    self.symbol = symbol
+    self.tf = tf
+    self.capacity = capacity
+    self._start = 0
+    self._end = 0
+    self._columns = {}
+    for name in self.COLUMNS:
+      dtype = np.int64 if name == 'mts' else np.float64
+      self._columns[name] = np.zeros(capacity * 2, dtype=dtype)
+
+  def _compact(self):
+    size = self._end - self._start
+    for arr in self._columns.values():
+      arr[:size] = arr[self._start:self._end]
+    self._start = 0
+    self._end = size
+
+  def _write(self, index, candle):
+    columns = self._columns
+    for name in self.COLUMNS:
+      columns[name][index] = candle[name]
+
+  def _position(self, index):
+    size = self._end - self._start
+    if index < 0:
+      index += size
+    if index < 0 or index >= size:
+      raise IndexError('CandleBuffer index out of range')
+    return self._start + index
+
+  def append(self, candle):
+    """
+    Add a new candle to the end of the buffer, evicting the oldest candle
+    if the buffer is at capacity.
+
+    @param candle: dict containing mts/open/high/low/close/volume
+    """
+    if self._end - self._start == self.capacity:
+      self._start += 1
+    if self._end == self.capacity * 2:
+      self._compact()
+    self._write(self._end, candle)
+    self._end += 1
+
+  def column(self, name):
+    """
+    Get a read-only view of every buffered value of the given column,
+    ordered oldest to newest.
+
+    @param name: one of CandleBuffer.COLUMNS
+    @return numpy.ndarray
+    """
+    view = self._columns[name][self._start:self._end]
+    view.flags.writeable = False
+    return view
+
+  def last(self, n, name=None):
+    """
+    Get a view of the latest n candles. If a column name is given a single
+    array is returned, otherwise a dict of column name to array.
+
+    @param n: number of candles
+    @param name: optional column name
+    @return numpy.ndarray or dict
+    """
+    n = min(n, len(self))
+    return self.window(len(self) - n, len(self), name=name)
+
+  def window(self, start, stop, name=None):
+    """
+    Get a view of the candles between the start (inclusive) and stop
+    (exclusive) indexes, using the same rules as list slicing.
+
+    @param start: int start index
+    @param stop: int stop index
+    @param name: optional column name
+    @return numpy.ndarray or dict
+    """
+    start, stop, _ = slice(start, stop).indices(len(self))
+    stop = max(start, stop)
+    names = [name] if name else self.COLUMNS
+    views = {}
+    for n in names:
+      view = self._columns[n][self._start + start:self._start + stop]
+      view.flags.writeable = False
+      views[n] = view
+    return views[name] if name else views
+
+  def __getstate__(self):
+    # only keep the buffered candles, not the unused half of the arrays
+    state = self.__dict__.copy()
+    state['_columns'] = { name: self._columns[name][self._start:self._end].copy()
+                          for name in self.COLUMNS }
+    return state
+
+  def __setstate__(self, state):
+    columns = state.pop('_columns')
+    self.__dict__.update(state)
+    size = len(columns['mts'])
+    self._columns = {}
+    for name in self.COLUMNS:
+      arr = np.zeros(self.capacity * 2, dtype=columns[name].dtype)
+      arr[:size] = columns[name]
+      self._columns[name] = arr
+    self._start = 0
+    self._end = size
+
+  def __len__(self):
+    return self._end - self._start
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self)))]
+    pos = self._position(index)
+    candle = { 'symbol': self.symbol, 'tf': self.tf }
+    for name, arr in self._columns.items():
+      candle[name] = arr[pos].item()
+    return candle
+
+  def __setitem__(self, index, candle):
+    self._write(self._position(index), candle)
+
+  def __iter__(self):
+    for i in range(len(self)):
+      yield self[i]
+
+  def __str__(self):
+    return "CandleBuffer <symbol='{}' tf='{}' size={} capacity={}>".format(
+        self.symbol, self.tf, len(self), self.capacity)
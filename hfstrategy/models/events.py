@@ -16,3 +16,4 @@ class Events:
   ON_POSITION_CLOSE = 'on_position_close'
   ON_POSITION_STOP_REACHED = 'on_position_stop_reached'
   ON_POSITION_TARGET_REACHED = 'on_position_target_reached'
+  ON_TIMEFRAME_UPDATE = 'on_timeframe_update'
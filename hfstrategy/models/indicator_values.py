@@ -0,0 +1,47 @@
+"""
+The indicator values class is a read-only view over the strategy indicators
+which is attached to every price update.
+"""
+from collections.abc import Mapping
+
+class IndicatorValues(Mapping):
+  """
+  Lazy, read-only mapping of indicator name to indicator value. The value of
+  an indicator is only resolved (via v()) when its key is accessed, so no work
+  is done for price updates whose handlers never read indicator values.
+
+  The view always reflects the current state of the indicators. Use freeze()
+  to take a stable snapshot that will not change on the next tick.
+  """
+  __slots__ = ('_indicators',)
+
+  def __init__(self, indicators):
+    self._indicators = indicators
+
+  def __getitem__(self, key):
+    return self._indicators[key].v()
+
+  def __iter__(self):
+    return iter(self._indicators)
+
+  def __len__(self):
+    return len(self._indicators)
+
+  def __contains__(self, key):
+    return key in self._indicators
+
+  def freeze(self):
+    """
+    Resolve all of the indicator values into a plain dict
+
+    @return dict
+    """
+    indicators = self._indicators
+    return { key: indicators[key].v() for key in indicators }
+
+  def __reduce__(self):
+    # pickle (i.e strategy checkpoints) as a snapshot of the values
+    return (dict, (self.freeze(),))
+
+  def __str__(self):
+    return "IndicatorValues <{}>".format(', '.join(self._indicators))
@@ -17,7 +17,7 @@ class PriceUpdate:
     self.trade = trade
     self.candle = candle
     self.type = p_type
-    self.i_v = {}
+    self.i_v = None
 
   def is_trade(self):
     """
@@ -37,8 +37,14 @@ class PriceUpdate:
 
   def get_indicator_values(self):
     """
-    Get the indicator values"
+    Get the indicator values. When set by the strategy this is a lazy
+    IndicatorValues view which tracks the live indicators, call
+    freeze_indicator_values() first if a stable snapshot is needed.
+
+    @return IndicatorValues or dict
     """
+    if self.i_v is None:
+      return {}
     return self.i_v
 
   def set_indicator_values(self, i_v):
@@ -47,6 +53,17 @@ class PriceUpdate:
     """
     self.i_v = i_v
 
+  def freeze_indicator_values(self):
+    """
+    Replace the lazy indicator view with a snapshot of the current values so
+    that they stay the same when the indicators receive new data.
+
+    @return dict
+    """
+    if hasattr(self.i_v, 'freeze'):
+      self.i_v = self.i_v.freeze()
+    return self.get_indicator_values()
+
   def __str__(self):
     """
     Make printing pretty
@@ -0,0 +1,120 @@
+TIMEFRAME_MS = {
+  '1m': 60 * 1000,
+  '5m': 5 * 60 * 1000,
+  '15m': 15 * 60 * 1000,
+  '30m': 30 * 60 * 1000,
+  '1h': 60 * 60 * 1000,
+  '3h': 3 * 60 * 60 * 1000,
+  '6h': 6 * 60 * 60 * 1000,
+  '12h': 12 * 60 * 60 * 1000,
+  '1D': 24 * 60 * 60 * 1000,
+}
+
+def timeframe_to_ms(tf):
+  """
+  Get the length of a timeframe in milliseconds. Calendar aligned timeframes
+  such as '7D' or '1M' are not supported since they do not start on a fixed
+  multiple of the epoch.
+
+  @param tf: string timeframe i.e '1h'
+  @return int
+  """
+  if tf not in TIMEFRAME_MS:
+    raise ValueError("Unsupported timeframe '{}', expected one of {}".format(
+      tf, ', '.join(TIMEFRAME_MS)))
+  return TIMEFRAME_MS[tf]
+
+class _Bucket:
+  """ The in-progress candle of a single symbol and timeframe """
+  __slots__ = ('start', 'open', 'high', 'low', 'volume', 'last')
+
+  def __init__(self, start, candle):
+    self.start = start
+    self.open = candle['open']
+    # high/low/volume only hold the base candles before self.last
+    self.high = float('-inf')
+    self.low = float('inf')
+    self.volume = 0
+    self.last = candle
+
+  def merge(self, candle):
+    last = self.last
+    if candle['mts'] != last['mts']:
+      # the previous base candle is complete so fold it in
+      self.high = max(self.high, last['high'])
+      self.low = min(self.low, last['low'])
+      self.volume += last['volume']
+    self.last = candle
+
+  def to_candle(self, symbol, tf):
+    last = self.last
+    return {
+      'mts': self.start,
+      'open': self.open,
+      'close': last['close'],
+      'high': max(self.high, last['high']),
+      'low': min(self.low, last['low']),
+      'volume': self.volume + last['volume'],
+      'symbol': symbol,
+      'tf': tf,
+    }
+
+class CandleAggregator:
+  """
+  Builds higher timeframe candles from a stream of base candles in O(1) per
+  base candle. Repeated base candles with the same mts (i.e live updates of
+  the current candle) replace the previous value instead of being added
+  twice.
+
+  A higher timeframe candle is complete once a base candle belonging to the
+  next period arrives, so the final period is only returned by flush().
+  """
+
+  def __init__(self, timeframes):
+    self.timeframes = [(tf, timeframe_to_ms(tf)) for tf in timeframes]
+    self._buckets = {}
+
+  def add(self, candle):
+    """
+    Add a base candle
+
+    @param candle: dict containing mts/open/close/high/low/volume/symbol
+    @return list of completed higher timeframe candles
+    """
+    symbol = candle['symbol']
+    mts = candle['mts']
+    closed = []
+    for tf, tf_ms in self.timeframes:
+      start = mts - mts % tf_ms
+      key = (symbol, tf)
+      bucket = self._buckets.get(key)
+      if bucket is None or bucket.start < start:
+        if bucket is not None:
+          closed.append(bucket.to_candle(symbol, tf))
+        self._buckets[key] = _Bucket(start, candle)
+      elif bucket.start == start:
+        bucket.merge(candle)
+      # base candles from an older period are ignored
+    return closed
+
+  def current(self, symbol, tf):
+    """
+    Get the in-progress candle of the given symbol and timeframe
+
+    @return dict or None
+    """
+    bucket = self._buckets.get((symbol, tf))
+    if bucket is None:
+      return None
+    return bucket.to_candle(symbol, tf)
+
+  def flush(self):
+    """
+    Complete and return all of the in-progress candles
+
+    @return list of candles
+    """
+    closed = [bucket.to_candle(symbol, tf)
+              for (symbol, tf), bucket in self._buckets.items()]
+    self._buckets = {}
+    return closed
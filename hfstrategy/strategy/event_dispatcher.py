@@ -0,0 +1,88 @@
+import asyncio
+import inspect
+
+from pyee import AsyncIOEventEmitter
+
+class DispatchMode:
+  """ How the strategy runs the listeners of a single event """
+  # run coroutine listeners together via asyncio.gather
+  CONCURRENT = 'CONCURRENT'
+  # await each listener in the order that it was registered
+  SEQUENTIAL = 'SEQUENTIAL'
+
+class EventDispatcher(AsyncIOEventEmitter):
+  """
+  An AsyncIOEventEmitter which can also execute the listeners of an event
+  in-line via dispatch(). The listeners of each event are compiled once into
+  a tuple of (function, is_coroutine) pairs and reused until a listener is
+  added or removed, so emitting an event with zero or one listeners costs no
+  more than calling the listener directly.
+
+  Normal emit() calls (i.e from the bfxapi websocket) are unaffected and are
+  still scheduled by pyee.
+  """
+
+  def __init__(self, mode=DispatchMode.CONCURRENT, loop=None):
+    super(EventDispatcher, self).__init__(loop=loop)
+    self.mode = mode
+    self._compiled = {}
+
+  def _add_event_handler(self, event, k, v):
+    super(EventDispatcher, self)._add_event_handler(event, k, v)
+    self._compiled.pop(event, None)
+
+  def _remove_listener(self, event, f):
+    super(EventDispatcher, self)._remove_listener(event, f)
+    self._compiled.pop(event, None)
+
+  def remove_all_listeners(self, event=None):
+    super(EventDispatcher, self).remove_all_listeners(event)
+    if event is None:
+      self._compiled = {}
+    else:
+      self._compiled.pop(event, None)
+
+  def _compile(self, event):
+    handlers = self._events.get(event)
+    if not handlers:
+      compiled = ()
+    else:
+      # k is the user function, v is the same function or, for once(),
+      # a wrapper which removes itself before calling k
+      compiled = tuple((v, asyncio.iscoroutinefunction(k))
+                       for k, v in handlers.items())
+    self._compiled[event] = compiled
+    return compiled
+
+  async def dispatch(self, event, *args, **kwargs):
+    """
+    Execute all of the listeners of the given event and wait for them
+    to complete.
+
+    @param event: string event name
+    """
+    handlers = self._compiled.get(event)
+    if handlers is None:
+      handlers = self._compile(event)
+    if not handlers:
+      return
+    if len(handlers) == 1 or self.mode == DispatchMode.SEQUENTIAL:
+      for f, is_coroutine in handlers:
+        if is_coroutine:
+          coroutine = f(*args, **kwargs)
+          # None if a once() listener was removed by an earlier listener
+          if coroutine is not None:
+            await coroutine
+        else:
+          result = f(*args, **kwargs)
+          # i.e a lambda or partial wrapping a coroutine
+          if inspect.isawaitable(result):
+            await result
+      return
+    pending = []
+    for f, _ in handlers:
+      result = f(*args, **kwargs)
+      if inspect.isawaitable(result):
+        pending.append(result)
+    if pending:
+      await asyncio.gather(*pending)
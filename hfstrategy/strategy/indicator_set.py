@@ -0,0 +1,103 @@
+from ..models import IndicatorValues
+
+class IndicatorDict(dict):
+  """
+  The dict of indicators of an IndicatorSet. Every change to it clears the
+  routing table of the set so that added or replaced indicators start
+  receiving data. Copies and pickles are plain dicts.
+  """
+
+  def __init__(self, indicators, on_change):
+    super().__init__(indicators)
+    self._on_change = on_change
+
+  def __setitem__(self, key, value):
+    super().__setitem__(key, value)
+    self._on_change()
+
+  def __delitem__(self, key):
+    super().__delitem__(key)
+    self._on_change()
+
+  def pop(self, *args):
+    value = super().pop(*args)
+    self._on_change()
+    return value
+
+  def popitem(self):
+    item = super().popitem()
+    self._on_change()
+    return item
+
+  def setdefault(self, key, default=None):
+    value = super().setdefault(key, default)
+    self._on_change()
+    return value
+
+  def update(self, *args, **kwargs):
+    super().update(*args, **kwargs)
+    self._on_change()
+
+  def clear(self):
+    super().clear()
+    self._on_change()
+
+  def __ior__(self, other):
+    self.update(other)
+    return self
+
+  def __reduce__(self):
+    return (dict, (dict(self),))
+
+class IndicatorSet:
+  """
+  Holds the indicators of a single symbol along with a routing table of
+  data type -> [(indicator, data key)] so that candles and trades are only
+  passed to the indicators that use them. The routing table is built lazily
+  per data type. The indicators are copied into an IndicatorDict which clears
+  the table whenever it is changed.
+  """
+
+  def __init__(self, indicators):
+    self.indicators = IndicatorDict(indicators, self.invalidate)
+    self.values = IndicatorValues(self.indicators)
+    self._routes = {}
+
+  def invalidate(self):
+    self._routes = {}
+
+  def get_routes(self, dataType):
+    routes = self._routes.get(dataType)
+    if routes is None:
+      routes = []
+      for key in self.indicators:
+        i = self.indicators[key]
+        dt = i.get_data_type()
+        if dt == '*' or dt == dataType:
+          routes.append((i, i.get_data_key()))
+      self._routes[dataType] = routes
+    return routes
+
+  def add(self, dataType, data):
+    for i, dk in self.get_routes(dataType):
+      if dk == '*':
+        i.add(data)
+      else:
+        d = data.get(dk)
+        if d:
+          i.add(d)
+
+  def update(self, dataType, data):
+    for i, dk in self.get_routes(dataType):
+      if dk == '*':
+        i.update(data)
+      else:
+        d = data.get(dk)
+        if d:
+          i.update(d)
+
+  def is_ready(self):
+    for key in self.indicators:
+      if not self.indicators[key].ready():
+        return False
+    return True
@@ -66,7 +66,7 @@ class PositionManager(object):
       await self.set_position_exit(position, newEo)
     else:
       # remove stop and target orders
-      await self.remove_position_exit_order()
+      await self.remove_position_exit_order(symbol=position.symbol)
     return position
 
   async def _process_order_closed(self, order):
@@ -152,7 +152,7 @@ class PositionManager(object):
   @logfunc
   async def close_position_market(self, *args, **kwargs):
     orderType = MARKET if self.exchange_type == self.ExchangeType.MARGIN else EXCHANGE_MARKET
-    price = self._market_price()
+    price = self._market_price(kwargs.get('symbol'))
     return await self.close_position(*args, **kwargs, price=price, market_type=orderType)
 
   @logfunc
@@ -197,7 +197,7 @@ class PositionManager(object):
   @logfunc
   async def open_position_market(self, *args, **kwargs):
     orderType = MARKET if self.exchange_type == self.ExchangeType.MARGIN else EXCHANGE_MARKET
-    price = self._market_price()
+    price = self._market_price(kwargs.get('symbol'))
     return await self.open_position(market_type=orderType, price=price, *args, **kwargs)
 
   @logfunc
@@ -274,7 +274,7 @@ class PositionManager(object):
   @logfunc
   async def update_long_position_market(self, *args, **kwargs):
     orderType = MARKET if self.exchange_type == self.ExchangeType.MARGIN else EXCHANGE_MARKET
-    price = self._market_price()
+    price = self._market_price(kwargs.get('symbol'))
     return await self.update_position(market_type=orderType, price=price, *args, **kwargs)
 
   @logfunc
@@ -285,7 +285,7 @@ class PositionManager(object):
   @logfunc
   async def update_position_market(self, *args, **kwargs):
     orderType = MARKET if self.exchange_type == self.ExchangeType.MARGIN else EXCHANGE_MARKET
-    price = self._market_price()
+    price = self._market_price(kwargs.get('symbol'))
     return await self.update_position(market_type=orderType, price=price, *args, **kwargs)
 
   @logfunc
@@ -360,6 +360,15 @@ class PositionManager(object):
     eo = ExitOrder(0, None, None)
     await self.set_position_exit(position, eo)
 
+  async def _resubmit_position_exit(self, position):
+    # forget the current exit order so that set_position_exit submits it again
+    exit_order = position.exit_order
+    position.exit_order = ExitOrder(0, None, None)
+    position.pending_exit_order = None
+    if exit_order and (exit_order.stop or exit_order.target):
+      await self.set_position_exit(position, ExitOrder(exit_order.amount,
+        exit_order.target, exit_order.stop, exit_order.stop_type, exit_order.target_type))
+
   async def set_position_exit(self, position, new_exit_order):
     self.logger.info("Setting new exit position: {}".format(new_exit_order))
     last = self.get_last_price_update(position.symbol)
@@ -449,7 +458,7 @@ class PositionManager(object):
     await self.orderManager.submit_trade(symbol, price, amount, mts_create,
       market_type, *args, **kwargs)
 
-  def _market_price(self):
+  def _market_price(self, symbol=None):
     ## market price does not matter when submitting orders to bfx
     ## but this helps the offline backtests stay in sync
-    return self.get_last_price_update(self.symbol).price
+    return self.get_last_price_update(symbol or self.symbol).price
@@ -1,17 +1,29 @@
+import copy
 import logging
 import math
+import os
+import pickle
 from threading import Thread
 import asyncio
-from pyee import AsyncIOEventEmitter
 
 from .position_manager import PositionManager
 from .position import Position
+from .event_dispatcher import EventDispatcher, DispatchMode
+from .indicator_set import IndicatorSet
+from .candle_aggregator import CandleAggregator
 from ..utils.custom_logger import CustomLogger
-from ..models import Events, PriceUpdate
+from ..models import Events, PriceUpdate, CandleBuffer
+
+CHECKPOINT_VERSION = 1
 
 def candleMarketDataKey(candle):
   return '%s-%s' % (candle['symbol'], candle['tf'])
 
+def _restore_indicators(indicators, saved):
+  for key in saved:
+    if key in indicators:
+      indicators[key].__dict__.update(saved[key].__dict__)
+
 class ExchangeType:
   """ The type of exchange to operate on """
   EXCHANGE = 'EXCHANGE'
@@ -27,6 +39,17 @@ class Strategy(PositionManager):
   *Note: price udates occur whenever that is a new candle or a new public trade has been
   matched on the orderbook
 
+  A single strategy can trade several symbols by passing a list of `symbols`. The
+  `indicators` dict is used as a template: the first symbol uses it as is and every
+  other symbol receives its own deep copy, so each symbol's indicators only see that
+  symbol's candles and trades. Functions which take an optional symbol default to the
+  first one.
+
+  Higher timeframes can be built from the base candle feed by passing `timeframes`,
+  either a list of timeframes or a dict of timeframe to an indicators template. Each
+  completed higher timeframe candle is added to its own indicators and market data
+  and fires the on_timeframe_update event.
+
   @event on_error: an error has occured
   @event on_enter: there is no open position and the price is updated
   @event on_update: there is a price update
@@ -37,22 +60,42 @@ class Strategy(PositionManager):
   @event on_position_close: you had a position open and it has now been closed
   @event on_position_stop_reached: your open position has just reached its stop price
   @event on_position_target_reached: your open position has just reached its target price
+  @event on_timeframe_update: a higher timeframe candle has been completed
   """
   ExchangeType = ExchangeType()
+  DispatchMode = DispatchMode()
 
-  def __init__(self, backtesting=False, symbol='tBTCUSD', indicators={}, logLevel='INFO',
-      exchange_type=ExchangeType.EXCHANGE):
+  def __init__(self, backtesting=False, symbol=None, indicators={}, logLevel='INFO',
+      exchange_type=ExchangeType.EXCHANGE, dispatch_mode=DispatchMode.CONCURRENT,
+      market_data_capacity=10000, symbols=None, timeframes=None):
     self.exchange_type = exchange_type
     self.marketData = {}
+    self.market_data_capacity = market_data_capacity
     self.positions = {}
     self.lastPrice = {}
+    self.lastCandleMts = {}
     self.closedPositions = []
     self.is_ready = False
-    self.indicators = indicators
+    self._restored_checkpoint = False
+    self.symbols = list(symbols or [symbol or 'tBTCUSD'])
+    self.symbol = symbol if symbol in self.symbols else self.symbols[0]
+    self._indicator_sets = {}
+    for sym in self.symbols:
+      sym_indicators = indicators if sym == self.symbol else copy.deepcopy(indicators)
+      self._indicator_sets[sym] = IndicatorSet(sym_indicators)
+    # the set tracks changes to its own copy of the dict
+    self.indicators = self._indicator_sets[self.symbol].indicators
+    # indicators of the aggregated timeframes keyed by (symbol, tf)
+    if timeframes is not None and not isinstance(timeframes, dict):
+      timeframes = { tf: {} for tf in timeframes }
+    self.timeframes = timeframes or {}
+    self._timeframe_indicator_sets = {}
+    for sym in self.symbols:
+      self._add_timeframe_indicator_sets(sym)
+    self._candle_aggregator = CandleAggregator(self.timeframes) if self.timeframes else None
     self.candle_price_key = 'close'
     self.backtesting = backtesting
-    self.symbol = symbol
-    self.events = AsyncIOEventEmitter()
+    self.events = EventDispatcher(mode=dispatch_mode)
     # initialise custom logger
     self.logLevel = logLevel
     self.logger = CustomLogger('HFStrategy', logLevel=logLevel)
@@ -62,81 +105,130 @@ class Strategy(PositionManager):
     await self._execute_events(event, *args, **kwargs)
 
   async def _execute_events(self, event, *args, **kwargs):
-    # get all coroutines that are listening to the event
-    listeners = self.events.listeners(event)
-    # execute them now to avoid pyee scheduling them
-    await asyncio.gather(*[f(*args, **kwargs) for f in listeners])
+    # execute the listeners now to avoid pyee scheduling them
+    await self.events.dispatch(event, *args, **kwargs)
+
+  def _add_timeframe_indicator_sets(self, symbol):
+    for tf in self.timeframes:
+      self._timeframe_indicator_sets[(symbol, tf)] = IndicatorSet(
+        copy.deepcopy(self.timeframes[tf]))
+
+  def _get_indicator_set(self, symbol=None, tf=None):
+    symbol = symbol or self.symbol
+    if tf is not None:
+      return self._timeframe_indicator_sets.get((symbol, tf))
+    iset = self._indicator_sets.get(symbol)
+    # the indicators dict of the default symbol has been swapped out
+    if symbol == self.symbol and iset.indicators is not self.indicators:
+      iset = IndicatorSet(self.indicators)
+      self._indicator_sets[symbol] = iset
+      self.indicators = iset.indicators
+    return iset
 
   def _add_indicator_data(self, dataType, data):
-    for key in self.indicators:
-      i = self.indicators[key]
-      dt = i.get_data_type()
-      dk = i.get_data_key()
-  
-      if dt == '*' or dt == dataType:
-        if dk == '*':
-          i.add(data)
-        else:
-          d = data.get(dk)
-          if d:
-            i.add(d)
+    iset = self._get_indicator_set(data.get('symbol'))
+    if iset:
+      iset.add(dataType, data)
 
   def _update_indicator_data(self, dataType, data):
-    for key in self.indicators:
-      i = self.indicators[key]
-      dt = i.get_data_type()
-      dk = i.get_data_key()
- 
-      if dt == '*' or dt == dataType:
-        if dk == '*':
-          i.update(data)
-        else:
-          d = data.get(dk)
-          if d:
-            i.update(d)
+    iset = self._get_indicator_set(data.get('symbol'))
+    if iset:
+      iset.update(dataType, data)
 
-  def _add_candle_data(self, candle):
+  def _get_candle_buffer(self, candle):
     dataKey = candleMarketDataKey(candle)
-    if dataKey in self.marketData:
-      self.marketData[dataKey].append(candle)
-    else:
-      self.marketData[dataKey] = []
+    buffer = self.marketData.get(dataKey)
+    if buffer is None:
+      buffer = CandleBuffer(candle['symbol'], candle['tf'],
+        capacity=self.market_data_capacity)
+      self.marketData[dataKey] = buffer
+    return buffer
+
+  def _add_candle_data(self, candle):
+    self._get_candle_buffer(candle).append(candle)
 
   def _update_candle_data(self, candle):
-    dataKey = candleMarketDataKey(candle)
-    if dataKey in self.marketData:
-      self.marketData[dataKey][-1] = candle
+    buffer = self._get_candle_buffer(candle)
+    if len(buffer) > 0:
+      buffer[-1] = candle
     else:
-      self.marketData[dataKey] = [candle]
+      buffer.append(candle)
 
   #############################
   #      Private events       #
   #############################
 
   async def _process_new_candle(self, candle):
-    self._add_indicator_data('candle', candle)
-
-    if self.is_indicators_ready():
+    iset = self._get_indicator_set(candle['symbol'])
+    if not iset:
+      return
+    self.lastCandleMts[candle['symbol']] = candle['mts']
+    if self._candle_aggregator:
+      for tf_candle in self._candle_aggregator.add(candle):
+        await self._process_new_timeframe_candle(tf_candle)
+    iset.add('candle', candle)
+
+    if iset.is_ready():
       price = candle[self.candle_price_key]
       pu = PriceUpdate(
         price, candle['symbol'], candle['mts'], PriceUpdate.CANDLE, candle=candle)
-      pu.set_indicator_values(self.get_indicator_values())
+      pu.set_indicator_values(iset.values)
       await self._process_price_update(pu)
 
   async def _process_new_trade(self, trade):
+    iset = self._get_indicator_set(trade['symbol'])
+    if not iset:
+      return
     price = trade['price']
-    self._update_indicator_data('trade', trade)
+    iset.update('trade', trade)
 
-    if self.is_indicators_ready():
+    if iset.is_ready():
       pu = PriceUpdate(
         price, trade['symbol'], trade['mts'], PriceUpdate.TRADE, trade=trade)
-      pu.set_indicator_values(self.get_indicator_values())
+      pu.set_indicator_values(iset.values)
       await self._process_price_update(pu)
 
+  async def _process_new_trades(self, trades):
+    # a batch of trades of a single symbol, the indicators receive every trade
+    # but the handlers are only called once with the latest one
+    if not trades:
+      return
+    trade = trades[-1]
+    iset = self._get_indicator_set(trade['symbol'])
+    if not iset:
+      return
+    for t in trades:
+      iset.update('trade', t)
+
+    if iset.is_ready():
+      pu = PriceUpdate(
+        trade['price'], trade['symbol'], trade['mts'], PriceUpdate.TRADE, trade=trade)
+      pu.set_indicator_values(iset.values)
+      await self._process_price_update(pu)
+
+  async def _process_new_timeframe_candle(self, candle):
+    iset = self._add_timeframe_candle_data(candle)
+    if iset.is_ready():
+      price = candle[self.candle_price_key]
+      pu = PriceUpdate(
+        price, candle['symbol'], candle['mts'], PriceUpdate.CANDLE, candle=candle)
+      pu.set_indicator_values(iset.values)
+      await self._execute_events(Events.ON_TIMEFRAME_UPDATE, pu)
+
+  def _add_timeframe_candle_data(self, candle):
+    iset = self._get_indicator_set(candle['symbol'], candle['tf'])
+    iset.add('candle', candle)
+    self._add_candle_data(candle)
+    return iset
+
   def _process_new_seed_candle(self, candle):
+    if self._candle_aggregator and candle['symbol'] in self._indicator_sets:
+      for tf_candle in self._candle_aggregator.add(candle):
+        self._add_timeframe_candle_data(tf_candle)
     self._add_indicator_data('candle', candle)
-    candle['iv'] = self.get_indicator_values()
     self._add_candle_data(candle)
+    if candle['symbol'] in self._indicator_sets:
+      self.lastCandleMts[candle['symbol']] = candle['mts']
 
   def _process_new_seed_trade(self, trade):
     self._update_indicator_data('trade', trade)
@@ -158,14 +250,14 @@ class Strategy(PositionManager):
         self.logger.info("Stop price reached for position: {}".format(symPosition))
         if symPosition.exit_order.is_stop_market():
           await self.close_position_market(
-            mtsCreate=update.mts, tag="Stop price reached")
+            symbol=update.symbol, mtsCreate=update.mts, tag="Stop price reached")
           return await self._execute_events(
             Events.ON_POSITION_STOP_REACHED, update, symPosition)
       if symPosition.has_reached_target(update):
         self.logger.info("Target price reached for position: {}".format(symPosition))
         if symPosition.exit_order.is_target_market():
           await self.close_position_market(
-            mtsCreate=update.mts, tag="Target price reached")
+            symbol=update.symbol, mtsCreate=update.mts, tag="Target price reached")
           return await self._execute_events(
             Events.ON_POSITION_TARGET_REACHED, update, symPosition)
 
@@ -174,7 +266,15 @@ class Strategy(PositionManager):
       else:
         await self._execute_events(Events.ON_UPDATE_SHORT, update, symPosition)
 
-  def _connected(self):
+  async def _connected(self):
+    if self._restored_checkpoint:
+      # keep the restored positions but their exit orders were cancelled by
+      # the dead man switch when the previous process disconnected
+      self._restored_checkpoint = False
+      self.logger.info("Restored from checkpoint, re-submitting position exit orders.")
+      for position in list(self.positions.values()):
+        await self._resubmit_position_exit(position)
+      return
     # check if there are any positions open
     if len(self.positions.keys()) > 0:
       self.logger.info("New connection detected, resetting strategy positions.")
@@ -209,6 +309,69 @@ class Strategy(PositionManager):
   #      Public Functions    #
   ############################
 
+  def save_checkpoint(self, path):
+    """
+    Save the state of the strategy (positions and their exit orders, indicator
+    state, market data, last prices and the last candle of each symbol) to the
+    given file so that a restarted process can resume with load_checkpoint().
+    The file is written atomically.
+
+    @param path: string file path
+    """
+    state = {
+      'version': CHECKPOINT_VERSION,
+      'symbols': self.symbols,
+      'positions': self.positions,
+      'closedPositions': self.closedPositions,
+      'lastPrice': self.lastPrice,
+      'lastCandleMts': self.lastCandleMts,
+      'marketData': self.marketData,
+      'indicators': { sym: iset.indicators for sym, iset in self._indicator_sets.items() },
+      'timeframeIndicators': { key: iset.indicators for key, iset in
+                               self._timeframe_indicator_sets.items() },
+      'candleAggregator': self._candle_aggregator,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+      pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    self.logger.debug("Checkpoint saved to {}".format(path))
+
+  def load_checkpoint(self, path):
+    """
+    Restore the state saved by save_checkpoint(). Indicator state is copied
+    into the existing indicator instances so references to them stay valid,
+    indicators that are not part of the checkpoint keep their current state.
+    Only load checkpoints that you have written yourself, they are pickles.
+
+    @param path: string file path
+    @return dict of symbol to the mts of the last processed candle, candles
+      newer than this should be replayed
+    """
+    with open(path, 'rb') as f:
+      state = pickle.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+      raise ValueError('Unsupported checkpoint version {}'.format(state.get('version')))
+    for sym, indicators in state['indicators'].items():
+      iset = self._indicator_sets.get(sym)
+      if iset:
+        _restore_indicators(iset.indicators, indicators)
+    for key, indicators in state['timeframeIndicators'].items():
+      iset = self._timeframe_indicator_sets.get(key)
+      if iset:
+        _restore_indicators(iset.indicators, indicators)
+    if self._candle_aggregator and state['candleAggregator']:
+      self._candle_aggregator = state['candleAggregator']
+    self.positions = state['positions']
+    self.closedPositions = state['closedPositions']
+    self.lastPrice = state['lastPrice']
+    self.lastCandleMts = state['lastCandleMts']
+    self.marketData = state['marketData']
+    self._restored_checkpoint = True
+    self.logger.info("Restored checkpoint from {} with {} open positions".format(
+      path, len(self.positions)))
+    return dict(self.lastCandleMts)
+
   def get_last_price_update(self, symbol):
     """
     Get the last received price update
@@ -229,17 +392,43 @@ class Strategy(PositionManager):
     """
     return self.positions.get(symbol)
 
-  def get_indicator_values(self):
-    values = {}
-    for key in self.indicators:
-      values[key] = self.indicators[key].v()
-    return values
+  def get_market_data(self, symbol, tf):
+    """
+    Get the buffered candles of the given symbol and timeframe. Use
+    CandleBuffer.column(), last() or window() to read them as NumPy arrays.
+
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    @param tf: string timeframe i.e '1m'
+    @return CandleBuffer or None
+    """
+    return self.marketData.get(candleMarketDataKey({ 'symbol': symbol, 'tf': tf }))
+
+  def get_indicator_values(self, symbol=None, tf=None):
+    """
+    Get a snapshot of the current value of every indicator
 
-  def is_indicators_ready(self):
-    for key in self.indicators:
-      if not self.indicators[key].ready():
-        return False
-    return True
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    @param tf: optional aggregated timeframe i.e '1h'
+    @return dict
+    """
+    return self._get_indicator_set(symbol, tf).values.freeze()
+
+  def is_indicators_ready(self, symbol=None):
+    """
+    Check if all of the indicators of the given symbol are ready
+
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    @return bool
+    """
+    return self._get_indicator_set(symbol).is_ready()
+
+  def get_symbols(self):
+    """
+    Get all of the symbols traded by the strategy
+
+    @return list
+    """
+    return self.symbols
 
   def on(self, event, func=None):
     """
@@ -266,13 +455,52 @@ class Strategy(PositionManager):
       return self.events.once(event)
     self.events.once(event, func)
 
-  def get_indicators(self):
+  def get_indicators(self, symbol=None, tf=None):
     """
-    Get all indicatios
+    Get all indicatios, changes to the returned dict are picked up on the
+    next candle or trade
   
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    @param tf: optional aggregated timeframe i.e '1h'
     @return dict
     """
-    return self.indicators
+    return self._get_indicator_set(symbol, tf).indicators
+
+  def set_indicators(self, indicators, symbol=None):
+    """
+    Replace all of the indicators used by the strategy for the given
+    symbol. If the symbol is not traded yet it is added to the strategy.
+
+    @param indicators: dict of indicator name to indicator instance
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    """
+    symbol = symbol or self.symbol
+    if symbol not in self.symbols:
+      self.symbols.append(symbol)
+      self._add_timeframe_indicator_sets(symbol)
+    self._indicator_sets[symbol] = IndicatorSet(indicators)
+    if symbol == self.symbol:
+      self.indicators = self._indicator_sets[symbol].indicators
+
+  def add_indicator(self, key, indicator, symbol=None):
+    """
+    Add a new indicator or replace an existing one, the same as setting it
+    in the dict returned by get_indicators().
+
+    @param key: string name of the indicator
+    @param indicator: indicator instance
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    """
+    self._get_indicator_set(symbol).indicators[key] = indicator
+
+  def remove_indicator(self, key, symbol=None):
+    """
+    Remove an indicator from the strategy
+
+    @param key: string name of the indicator
+    @param symbol: string currency pair i.e 'tBTCUSD'
+    """
+    del self._get_indicator_set(symbol).indicators[key]
 
   def is_backtesting(self):
     """
@@ -434,6 +662,22 @@ class Strategy(PositionManager):
       return self.events.on(Events.ON_POSITION_STOP_REACHED)
     self.events.on(Events.ON_POSITION_STOP_REACHED, func)
 
+  def on_timeframe_update(self, func=None):
+    """
+    Subscribe to the on timeframe update event
+
+    This event is fired whenever a candle of one of the aggregated `timeframes`
+    is completed and the indicators of that timeframe are ready. It does not
+    trigger any of the position events.
+    func can be either an asyncio coroutine or a function.
+
+    @event PriceUpdate
+    @param func: called when timeframe update emitted
+    """
+    if not func:
+      return self.events.on(Events.ON_TIMEFRAME_UPDATE)
+    self.events.on(Events.ON_TIMEFRAME_UPDATE, func)
+
   def on_position_target_reached(self, func=None):
     """
     Subscribe to the on position target reached event
@@ -0,0 +1,90 @@
+from .candle_aggregator import timeframe_to_ms
+
+class TradeCandleBuilder:
+  """
+  Builds candles from a stream of public trades so that a strategy can run on
+  trade data alone. Two kinds of bars are supported:
+
+  - time bars: one candle per timeframe period, i.e TradeCandleBuilder(tf='1m').
+    A candle is complete once a trade belonging to the next period arrives and
+    periods without any trades do not produce a candle.
+  - volume bars: a new candle every time the traded volume reaches the given
+    amount, i.e TradeCandleBuilder(volume=10). The trade which crosses the
+    threshold is included whole, it is not split between two candles.
+
+  Volume bars are labelled with the tf 'vol<volume>' and use the mts of their
+  first trade.
+  """
+
+  def __init__(self, tf=None, volume=None):
+    if (tf is None) == (volume is None):
+      raise ValueError("Expected exactly one of 'tf' or 'volume'")
+    self.volume = volume
+    self.tf = tf if tf is not None else 'vol{}'.format(volume)
+    self._tf_ms = timeframe_to_ms(tf) if tf is not None else None
+    self._candles = {}
+
+  def _new_candle(self, mts, trade):
+    price = trade['price']
+    return {
+      'mts': mts,
+      'open': price,
+      'close': price,
+      'high': price,
+      'low': price,
+      'volume': 0,
+      'symbol': trade['symbol'],
+      'tf': self.tf,
+    }
+
+  def add(self, trade):
+    """
+    Add a new trade
+
+    @param trade: dict containing mts/price/amount/symbol
+    @return list of completed candles
+    """
+    symbol = trade['symbol']
+    mts = trade['mts']
+    candle = self._candles.get(symbol)
+    closed = []
+    if self._tf_ms is not None:
+      start = mts - mts % self._tf_ms
+      if candle is not None and candle['mts'] < start:
+        closed.append(candle)
+        candle = None
+      if candle is None:
+        candle = self._new_candle(start, trade)
+        self._candles[symbol] = candle
+    elif candle is None:
+      candle = self._new_candle(mts, trade)
+      self._candles[symbol] = candle
+    price = trade['price']
+    if price > candle['high']:
+      candle['high'] = price
+    elif price < candle['low']:
+      candle['low'] = price
+    candle['close'] = price
+    candle['volume'] += abs(trade['amount'])
+    if self.volume is not None and candle['volume'] >= self.volume:
+      closed.append(candle)
+      del self._candles[symbol]
+    return closed
+
+  def current(self, symbol):
+    """
+    Get the in-progress candle of the given symbol
+
+    @return dict or None
+    """
+    return self._candles.get(symbol)
+
+  def flush(self):
+    """
+    Complete and return all of the in-progress candles
+
+    @return list of candles
+    """
+    closed = list(self._candles.values())
+    self._candles = {}
+    return closed
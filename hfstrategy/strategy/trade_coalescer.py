@@ -0,0 +1,131 @@
+import asyncio
+
+from ..utils.custom_logger import CustomLogger
+
+class CoalesceMode:
+  """ What to do with the trades that arrive during a burst """
+  # pass every trade to the handler in one batch per symbol
+  BATCH = 'BATCH'
+  # only pass the latest trade of each symbol, the rest are dropped
+  LATEST = 'LATEST'
+
+class TradeCoalescer:
+  """
+  Collects trades from the live trades channel and hands them to the handler
+  in batches (one list of trades per symbol) instead of one at a time. A batch
+  is flushed window_ms after its first trade arrived, as soon as max_batch
+  trades are pending, or straight after the previous batch has been handled
+  if trades arrived in the meantime, so the handler never falls more than
+  one batch behind the feed.
+
+  push() is a plain function so that it can be bound directly to the bfxapi
+  'new_trade' event without pyee creating a task per trade.
+
+  The stats dict counts the trades received, the batches handled, the trades
+  merged into another trade's batch and the trades dropped in LATEST mode.
+  """
+  Mode = CoalesceMode()
+
+  def __init__(self, handler=None, window_ms=50, max_batch=500,
+      mode=CoalesceMode.BATCH, logLevel='INFO'):
+    self.handler = handler
+    self.window_ms = window_ms
+    self.max_batch = max_batch
+    self.mode = mode
+    self.stats = { 'received': 0, 'batches': 0, 'merged': 0, 'dropped': 0 }
+    self.logger = CustomLogger('HFTradeCoalescer', logLevel=logLevel)
+    self._pending = {}
+    self._pending_count = 0
+    self._scheduled = None
+    self._flushing = False
+    # flushes started by push() or the window timer, kept until they are done
+    self._tasks = set()
+
+  def push(self, trade):
+    """
+    Queue a new trade
+
+    @param trade: dict containing mts/price/amount/symbol
+    """
+    self.stats['received'] += 1
+    symbol = trade['symbol']
+    pending = self._pending.get(symbol)
+    if pending is None:
+      self._pending[symbol] = [trade]
+      self._pending_count += 1
+    elif self.mode == CoalesceMode.LATEST:
+      pending[0] = trade
+      self.stats['dropped'] += 1
+    else:
+      pending.append(trade)
+      self._pending_count += 1
+    # an active flush will pick the trade up once the current batch is done
+    if self._flushing:
+      return
+    if self._pending_count >= self.max_batch:
+      self._cancel_scheduled()
+      self._start_flush()
+    elif self._scheduled is None:
+      loop = asyncio.get_event_loop()
+      self._scheduled = loop.call_later(self.window_ms / 1000, self._on_window_elapsed)
+
+  def _cancel_scheduled(self):
+    if self._scheduled is not None:
+      self._scheduled.cancel()
+      self._scheduled = None
+
+  def _on_window_elapsed(self):
+    self._scheduled = None
+    self._start_flush()
+
+  def _start_flush(self):
+    task = asyncio.ensure_future(self._run_flush())
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+
+  async def _run_flush(self):
+    try:
+      await self.flush()
+    except Exception as e:
+      self.logger.error("Failed to process trade batch: {}".format(e))
+
+  async def flush(self):
+    """
+    Pass all of the pending trades to the handler now
+    """
+    if self._flushing:
+      return
+    self._flushing = True
+    self._cancel_scheduled()
+    try:
+      while self._pending:
+        pending = self._pending
+        self._pending = {}
+        self._pending_count = 0
+        for trades in pending.values():
+          self.stats['batches'] += 1
+          self.stats['merged'] += len(trades) - 1
+          await self.handler(trades)
+    finally:
+      self._flushing = False
+
+  async def close(self):
+    """
+    Wait for the running flushes and pass the rest of the pending trades
+    to the handler
+    """
+    self._cancel_scheduled()
+    if self._tasks:
+      await asyncio.gather(*self._tasks)
+    await self.flush()
+
+  def stop(self):
+    """
+    Cancel the window and the running flushes, the pending trades are
+    dropped
+    """
+    self._cancel_scheduled()
+    for task in list(self._tasks):
+      task.cancel()
+    self._pending = {}
+    self._pending_count = 0
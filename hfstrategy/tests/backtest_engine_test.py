@@ -0,0 +1,109 @@
+"""
+This script tests that the fast backtest engine produces exactly the same
+trades as running the backtest through the event loop, and that both match
+the trades of the executor before the engines were added
+"""
+import json
+import math
+
+from bfxhfindicators import EMA
+from .. import Strategy
+from ..strategy.position import Position
+from ..utils.executor import Executor, BacktestEngine
+from . import helpers
+
+def write_candles(path, count=600):
+  candles = []
+  for i in range(count):
+    close = 6000 + 300 * math.sin(i / 15) + 40 * math.sin(i / 2)
+    candles += [[(i + 1) * 60000, close - 5, close, close + 10, close - 10, 1]]
+  # same format as the downloaded candle files, newest first
+  candles.reverse()
+  with open(path, 'w') as f:
+    json.dump(candles, f)
+
+def create_strategy():
+  strategy = Strategy(
+    symbol='tBTCUSD',
+    indicators={ 'emaS': EMA(5), 'emaL': EMA(20) },
+    logLevel='ERROR'
+  )
+  updates = []
+
+  @strategy.on_enter
+  async def enter(update):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.crossed(emaL.v()):
+      amount = 1 if emaS.v() > emaL.v() else -1
+      await strategy.open_position_market(mtsCreate=update.mts, amount=amount)
+      await strategy.set_position_stop(
+        update.price - 10 * amount, exit_type=Position.ExitType.MARKET)
+
+  # a second listener so the event loop engine has to gather them
+  @strategy.on_enter
+  async def record(update):
+    updates.append(update.mts)
+
+  @strategy.on_update
+  async def update(update, position):
+    emaS = strategy.get_indicators()['emaS']
+    emaL = strategy.get_indicators()['emaL']
+    if emaS.crossed(emaL.v()):
+      await strategy.close_position_market(mtsCreate=update.mts)
+
+  strategy.entered_updates = updates
+  return strategy
+
+# the fills of write_candles() with create_strategy() from the executor
+# before the engines were added, once its mock order ids were made unique:
+# (minute, amount, price, tag)
+BASELINE_FILLS = [
+  (2, 1, 6039.16, ''), (35, -1, 6191.79, ''),
+  (81, 1, 5785.81, ''), (83, -1, 5775.03, 'Stop price reached'),
+  (132, -1, 6209.53, ''), (133, 1, 6174.41, ''),
+  (178, 1, 5812.35, ''), (223, -1, 6201.89, ''),
+  (224, -1, 6183.67, ''), (269, 1, 5785.81, ''),
+  (270, 1, 5784.21, ''), (272, -1, 5772.4, 'Stop price reached'),
+  (321, -1, 6192.19, ''), (366, 1, 5796.26, ''),
+  (367, 1, 5827.67, ''), (412, -1, 6191.63, ''),
+  (458, 1, 5785.79, ''), (460, -1, 5774.97, 'Stop price reached'),
+  (509, -1, 6209.24, ''), (510, 1, 6174.09, ''),
+  (555, 1, 5812.63, ''), (600, -1, 6201.7, ''),
+]
+# net P/L of each closed position
+BASELINE_POSITIONS = [128.17, -33.9, 10.35, 365.52, 373.92, -34.92, 371.95,
+                      339.92, -33.94, 10.38, 365.04]
+
+def get_trades(strategy):
+  return [(pos.symbol, o.mts_create, o.amount_filled, o.price_avg, o.fee, o.tag)
+          for pos in strategy.closedPositions for o in pos.orders.values()]
+
+def run_backtest(path, engine):
+  strategy = create_strategy()
+  Executor(strategy, timeframe='1m', show_chart=False, engine=engine).offline(file=path)
+  return strategy
+
+def test_fast_engine_matches_event_loop_engine(tmp_path):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path)
+  event_loop = run_backtest(path, BacktestEngine.EVENT_LOOP)
+  fast = run_backtest(path, BacktestEngine.FAST)
+  trades = get_trades(event_loop)
+  assert len(event_loop.closedPositions) > 5
+  assert any(o[5] == 'Stop price reached' for o in trades)
+  assert get_trades(fast) == trades
+  assert fast.entered_updates == event_loop.entered_updates
+  # the dispatch mode is only switched for the duration of the backtest
+  assert fast.events.mode == Strategy.DispatchMode.CONCURRENT
+
+def test_engines_match_baseline(tmp_path):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path)
+  for engine in [BacktestEngine.EVENT_LOOP, BacktestEngine.FAST]:
+    strategy = run_backtest(path, engine)
+    fills = [(o.mts_create // 60000, o.amount_filled, round(o.price_avg, 2), o.tag)
+             for pos in strategy.closedPositions for o in pos.orders.values()]
+    assert fills == BASELINE_FILLS
+    assert [round(pos.get_profit_loss()['net'], 2)
+            for pos in strategy.closedPositions] == BASELINE_POSITIONS
@@ -0,0 +1,46 @@
+"""
+This script tests the statistics collected while a backtest runs
+"""
+import pytest
+
+from ..models import Events
+from ..utils.executor import Executor, BacktestEngine
+from ..utils.backtest_result import BacktestStatistics
+from .backtest_engine_test import write_candles, create_strategy
+
+def test_statistics_are_collected_as_positions_close(tmp_path):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path)
+  strategy = create_strategy()
+  exe = Executor(strategy, timeframe='1m', show_chart=False, engine=BacktestEngine.FAST)
+  result = exe.offline(file=path)
+  positions = result.get_positions()
+  assert len(positions) > 2
+  statistics = result.statistics
+  gross = [p.get_profit_loss()['gross'] for p in positions]
+  assert statistics.positions == len(positions)
+  assert statistics.trades == sum(len(p.orders) for p in positions)
+  assert statistics.net_pl == pytest.approx(sum(p.get_profit_loss()['net'] for p in positions))
+  assert statistics.gross_pl == pytest.approx(sum(gross))
+  assert statistics.min_pl == min(gross + [0])
+  assert statistics.max_pl == max(gross + [0])
+  assert statistics.losses == len([g for g in gross if g < 0])
+  assert result.to_dict()['win_rate'] == statistics.gains / len(positions)
+  # the collector stops listening once the backtest is complete
+  assert strategy.events.listeners(Events.ON_POSITION_CLOSE) == []
+
+def test_max_drawdown():
+  class ClosedPosition:
+    def __init__(self, net):
+      self.net = net
+      self.orders = { 1: None, 2: None }
+      self.total_fees = 0
+      self.volume = 1
+    def get_profit_loss(self):
+      return { 'gross': self.net, 'net': self.net }
+  statistics = BacktestStatistics()
+  for net in [-5, 10, -3, -8, 20, -1]:
+    statistics.add_position(ClosedPosition(net))
+  assert statistics.max_drawdown == 11
+  assert statistics.net_pl == 13
+  assert statistics.get_average_pl() == 13 / 12
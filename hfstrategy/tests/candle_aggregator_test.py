@@ -0,0 +1,91 @@
+"""
+This script tests that higher timeframe candles are built correctly from
+the base candle feed and passed through the strategy
+"""
+import pytest
+
+from bfxhfindicators import EMA
+from .. import Strategy
+from ..models import Events
+from ..strategy.candle_aggregator import CandleAggregator
+from ..utils.executor import _seed_candles
+from .helpers import generate_fake_candle
+
+MINUTE = 60 * 1000
+# aligned to the start of an hour
+START = 1533916800000
+
+def minute_candle(n, open, close, high, low, volume=1, symbol='tBTCUSD'):
+  return generate_fake_candle(mts=START + n * MINUTE, open=open, close=close,
+    high=high, low=low, volume=volume, symbol=symbol, tf='1m')
+
+def test_aggregator_builds_candle_once_next_period_starts():
+  agg = CandleAggregator(['5m'])
+  closed = []
+  for n in range(5):
+    closed += agg.add(minute_candle(n, 10 + n, 11 + n, 20 + n, 5 + n))
+  assert closed == []
+  closed = agg.add(minute_candle(5, 1, 1, 1, 1))
+  assert closed == [{
+    'mts': START, 'open': 10, 'close': 15, 'high': 24, 'low': 5, 'volume': 5,
+    'symbol': 'tBTCUSD', 'tf': '5m'
+  }]
+  assert agg.current('tBTCUSD', '5m')['mts'] == START + 5 * MINUTE
+
+def test_aggregator_replaces_live_updates_of_same_candle():
+  agg = CandleAggregator(['5m'])
+  agg.add(minute_candle(0, 10, 10, 10, 10, volume=1))
+  agg.add(minute_candle(1, 10, 12, 12, 10, volume=1))
+  # live update of the same minute
+  agg.add(minute_candle(1, 10, 11, 13, 9, volume=3))
+  current = agg.current('tBTCUSD', '5m')
+  assert current['close'] == 11
+  assert current['high'] == 13
+  assert current['low'] == 9
+  assert current['volume'] == 4
+
+def test_aggregator_rejects_calendar_timeframes():
+  with pytest.raises(ValueError):
+    CandleAggregator(['1M'])
+
+@pytest.mark.asyncio
+async def test_strategy_feeds_timeframe_indicators_and_events():
+  strategy = Strategy(indicators={ 'ema': EMA(10) },
+                      timeframes={ '5m': { 'ema': EMA(3) } }, logLevel='DEBUG')
+  updates = []
+  async def on_tf_update(update):
+    updates.append(update)
+  strategy.on_timeframe_update(on_tf_update)
+  for n in range(11):
+    await strategy._process_new_candle(minute_candle(n, 100, 100 + n, 100 + n, 100))
+  assert [u.candle['mts'] for u in updates] == [START, START + 5 * MINUTE]
+  assert updates[0].candle['close'] == 104
+  assert strategy.get_indicators(tf='5m')['ema'].l() == 2
+  assert strategy.get_indicators()['ema'].l() == 11
+  assert len(strategy.get_market_data('tBTCUSD', '5m')) == 2
+
+class SeedRest:
+  """ Returns the latest candles newest first, like the Bitfinex api """
+
+  def __init__(self, candles):
+    self.candles = candles
+
+  async def get_seed_candles(self, symbol, tf='1m', start=None, end=None, sort=0):
+    return sorted(self.candles, key=lambda c: c[0], reverse=sort != 1)
+
+class SeedClient:
+  def __init__(self, candles):
+    self.rest = SeedRest(candles)
+
+@pytest.mark.asyncio
+async def test_seed_candles_build_timeframes():
+  strategy = Strategy(indicators={ 'ema': EMA(10) },
+                      timeframes={ '5m': { 'ema': EMA(3) } }, logLevel='ERROR')
+  candles = [[START + n * MINUTE, 100, 100 + n, 100 + n, 100, 1] for n in range(60)]
+  await _seed_candles(strategy, SeedClient(candles), '1m')
+  assert strategy.get_indicators()['ema'].l() == 60
+  # the last 5m candle is still open
+  assert strategy.get_indicators(tf='5m')['ema'].l() == 11
+  market_data = strategy.get_market_data('tBTCUSD', '5m')
+  assert len(market_data) == 11
+  assert strategy.lastCandleMts['tBTCUSD'] == START + 59 * MINUTE
@@ -0,0 +1,49 @@
+"""
+This script tests that the candle buffer evicts old candles, supports
+replacing the latest candle and exposes its columns as views
+"""
+import pytest
+
+from ..models import CandleBuffer
+from .helpers import create_mock_strategy, generate_fake_candle
+
+def test_candle_buffer_evicts_oldest_candles():
+  buffer = CandleBuffer('tBTCUSD', '1m', capacity=3)
+  for mts in range(1, 11):
+    buffer.append(generate_fake_candle(mts=mts, close=mts * 10))
+  assert len(buffer) == 3
+  assert list(buffer.column('mts')) == [8, 9, 10]
+  assert list(buffer.column('close')) == [80, 90, 100]
+  assert buffer[0]['mts'] == 8
+  assert buffer[-1]['symbol'] == 'tBTCUSD'
+
+def test_candle_buffer_last_and_window_are_views():
+  buffer = CandleBuffer('tBTCUSD', '1m', capacity=5)
+  for mts in range(1, 5):
+    buffer.append(generate_fake_candle(mts=mts))
+  last = buffer.last(2, 'mts')
+  assert list(last) == [3, 4]
+  assert last.base is not None
+  window = buffer.window(1, 3)
+  assert list(window['mts']) == [2, 3]
+  assert list(buffer.last(10, 'mts')) == [1, 2, 3, 4]
+  with pytest.raises(ValueError):
+    last[0] = 100
+
+def test_candle_buffer_replace_last():
+  buffer = CandleBuffer('tBTCUSD', '1m', capacity=2)
+  buffer.append(generate_fake_candle(mts=1, close=10))
+  buffer[-1] = generate_fake_candle(mts=1, close=20)
+  assert len(buffer) == 1
+  assert buffer[-1]['close'] == 20
+  with pytest.raises(IndexError):
+    buffer[1] = generate_fake_candle(mts=2)
+
+def test_strategy_market_data_keeps_first_candle():
+  strategy = create_mock_strategy()
+  strategy._process_new_seed_candle(generate_fake_candle(mts=1, tf='1m'))
+  strategy._process_new_seed_candle(generate_fake_candle(mts=2, tf='1m'))
+  strategy._update_candle_data(generate_fake_candle(mts=2, close=1, tf='1m'))
+  candles = strategy.get_market_data('tBTCUSD', '1m')
+  assert list(candles.column('mts')) == [1, 2]
+  assert candles[-1]['close'] == 1
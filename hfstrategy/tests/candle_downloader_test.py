@@ -0,0 +1,124 @@
+"""
+This script tests the candle downloader against a local stand-in for the
+Bitfinex REST candles endpoint
+"""
+import time
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ..utils import db
+from ..utils import candle_downloader
+from ..utils.candle_downloader import CandleDownloader, TokenBucket
+from .helpers import get_stored, MINUTE
+
+class CandlesEndpoint:
+  """
+  Serves 1m candles for every minute except those in no_trades, rejecting
+  the first rejected requests as rate limited
+  """
+
+  def __init__(self, no_trades=(), rejected=0):
+    self.no_trades = no_trades
+    self.rejected = rejected
+    self.requests = []
+    self.in_flight = 0
+    self.max_in_flight = 0
+
+  async def handle(self, request):
+    self.in_flight += 1
+    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    try:
+      await asyncio.sleep(0.01)
+      if self.rejected:
+        self.rejected -= 1
+        return web.Response(status=429, text='["error", 11010, "ratelimit: error"]')
+      assert request.match_info['key'] == 'trade:1m:tBTCUSD'
+      start, end = int(request.query['start']), int(request.query['end'])
+      self.requests.append((start, end))
+      minutes = [m for m in range(start // MINUTE, end // MINUTE + 1)
+                 if m not in self.no_trades]
+      candles = [[m * MINUTE, m, m, m, m, 1] for m in minutes]
+      return web.json_response(candles[:int(request.query['limit'])])
+    finally:
+      self.in_flight -= 1
+
+async def start_endpoint(endpoint):
+  app = web.Application()
+  app.router.add_get('/candles/{key}/hist', endpoint.handle)
+  server = TestServer(app)
+  await server.start_server()
+  return server
+
+def create_downloader(server):
+  return CandleDownloader(rest_host=str(server.make_url('')).rstrip('/'),
+    rate=1000, burst=10, backoff=0.01, page_size=100)
+
+@pytest.mark.asyncio
+async def test_download_missing_candles(test_db):
+  endpoint = CandlesEndpoint(no_trades=range(250, 260), rejected=2)
+  server = await start_endpoint(endpoint)
+  try:
+    downloader = create_downloader(server)
+    await db.fetch_missing_candles(0, 999 * MINUTE, 'tBTCUSD', '1m', downloader)
+    stored = [c[0] // MINUTE for c in get_stored()]
+    assert stored == [m for m in range(1000) if not 250 <= m < 260]
+    # every page was requested once, concurrently
+    assert sorted(endpoint.requests) == [(m * MINUTE, (m + 99) * MINUTE)
+                                         for m in range(0, 1000, 100)]
+    assert endpoint.max_in_flight > 1
+
+    # only the pages of the candles which are missing are fetched again
+    db.Candle.delete().where(db.Candle.mts.between(500 * MINUTE, 520 * MINUTE)).execute()
+    endpoint.requests = []
+    await db.fetch_missing_candles(0, 999 * MINUTE, 'tBTCUSD', '1m', downloader)
+    assert sorted(endpoint.requests) == [(249 * MINUTE, 260 * MINUTE),
+                                         (499 * MINUTE, 521 * MINUTE)]
+    assert len(get_stored()) == 990
+  finally:
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_download_gives_up(test_db):
+  endpoint = CandlesEndpoint(rejected=10)
+  server = await start_endpoint(endpoint)
+  try:
+    downloader = create_downloader(server)
+    downloader.max_retries = 2
+    with pytest.raises(Exception):
+      await db.fetch_candles(0, 99 * MINUTE, 'tBTCUSD', '1m', downloader)
+    assert endpoint.rejected == 7
+  finally:
+    await server.close()
+
+@pytest.mark.asyncio
+async def test_token_bucket():
+  bucket = TokenBucket(rate=100, capacity=2)
+  start = time.monotonic()
+  for _ in range(7):
+    await bucket.acquire()
+  # two tokens are available at once then one every 10ms
+  assert time.monotonic() - start >= 0.045
+
+@pytest.mark.asyncio
+async def test_default_rate_limit(monkeypatch):
+  clock = [0.0]
+  sleep = asyncio.sleep
+
+  async def fake_sleep(delay):
+    clock[0] += delay
+    await sleep(0)
+
+  monkeypatch.setattr(candle_downloader.time, 'monotonic', lambda: clock[0])
+  monkeypatch.setattr(candle_downloader.asyncio, 'sleep', fake_sleep)
+  downloader = CandleDownloader(client=object())
+  requests = []
+  while clock[0] < 120:
+    await downloader.bucket.acquire()
+    requests.append(clock[0])
+  # no more than 30 requests in any minute, starting with the first
+  for start in requests:
+    assert sum(1 for t in requests if start <= t < start + 60) <= 30
+  assert sum(1 for t in requests if t < 60) == 30
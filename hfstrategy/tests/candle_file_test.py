@@ -0,0 +1,80 @@
+"""
+This script tests the memory-mapped binary candle file
+"""
+import json
+import pickle
+
+import pytest
+import numpy as np
+from peewee import SqliteDatabase
+
+from ..utils import db
+from ..utils.candle_file import (CandleFile, is_candle_file, save_candle_file,
+  json_to_candle_file)
+from ..utils.parameter_sweep import ParameterSweep
+from .backtest_engine_test import write_candles, run_backtest, get_trades
+from .parameter_sweep_test import create_strategy, generate_candles
+
+def test_json_file_converts_to_candle_file(tmp_path):
+  json_path = str(tmp_path / 'candles.json')
+  path = str(tmp_path / 'candles.bin')
+  write_candles(json_path, count=100)
+  with open(json_path) as f:
+    candles = sorted(json.load(f))
+  candle_file = json_to_candle_file(json_path, path, 'tBTCUSD', '1m', chunk_size=256)
+  assert is_candle_file(path) and not is_candle_file(json_path)
+  assert (candle_file.symbol, candle_file.tf, len(candle_file)) == ('tBTCUSD', '1m', 100)
+  assert [list(row) for row in candle_file.iter_rows(chunk_size=7)] == candles
+  assert isinstance(candle_file.iter_rows().__next__()[0], int)
+  assert candle_file.column('close').tolist() == [c[2] for c in candles]
+  # the columns are views of the mapped file
+  assert isinstance(candle_file.rows.base, np.memmap)
+  assert not candle_file.rows.flags.writeable
+  copy = pickle.loads(pickle.dumps(candle_file))
+  assert copy.path == path and np.array_equal(copy.rows, candle_file.rows)
+
+def test_invalid_candle_files(tmp_path):
+  path = str(tmp_path / 'candles.bin')
+  with pytest.raises(ValueError):
+    save_candle_file(path, [], 'tBTCUSD' * 10, '1m')
+  assert len(save_candle_file(path, [], 'tBTCUSD', '1m')) == 0
+  with open(path, 'r+b') as f:
+    f.write(b'NOTCANDL')
+  with pytest.raises(ValueError):
+    CandleFile(path)
+
+def test_offline_candle_file_matches_json(tmp_path):
+  json_path = str(tmp_path / 'candles.json')
+  path = str(tmp_path / 'candles.bin')
+  write_candles(json_path)
+  json_to_candle_file(json_path, path, 'tBTCUSD', '1m')
+  expected = get_trades(run_backtest(json_path, 'FAST'))
+  assert len(expected) > 0
+  assert get_trades(run_backtest(path, 'FAST')) == expected
+
+def test_database_export(tmp_path):
+  candles = [[(i + 1) * 60000, 1.5 * i, 2, 3, 1, 10] for i in range(25)]
+  test_db = SqliteDatabase(':memory:')
+  with test_db.bind_ctx([db.Candle]):
+    test_db.create_tables([db.Candle])
+    fields = [db.Candle.mts, db.Candle.open, db.Candle.close, db.Candle.high,
+              db.Candle.low, db.Candle.volume, db.Candle.symbol, db.Candle.tf]
+    db.Candle.insert_many([c + ['tBTCUSD', '1m'] for c in reversed(candles)], fields).execute()
+    db.Candle.insert_many([c + ['tETHUSD', '1m'] for c in candles[:5]], fields).execute()
+    path = str(tmp_path / 'candles.bin')
+    candle_file = db.export_candle_file(path, 'tBTCUSD', '1m', chunk_size=4)
+    assert candle_file.rows.tolist() == candles
+    candle_file = db.export_candle_file(path, 'tBTCUSD', '1m', from_date=120000,
+      end_date=300000)
+    assert [c[0] for c in candle_file.iter_rows()] == [120000, 180000, 240000, 300000]
+
+def test_sweep_workers_map_the_candle_file(tmp_path):
+  candles = generate_candles()
+  path = str(tmp_path / 'candles.bin')
+  save_candle_file(path, candles, 'tBTCUSD', '1m')
+  parameters = { 'emaS': [3, 5], 'emaL': [20] }
+  expected = ParameterSweep(create_strategy, parameters, timeframe='1m',
+    max_workers=2).run(candles=candles)
+  results = ParameterSweep(create_strategy, parameters, timeframe='1m',
+    max_workers=2).run(file=path)
+  assert results.rows == expected.rows
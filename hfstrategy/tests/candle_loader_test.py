@@ -0,0 +1,37 @@
+"""
+This script tests streaming candle and trade files a chunk at a time
+"""
+import json
+
+from ..utils.candle_loader import iter_json_rows, iter_json_row_chunks
+from ..utils.executor import _read_candle_file
+
+def write_json(path, data, indent=None):
+  with open(path, 'w') as f:
+    json.dump(data, f, indent=indent)
+  return str(path)
+
+def test_rows_are_returned_oldest_first(tmp_path):
+  candles = [[(i + 1) * 60000, 100.5 + i, 101, 102.25, 99, 1e-05 * i] for i in range(50)]
+  for indent in [None, 2]:
+    for data in [candles, list(reversed(candles))]:
+      path = write_json(tmp_path / 'candles.json', data, indent)
+      for chunk_size in [1, 7, 64, 1 << 20]:
+        assert list(iter_json_rows(path, chunk_size=chunk_size)) == candles
+
+def test_trades_are_sorted_by_mts(tmp_path):
+  # trade ids are not in mts order so the sort order is taken from the mts
+  trades = [[100 - i, (i + 1) * 1000, 0.5, 6000 + i] for i in range(20)]
+  path = write_json(tmp_path / 'trades.json', list(reversed(trades)))
+  assert list(iter_json_rows(path, key=1, chunk_size=16)) == trades
+  assert list(iter_json_rows(path, key=0, chunk_size=16)) == list(reversed(trades))
+
+def test_chunks_and_empty_files(tmp_path):
+  candles = [[i, 1, 2, 3, 4, 5] for i in range(1000)]
+  path = write_json(tmp_path / 'candles.json', candles)
+  chunks = list(iter_json_row_chunks(path, chunk_size=4096))
+  assert len(chunks) > 1
+  assert _read_candle_file(path).tolist() == candles
+  path = write_json(tmp_path / 'empty.json', [])
+  assert list(iter_json_rows(path)) == []
+  assert _read_candle_file(path).shape == (0, 6)
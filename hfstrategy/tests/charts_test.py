@@ -0,0 +1,40 @@
+"""
+This script tests downsampling and rendering the orders chart
+"""
+import numpy as np
+
+from ..utils.charts import lttb, get_order_markers
+from ..utils.executor import Executor, BacktestEngine
+from .backtest_engine_test import write_candles, create_strategy
+
+def test_lttb_keeps_the_shape():
+  x = np.arange(100000)
+  y = np.sin(x / 5000) + np.random.default_rng(1).normal(0, 0.01, len(x))
+  y[31337] = 5
+  y[77777] = -5
+  kept = lttb(x, y, 500)
+  assert len(kept) == 500
+  assert kept[0] == 0 and kept[-1] == len(x) - 1
+  assert np.all(np.diff(kept) > 0)
+  # spikes are kept
+  assert 31337 in kept and 77777 in kept
+  assert lttb(x[:10], y[:10], 500).tolist() == list(range(10))
+
+def test_chart_is_saved_without_a_display(tmp_path):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path)
+  for extension in ['png', 'svg']:
+    strategy = create_strategy()
+    chart = str(tmp_path / ('chart.' + extension))
+    Executor(strategy, timeframe='1m', engine=BacktestEngine.FAST, trade_summary=0,
+      chart_file=chart).offline(file=path)
+    with open(chart, 'rb') as f:
+      header = f.read(64)
+    if extension == 'png':
+      assert header.startswith(b'\x89PNG')
+    else:
+      assert header.startswith(b'<?xml')
+  markers = get_order_markers(strategy)
+  assert len(markers['close'][0]) == len(strategy.closedPositions)
+  assert sum(len(m[0]) for m in markers.values()) == sum(
+    len(p.orders) for p in strategy.closedPositions)
@@ -0,0 +1,52 @@
+"""
+This script tests that the strategy state can be saved to a checkpoint
+and restored into a new strategy instance
+"""
+import pytest
+
+from bfxhfindicators import EMA
+from ..strategy.position import Position
+from .helpers import create_mock_strategy, generate_fake_candle
+
+def create_strategy():
+  return create_mock_strategy(indicators={ 'ema': EMA(10) })
+
+@pytest.mark.asyncio
+async def test_checkpoint_restores_positions_and_indicators(tmp_path):
+  path = str(tmp_path / 'strategy.checkpoint')
+  strategy = create_strategy()
+  strategy._process_new_seed_candle(generate_fake_candle(mts=1000, close=6000, tf='1m'))
+  await strategy._process_new_candle(generate_fake_candle(mts=2000, close=6100, tf='1m'))
+  await strategy.open_long_position_market(mtsCreate=2000, amount=1)
+  await strategy.set_position_stop(5000, exit_type=Position.ExitType.MARKET)
+  strategy.save_checkpoint(path)
+
+  restored = create_strategy()
+  ema = restored.get_indicators()['ema']
+  resume_from = restored.load_checkpoint(path)
+  assert resume_from == { 'tBTCUSD': 2000 }
+  # the indicator instance is kept but its state is restored
+  assert restored.get_indicators()['ema'] is ema
+  assert ema.v() == strategy.get_indicators()['ema'].v()
+  position = restored.get_position('tBTCUSD')
+  assert position.amount == 1
+  assert position.exit_order.stop == 5000
+  assert list(restored.get_market_data('tBTCUSD', '1m').column('mts')) == [1000]
+  assert restored.get_last_price_update('tBTCUSD').get_indicator_values() == {
+    'ema': ema.v() }
+
+@pytest.mark.asyncio
+async def test_restored_strategy_keeps_positions_on_connect(tmp_path):
+  path = str(tmp_path / 'strategy.checkpoint')
+  strategy = create_strategy()
+  await strategy._process_new_candle(generate_fake_candle(mts=2000, close=6100))
+  await strategy.open_long_position_market(mtsCreate=2000, amount=1)
+  strategy.save_checkpoint(path)
+
+  restored = create_strategy()
+  restored.load_checkpoint(path)
+  await restored._connected()
+  assert restored.get_position('tBTCUSD') is not None
+  # a later reconnect resets as before
+  await restored._connected()
+  assert restored.get_position('tBTCUSD') is None
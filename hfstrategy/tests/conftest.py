@@ -0,0 +1,15 @@
+"""
+Fixtures shared by the tests
+"""
+import pytest
+from peewee import SqliteDatabase
+
+from ..utils import db
+
+@pytest.fixture
+def test_db():
+  """ An in-memory candle database bound to the Candle model """
+  test_db = SqliteDatabase(':memory:')
+  with test_db.bind_ctx([db.Candle]):
+    test_db.create_tables([db.Candle])
+    yield test_db
@@ -0,0 +1,139 @@
+"""
+This script tests the local candle database
+"""
+import pytest
+import numpy as np
+from peewee import SqliteDatabase, IntegrityError
+
+from .. import Strategy
+from ..utils import db
+from ..utils.executor import Executor
+from .helpers import MINUTE, insert_candles, get_stored
+
+@pytest.mark.parametrize('window_functions', [True, False])
+def test_fetched_intervals(test_db, monkeypatch, window_functions):
+  monkeypatch.setattr(db, 'SQLITE_WINDOW_FUNCTIONS', window_functions)
+  insert_candles([m * MINUTE for m in list(range(10, 20)) + [25, 26] + list(range(40, 45))])
+  # other symbols and timeframes fill the gaps but are not counted
+  insert_candles([m * MINUTE for m in range(0, 60)], symbol='tETHUSD')
+  insert_candles([m * MINUTE for m in range(0, 60)], tf='5m')
+  intervals = db.find_fetched_candles_intervals('tBTCUSD', '1m')
+  assert intervals == [
+    {'start': 10 * MINUTE, 'end': 19 * MINUTE},
+    {'start': 25 * MINUTE, 'end': 26 * MINUTE},
+    {'start': 40 * MINUTE, 'end': 44 * MINUTE},
+  ]
+  intervals = db.find_fetched_candles_intervals('tBTCUSD', '1m', 15 * MINUTE, 41 * MINUTE)
+  assert intervals == [
+    {'start': 15 * MINUTE, 'end': 19 * MINUTE},
+    {'start': 25 * MINUTE, 'end': 26 * MINUTE},
+    {'start': 40 * MINUTE, 'end': 41 * MINUTE},
+  ]
+  assert db.find_fetched_candles_intervals('tLTCUSD', '1m') == []
+
+def test_missing_intervals(test_db):
+  insert_candles([m * MINUTE for m in list(range(10, 20)) + list(range(40, 45))])
+  missing = db.get_missing_candles_intervals(0, 60 * MINUTE, 'tBTCUSD', '1m')
+  assert missing == [
+    {'start': 0, 'end': 10 * MINUTE},
+    {'start': 19 * MINUTE, 'end': 40 * MINUTE},
+    {'start': 44 * MINUTE, 'end': 60 * MINUTE},
+  ]
+  assert db.get_missing_candles_intervals(11 * MINUTE, 18 * MINUTE, 'tBTCUSD', '1m') == []
+  missing = db.get_missing_candles_intervals(0, 60 * MINUTE, 'tETHUSD', '1m')
+  assert missing == [{'start': 0, 'end': 60 * MINUTE}]
+
+def test_fetched_intervals_use_index(test_db):
+  sql = 'EXPLAIN QUERY PLAN ' + db.CANDLE_GAPS_SQL.format(
+    table=db.Candle._meta.table_name)
+  plan = test_db.execute_sql(sql, ('tBTCUSD', '1m', 0, 1, MINUTE)).fetchall()
+  assert any('COVERING INDEX' in row[-1] for row in plan)
+
+def test_store_candles_upserts(test_db):
+  candles = [[m * MINUTE, 1, 2, 3, 1, 10] for m in range(10)]
+  db.store_candles(candles, 'tBTCUSD', '1m')
+  db.store_candles(candles[5:] + [[10 * MINUTE, 1, 2, 3, 1, 10]], 'tBTCUSD', '1m')
+  db.store_candles(candles[:2], 'tETHUSD', '1m')
+  assert len(get_stored()) == 11 and len(get_stored('tETHUSD')) == 2
+  db.store_candles([[9 * MINUTE, 5, 5, 5, 5, 5]], 'tBTCUSD', '1m',
+    on_conflict=db.ConflictResolution.IGNORE)
+  assert get_stored()[9] == candles[9]
+  db.store_candles([[9 * MINUTE, 5, 5, 5, 5, 5]], 'tBTCUSD', '1m')
+  assert get_stored()[9] == [9 * MINUTE, 5, 5, 5, 5, 5]
+  with pytest.raises(ValueError):
+    db.store_candles(candles, 'tBTCUSD', '1m', on_conflict='ROLLBACK')
+
+def test_deduplicate_candles(test_db):
+  test_db.execute_sql('DROP INDEX candle_symbol_tf_mts')
+  test_db.execute_sql('CREATE INDEX candle_symbol_tf_mts ON candle (symbol, tf, mts)')
+  insert_candles([m * MINUTE for m in range(10)])
+  insert_candles([m * MINUTE for m in range(5, 15)])
+  insert_candles([m * MINUTE for m in range(5)], symbol='tETHUSD')
+  assert db.deduplicate_candles(test_db) == 5
+  assert [c[0] for c in get_stored()] == [m * MINUTE for m in range(15)]
+  assert len(get_stored('tETHUSD')) == 5
+  assert db.deduplicate_candles(test_db) == 0
+  with pytest.raises(IntegrityError):
+    insert_candles([0])
+  # range queries are seeks on the unique index
+  query = db.Candle.select(db.Candle.mts).where(db.Candle.symbol == 'tBTCUSD',
+    db.Candle.tf == '1m', db.Candle.mts.between(0, MINUTE))
+  sql, params = query.sql()
+  plan = test_db.execute_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+  assert any('COVERING INDEX candle_symbol_tf_mts' in row[-1] for row in plan)
+
+def test_stream_candles(test_db):
+  candles = [(m * MINUTE, m + 0.5, 2.0, 3.0, 1.0, 10.0) for m in range(25)]
+  db.store_candles(list(reversed(candles)), 'tBTCUSD', '1m')
+  db.store_candles(candles[:5], 'tETHUSD', '1m')
+  batches = list(db.iter_candle_batches(None, None, 'tBTCUSD', '1m', batch_size=10))
+  assert [len(b) for b in batches] == [10, 10, 5]
+  assert list(db.iter_candles(2 * MINUTE, 4 * MINUTE, 'tBTCUSD', '1m')) == candles[2:5]
+  arrays = list(db.iter_candle_arrays(0, 30 * MINUTE, 'tBTCUSD', '1m', batch_size=20))
+  assert [a.shape for a in arrays] == [(20, 6), (5, 6)]
+  assert np.concatenate(arrays).tolist() == [list(c) for c in candles]
+
+@pytest.mark.asyncio
+async def test_backtest_streams_from_database(tmp_path):
+  await db.initialize_db(str(tmp_path / 'candles.db'))
+  try:
+    for symbol, price in [('tBTCUSD', 100), ('tETHUSD', 10)]:
+      db.store_candles([(m * MINUTE, price, price + m, price, price, 1) for m in range(30)],
+        symbol, '1m')
+    db.db.close()
+    strategy = Strategy(symbols=['tBTCUSD', 'tETHUSD'], indicators={}, logLevel='ERROR')
+    updates = []
+
+    @strategy.on_enter
+    async def enter(update):
+      updates.append((update.mts, update.symbol, update.price))
+
+    exe = Executor(strategy, timeframe='1m', show_chart=False, trade_summary=0)
+    await exe.with_local_database(0, 29 * MINUTE, batch_size=7)
+    assert len(updates) == 60
+    assert [u[0] for u in updates] == sorted(u[0] for u in updates)
+    assert all(price == (100 if symbol == 'tBTCUSD' else 10) + mts // MINUTE
+               for mts, symbol, price in updates)
+  finally:
+    db.configure_db()
+
+@pytest.mark.asyncio
+async def test_read_while_writing(tmp_path):
+  path = str(tmp_path / 'candles.db')
+  await db.initialize_db(path)
+  try:
+    assert db.db.execute_sql('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    db.store_candles([(m * MINUTE, 1, 2, 3, 1, 10) for m in range(10)], 'tBTCUSD', '1m',
+      batch_size=3)
+    # another process, i.e a backtest, reads the committed candles while a
+    # fetch is writing, even once the writer holds an exclusive lock
+    reader = SqliteDatabase(path, pragmas=db.DB_PRAGMAS, timeout=0)
+    with db.db.atomic(lock_type='EXCLUSIVE'):
+      db.store_candles([(m * MINUTE, 1, 2, 3, 1, 10) for m in range(10, 20)], 'tBTCUSD', '1m')
+      with reader.bind_ctx([db.Candle]):
+        assert len(list(db.iter_candles(None, None, 'tBTCUSD', '1m'))) == 10
+    with reader.bind_ctx([db.Candle]):
+      assert len(list(db.iter_candles(None, None, 'tBTCUSD', '1m'))) == 20
+    reader.close()
+  finally:
+    db.configure_db()
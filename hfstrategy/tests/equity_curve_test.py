@@ -0,0 +1,58 @@
+"""
+This script tests the equity curve and risk metrics of a backtest
+"""
+import numpy as np
+
+from ..utils.executor import Executor, BacktestEngine
+from ..utils.equity_curve import EquityCurve
+from .backtest_engine_test import write_candles, create_strategy
+
+def create_curve(equity, amount=None, mts=None):
+  equity = np.array(equity, dtype=np.float64)
+  n = len(equity)
+  mts = np.arange(1, n + 1, dtype=np.int64) * 60000 if mts is None else np.array(mts)
+  amount = np.zeros(n) if amount is None else np.array(amount, dtype=np.float64)
+  return EquityCurve(mts, np.ones(n), np.ones(n), np.ones(n), amount, np.zeros(n),
+    equity, np.zeros(0), np.zeros(0))
+
+def test_backtest_records_equity_per_candle(tmp_path):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path, count=600)
+  strategy = create_strategy()
+  result = Executor(strategy, timeframe='1m', show_chart=False,
+    engine=BacktestEngine.FAST).offline(file=path)
+  equity = result.equity
+  positions = result.get_positions()
+  assert len(equity) == 600
+  assert np.all(np.diff(equity.mts) == 60000)
+  # whenever the strategy is flat the equity is the net P/L of the closed
+  # positions
+  closes = np.array([list(p.orders.values())[-1].mts_create for p in positions])
+  net = np.cumsum([p.get_profit_loss()['net'] for p in positions])
+  flat = equity.amount == 0
+  closed = np.searchsorted(closes, equity.mts[flat], side='right')
+  expected = np.concatenate(([0.0], net))[closed]
+  assert np.allclose(equity.equity[flat], expected)
+  assert len(equity.mae) == len(positions)
+  assert np.all(equity.mae <= 0) and np.all(equity.mfe >= 0)
+  assert np.any(equity.mae < 0) and np.any(equity.mfe > 0)
+  metrics = result.get_risk_metrics()
+  assert 0 < metrics['exposure'] < 1
+  assert metrics['max_drawdown'] >= 0
+  assert metrics['max_drawdown_duration'] % 60000 == 0
+
+def test_risk_metrics():
+  curve = create_curve([1, 3, 2, 0, 4, 5, 2], amount=[1, 1, 0, 0, 1, 0, 0])
+  assert curve.get_drawdown().tolist() == [0, 0, 1, 3, 0, 0, 3]
+  assert curve.get_drawdown_durations().tolist() == [0, 0, 60000, 120000, 0, 0, 60000]
+  metrics = curve.get_risk_metrics(periods_per_year=1)
+  returns = np.array([1, 2, -1, -2, 4, 1, -3])
+  assert metrics['sharpe'] == returns.mean() / returns.std(ddof=1)
+  assert metrics['sortino'] == returns.mean() / np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+  assert metrics['max_drawdown'] == 3
+  assert metrics['max_drawdown_duration'] == 120000
+  assert metrics['exposure'] == 3 / 7
+  # returns as a fraction of the balance
+  assert np.allclose(curve.get_returns(starting_balance=10)[:2], [1 / 10, 2 / 11])
+  # an hourly curve is annualised with 8760 periods
+  assert create_curve([0, 1, 2], mts=[0, 3600000, 7200000]).get_periods_per_year() == 8760
@@ -6,6 +6,9 @@ from .. import Strategy
 from bfxhfindicators import MACD
 from ..utils.mock_websocket_client import MockClient
 from ..utils.mock_order_manager import MockOrderManager
+from ..utils import db
+
+MINUTE = 60000
 
 def generate_fake_candle(mts=None, open=6373,  close=6374.5, high=6375.9,
 		low=6369.2, volume=38.58293517, symbol='tBTCUSD', tf='1h'):
@@ -66,3 +69,13 @@ class EventWatcher():
 			await asyncio.sleep(0.001)
 			counter += 1
 		return self.value
+
+def insert_candles(mts, symbol='tBTCUSD', tf='1m'):
+	fields = [db.Candle.mts, db.Candle.open, db.Candle.close, db.Candle.high,
+		db.Candle.low, db.Candle.volume, db.Candle.symbol, db.Candle.tf]
+	rows = [(m, 1, 2, 3, 1, 10, symbol, tf) for m in mts]
+	db.Candle.insert_many(rows, fields).execute()
+
+def get_stored(symbol='tBTCUSD', tf='1m'):
+	query = db.Candle.select().where(db.Candle.symbol == symbol, db.Candle.tf == tf)
+	return [c.to_list() for c in query.order_by(db.Candle.mts)]
@@ -0,0 +1,42 @@
+"""
+This script tests the Monte Carlo resampling of backtest trades
+"""
+import pytest
+import numpy as np
+
+from ..utils.monte_carlo import MonteCarlo
+
+def test_original_sequence_metrics():
+  results = MonteCarlo([10, -5, -10, 20], resamples=10, seed=1,
+    starting_balance=20, ruin=0.5).run()
+  assert results.original == { 'net_pl': 15, 'max_drawdown': 15, 'ruined': False }
+  # the starting balance of zero counts as a peak
+  results = MonteCarlo([-5, 10], resamples=10, seed=1).run()
+  assert results.original['max_drawdown'] == 5
+  assert results.original['ruined'] is None
+  assert results.get_risk_of_ruin() is None
+
+def test_shuffle_keeps_net_profit_loss():
+  trades = np.random.default_rng(3).normal(1, 10, 200)
+  results = MonteCarlo(trades, resamples=1000, method=MonteCarlo.Method.SHUFFLE,
+    seed=1, starting_balance=50).run()
+  assert len(results) == 1000
+  assert np.allclose(results.net_pl, trades.sum())
+  assert (results.max_drawdown >= 0).all()
+  low, high = results.confidence_interval('max_drawdown', 0.9)
+  assert low <= np.median(results.max_drawdown) <= high
+  assert 0 < results.get_risk_of_ruin() < 1
+  assert len(results.to_table().rows) == 3
+
+def test_bootstrap_is_reproducible():
+  trades = np.random.default_rng(3).normal(1, 10, 300)
+  a = MonteCarlo(trades, resamples=2000, seed=7, block_size=3000, max_workers=1).run()
+  b = MonteCarlo(trades, resamples=2000, seed=7, block_size=3000, max_workers=4).run()
+  assert (a.net_pl == b.net_pl).all()
+  assert (a.max_drawdown == b.max_drawdown).all()
+  assert a.net_pl.mean() == pytest.approx(trades.sum(), abs=3 * trades.std() * 300 ** 0.5 / 40)
+
+def test_every_run_is_ruined_by_losses():
+  results = MonteCarlo([-20, -20, -20], resamples=100, seed=1, starting_balance=100).run()
+  assert results.get_risk_of_ruin() == 1
+  assert (results.max_drawdown == 60).all()
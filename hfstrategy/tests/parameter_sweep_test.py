@@ -0,0 +1,74 @@
+"""
+This script tests running a strategy over a grid of parameters
+"""
+import math
+
+from bfxhfindicators import EMA
+from .. import Strategy
+from ..utils.executor import Executor, BacktestEngine
+from ..utils.parameter_sweep import ParameterSweep, get_backtest_metrics
+
+def generate_candles(count=400):
+  candles = []
+  for i in range(count):
+    close = 6000 + 300 * math.sin(i / 15) + 40 * math.sin(i / 2)
+    candles += [[(i + 1) * 60000, close - 5, close, close + 10, close - 10, 1]]
+  return candles
+
+# must be defined at module level so the worker processes can unpickle it
+def create_strategy(emaS, emaL):
+  strategy = Strategy(
+    symbol='tBTCUSD',
+    indicators={ 'emaS': EMA(emaS), 'emaL': EMA(emaL) },
+    logLevel='ERROR'
+  )
+
+  @strategy.on_enter
+  async def enter(update):
+    s = strategy.get_indicators()['emaS']
+    l = strategy.get_indicators()['emaL']
+    if s.crossed(l.v()):
+      amount = 1 if s.v() > l.v() else -1
+      await strategy.open_position_market(mtsCreate=update.mts, amount=amount)
+
+  @strategy.on_update
+  async def update(update, position):
+    s = strategy.get_indicators()['emaS']
+    l = strategy.get_indicators()['emaL']
+    if s.crossed(l.v()):
+      await strategy.close_position_market(mtsCreate=update.mts)
+  return strategy
+
+def test_sweep_runs_every_combination():
+  candles = generate_candles()
+  sweep = ParameterSweep(create_strategy, { 'emaS': [3, 5], 'emaL': [10, 20] },
+    timeframe='1m', max_workers=2)
+  progress = []
+  results = sweep.run(candles=candles, on_progress=lambda c, t, r: progress.append((c, t)))
+  assert not results.cancelled
+  assert [(r['emaS'], r['emaL']) for r in results] == [(3, 10), (3, 20), (5, 10), (5, 20)]
+  assert sorted(progress) == [(1, 4), (2, 4), (3, 4), (4, 4)]
+  # every run matches a backtest of the same parameters in this process
+  strategy = create_strategy(5, 20)
+  Executor(strategy, timeframe='1m', show_chart=False,
+    engine=BacktestEngine.FAST).offline_candles(candles, report=False)
+  expected = get_backtest_metrics(strategy.closedPositions)
+  assert expected['positions'] > 0
+  assert { k: results[3][k] for k in expected } == expected
+  best = results.best('net_pl')
+  assert best['net_pl'] == max(r['net_pl'] for r in results)
+  assert [r['run'] for r in results.sort('emaL', reverse=False)][:2] == [0, 2]
+  assert len(results.to_table(limit=2).rows) == 2
+
+def test_sweep_samples_are_reproducible():
+  parameters = { 'emaS': [2, 3, 4, 5], 'emaL': [10, 15, 20] }
+  runs = ParameterSweep(create_strategy, parameters, seed=7, samples=5).get_runs()
+  assert len(runs) == 5
+  assert runs == ParameterSweep(create_strategy, parameters, seed=7, samples=5).get_runs()
+
+def test_sweep_can_be_cancelled():
+  sweep = ParameterSweep(create_strategy, { 'emaS': [2, 3, 4, 5], 'emaL': [10, 20] },
+    timeframe='1m', max_workers=1)
+  results = sweep.run(candles=generate_candles(), on_progress=lambda c, t, r: sweep.cancel())
+  assert results.cancelled
+  assert len(results) == 1
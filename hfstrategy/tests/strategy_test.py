@@ -0,0 +1,171 @@
+"""
+This script tests the internal data handling of the Strategy class such
+as routing candles and trades to the correct indicators and executing events
+"""
+import pytest
+import copy
+import pickle
+import asyncio
+
+from bfxhfindicators import EMA
+from .. import Strategy
+from ..strategy.position import Position
+from .helpers import create_mock_strategy, generate_fake_candle
+
+def test_indicator_routes_only_include_matching_data_type():
+  strategy = create_mock_strategy()
+  iset = strategy._get_indicator_set('tBTCUSD')
+  candle_routes = iset.get_routes('candle')
+  assert [i for i, _ in candle_routes] == [strategy.indicators['macd']]
+  assert iset.get_routes('trade') == []
+
+def test_indicator_routes_rebuilt_on_add_indicator():
+  strategy = create_mock_strategy()
+  strategy._add_indicator_data('candle', generate_fake_candle())
+  ema = EMA(10)
+  strategy.add_indicator('ema', ema)
+  strategy._add_indicator_data('candle', generate_fake_candle(close=6400))
+  assert ema.v() == 6400
+
+def test_indicator_routes_rebuilt_on_reassignment():
+  strategy = create_mock_strategy()
+  strategy._add_indicator_data('candle', generate_fake_candle())
+  ema = EMA(10)
+  strategy.indicators = { 'ema': ema }
+  strategy._add_indicator_data('candle', generate_fake_candle(close=6400))
+  assert ema.v() == 6400
+  assert strategy._get_indicator_set().get_routes('candle') == [(ema, 'close')]
+
+def test_indicator_routes_rebuilt_on_dict_change():
+  strategy = create_mock_strategy()
+  strategy._add_indicator_data('candle', generate_fake_candle())
+  ema = EMA(10)
+  strategy.get_indicators()['ema'] = ema
+  strategy._add_indicator_data('candle', generate_fake_candle(close=6400))
+  assert ema.v() == 6400
+  replacement = EMA(10)
+  strategy.get_indicators()['ema'] = replacement
+  strategy._add_indicator_data('candle', generate_fake_candle(close=6300))
+  assert replacement.v() == 6300 and ema.v() == 6400
+  del strategy.get_indicators()['ema']
+  assert [i for i, _ in strategy._get_indicator_set().get_routes('candle')] == \
+    [strategy.indicators['macd']]
+
+def test_indicator_routes_kept_between_updates():
+  strategy = create_mock_strategy()
+  iset = strategy._get_indicator_set()
+  routes = iset.get_routes('candle')
+  strategy._add_indicator_data('candle', generate_fake_candle())
+  assert iset.get_routes('candle') is routes
+  strategy.get_indicators().update({ 'ema': EMA(10) })
+  assert iset.get_routes('candle') is not routes
+  # copies of the indicators, i.e checkpoints, are plain dicts
+  assert type(pickle.loads(pickle.dumps(strategy.indicators))) is dict
+  assert type(copy.deepcopy(strategy.indicators)) is dict
+
+@pytest.mark.asyncio
+async def test_price_update_indicator_values_are_lazy_view():
+  strategy = create_mock_strategy(indicators={ 'ema': EMA(10) })
+  updates = []
+  async def on_enter(update):
+    updates.append(update)
+  strategy.on_enter(on_enter)
+  await strategy._process_new_candle(generate_fake_candle(close=6400))
+  iv = updates[0].get_indicator_values()
+  assert iv['ema'] == 6400
+  assert list(iv) == ['ema']
+  frozen = updates[0].freeze_indicator_values()
+  await strategy._process_new_candle(generate_fake_candle(close=6500))
+  # the live view moves with the indicators but the frozen copy does not
+  assert iv['ema'] != 6400
+  assert frozen == { 'ema': 6400 }
+  assert updates[0].get_indicator_values() is frozen
+
+@pytest.mark.asyncio
+async def test_execute_events_supports_plain_functions_and_once():
+  strategy = create_mock_strategy()
+  calls = []
+  async def on_update(update):
+    calls.append(('coroutine', update))
+  strategy.on('custom', on_update)
+  strategy.on('custom', lambda update: calls.append(('function', update)))
+  strategy.once('custom', lambda update: calls.append(('once', update)))
+  await strategy._execute_events('custom', 1)
+  await strategy._execute_events('custom', 2)
+  assert sorted(calls) == sorted([
+    ('coroutine', 1), ('function', 1), ('once', 1),
+    ('coroutine', 2), ('function', 2)])
+
+@pytest.mark.asyncio
+async def test_execute_events_sequential_mode_keeps_order():
+  strategy = create_mock_strategy()
+  strategy.events.mode = Strategy.DispatchMode.SEQUENTIAL
+  calls = []
+  async def first():
+    await asyncio.sleep(0.001)
+    calls.append('first')
+  async def second():
+    calls.append('second')
+  strategy.on('custom', first)
+  strategy.on('custom', second)
+  await strategy._execute_events('custom')
+  assert calls == ['first', 'second']
+
+@pytest.mark.asyncio
+async def test_multi_symbol_indicators_are_independent():
+  strategy = Strategy(symbols=['tBTCUSD', 'tETHUSD'], indicators={ 'ema': EMA(10) },
+                      logLevel='DEBUG')
+  btc = strategy.get_indicators('tBTCUSD')['ema']
+  eth = strategy.get_indicators('tETHUSD')['ema']
+  assert btc is not eth
+  assert strategy.symbol == 'tBTCUSD'
+  await strategy._process_new_candle(generate_fake_candle(close=6400, symbol='tBTCUSD'))
+  await strategy._process_new_candle(generate_fake_candle(close=200, symbol='tETHUSD'))
+  # unknown symbols are ignored
+  await strategy._process_new_candle(generate_fake_candle(close=1, symbol='tXRPUSD'))
+  assert btc.v() == 6400
+  assert eth.v() == 200
+  assert strategy.get_indicator_values('tETHUSD') == { 'ema': 200 }
+  assert strategy.get_last_price_update('tETHUSD').price == 200
+
+@pytest.mark.asyncio
+async def test_multi_symbol_market_orders_use_symbol_price():
+  strategy = create_mock_strategy()
+  strategy.set_indicators({ 'ema': EMA(10) }, symbol='tETHUSD')
+  assert strategy.get_symbols() == ['tBTCUSD', 'tETHUSD']
+  await strategy._process_new_candle(generate_fake_candle(close=6400, symbol='tBTCUSD'))
+  await strategy._process_new_candle(generate_fake_candle(close=200, symbol='tETHUSD'))
+  await strategy.open_long_position_market(mtsCreate=0, amount=1, symbol='tETHUSD')
+  assert strategy.get_position('tETHUSD').price == 200
+  assert strategy.get_position('tBTCUSD') is None
+  await strategy.open_long_position_market(mtsCreate=0, amount=1, symbol='tBTCUSD')
+  await strategy.set_position_stop(6300, symbol='tBTCUSD')
+  await strategy.set_position_stop(190, symbol='tETHUSD')
+  # closing the ETH position leaves the BTC position and its exit order alone
+  await strategy.close_position_market(mtsCreate=0, symbol='tETHUSD')
+  assert strategy.get_position('tETHUSD') is None
+  assert [p.symbol for p in strategy.closedPositions] == ['tETHUSD']
+  assert strategy.closedPositions[0].exit_order.stop is None
+  btc = strategy.get_position('tBTCUSD')
+  assert btc.amount == 1 and btc.exit_order.stop == 6300
+
+@pytest.mark.asyncio
+async def test_stop_reached_closes_position_of_updated_symbol():
+  strategy = create_mock_strategy()
+  strategy.set_indicators({ 'ema': EMA(10) }, symbol='tETHUSD')
+  await strategy._process_new_candle(generate_fake_candle(mts=1533919680000))
+  await strategy._process_new_candle(generate_fake_candle(
+    mts=1533919680000, close=200, symbol='tETHUSD'))
+  await strategy.open_short_position_market(mtsCreate=0, amount=1)
+  await strategy.set_position_stop(7000, exit_type=Position.ExitType.MARKET)
+  await strategy.open_long_position_market(mtsCreate=0, amount=1, symbol='tETHUSD')
+  # the ETH candle is above the BTC stop but only closes a BTC position
+  await strategy._process_new_candle(generate_fake_candle(
+    mts=1533919740000, close=7100, symbol='tETHUSD'))
+  assert strategy.get_position('tBTCUSD') is not None
+  await strategy._process_new_candle(generate_fake_candle(
+    mts=1533919740000, open=7100, close=7100, high=7100, low=7100))
+  assert strategy.get_position('tBTCUSD') is None
+  assert strategy.get_position('tETHUSD').amount == 1
+  last_order = strategy.orderManager.get_last_sent_item()
+  assert last_order['data']['args'][2] == 1.0
@@ -0,0 +1,42 @@
+"""
+This script tests that candles are built correctly from public trades
+"""
+import pytest
+
+from ..strategy.trade_candle_builder import TradeCandleBuilder
+
+START = 1533916800000
+
+def trade(seconds, price, amount, symbol='tBTCUSD'):
+  return { 'mts': START + seconds * 1000, 'price': price, 'amount': amount,
+           'symbol': symbol }
+
+def test_time_bars():
+  builder = TradeCandleBuilder(tf='1m')
+  assert builder.add(trade(0, 100, 1)) == []
+  assert builder.add(trade(10, 105, -2)) == []
+  assert builder.add(trade(20, 95, 0.5)) == []
+  assert builder.add(trade(59, 101, 1, symbol='tETHUSD')) == []
+  closed = builder.add(trade(61, 110, 1))
+  assert closed == [{
+    'mts': START, 'open': 100, 'close': 95, 'high': 105, 'low': 95,
+    'volume': 3.5, 'symbol': 'tBTCUSD', 'tf': '1m'
+  }]
+  assert [c['symbol'] for c in builder.flush()] == ['tBTCUSD', 'tETHUSD']
+
+def test_volume_bars():
+  builder = TradeCandleBuilder(volume=2)
+  assert builder.add(trade(0, 100, 1)) == []
+  closed = builder.add(trade(1, 102, -1.5))
+  assert closed[0]['volume'] == 2.5
+  assert closed[0]['tf'] == 'vol2'
+  assert closed[0]['mts'] == START
+  assert builder.current('tBTCUSD') is None
+  builder.add(trade(2, 99, 1))
+  assert builder.current('tBTCUSD')['open'] == 99
+
+def test_requires_tf_or_volume():
+  with pytest.raises(ValueError):
+    TradeCandleBuilder()
+  with pytest.raises(ValueError):
+    TradeCandleBuilder(tf='1m', volume=1)
@@ -0,0 +1,107 @@
+"""
+This script tests that bursts of trades are coalesced into batches
+"""
+import pytest
+import asyncio
+
+from ..strategy.trade_coalescer import TradeCoalescer
+from .helpers import create_mock_strategy
+
+class LastPrice:
+  """ Minimal indicator which tracks the latest trade price """
+  def __init__(self):
+    self.updates = []
+  def get_data_type(self):
+    return 'trade'
+  def get_data_key(self):
+    return 'price'
+  def update(self, v):
+    self.updates.append(v)
+  def v(self):
+    return self.updates[-1] if self.updates else None
+  def ready(self):
+    return len(self.updates) > 0
+
+def trade(n, symbol='tBTCUSD'):
+  return { 'mts': 1533916800000 + n, 'price': 6000 + n, 'amount': 1, 'symbol': symbol }
+
+@pytest.mark.asyncio
+async def test_trades_are_batched_within_window():
+  batches = []
+  async def handler(trades):
+    batches.append(trades)
+  coalescer = TradeCoalescer(handler, window_ms=5)
+  for n in range(3):
+    coalescer.push(trade(n))
+  coalescer.push(trade(3, symbol='tETHUSD'))
+  assert batches == []
+  await asyncio.sleep(0.02)
+  assert [len(b) for b in batches] == [3, 1]
+  assert coalescer.stats == { 'received': 4, 'batches': 2, 'merged': 2, 'dropped': 0 }
+
+@pytest.mark.asyncio
+async def test_trades_flushed_on_max_batch():
+  batches = []
+  async def handler(trades):
+    batches.append(trades)
+  coalescer = TradeCoalescer(handler, window_ms=10000, max_batch=2)
+  coalescer.push(trade(0))
+  coalescer.push(trade(1))
+  await asyncio.sleep(0)
+  assert [len(b) for b in batches] == [2]
+
+@pytest.mark.asyncio
+async def test_latest_mode_drops_older_trades():
+  batches = []
+  async def handler(trades):
+    batches.append(trades)
+  coalescer = TradeCoalescer(handler, mode=TradeCoalescer.Mode.LATEST)
+  for n in range(5):
+    coalescer.push(trade(n))
+  await coalescer.flush()
+  assert batches == [[trade(4)]]
+  assert coalescer.stats['dropped'] == 4
+
+@pytest.mark.asyncio
+async def test_strategy_processes_batch_with_one_update():
+  last_price = LastPrice()
+  strategy = create_mock_strategy(indicators={ 'last': last_price })
+  updates = []
+  async def on_enter(update):
+    updates.append(update)
+  strategy.on_enter(on_enter)
+  await strategy._process_new_trades([trade(1), trade(2), trade(3)])
+  assert len(updates) == 1
+  assert updates[0].price == 6003
+  # indicators still see every trade
+  assert last_price.updates == [6001, 6002, 6003]
+
+@pytest.mark.asyncio
+async def test_close_waits_for_running_flushes():
+  batches = []
+  async def handler(trades):
+    await asyncio.sleep(0.01)
+    batches.append(trades)
+  coalescer = TradeCoalescer(handler, window_ms=10000, max_batch=2)
+  coalescer.push(trade(0))
+  coalescer.push(trade(1))
+  coalescer.push(trade(2, symbol='tETHUSD'))
+  await coalescer.close()
+  assert [len(b) for b in batches] == [2, 1]
+  assert not coalescer._tasks and coalescer._scheduled is None
+
+@pytest.mark.asyncio
+async def test_stop_cancels_flushes():
+  batches = []
+  async def handler(trades):
+    await asyncio.sleep(0.01)
+    batches.append(trades)
+  coalescer = TradeCoalescer(handler, window_ms=5, max_batch=2)
+  coalescer.push(trade(0))
+  coalescer.push(trade(1))
+  coalescer.push(trade(2, symbol='tETHUSD'))
+  await asyncio.sleep(0)
+  coalescer.stop()
+  await asyncio.sleep(0.03)
+  assert batches == []
+  assert not coalescer._tasks
@@ -0,0 +1,70 @@
+"""
+This script tests streaming the fills of a backtest to a trade log
+"""
+import csv
+import json
+
+import pytest
+
+from ..utils.executor import Executor, BacktestEngine
+from ..utils.trade_log import TradeSink, create_trade_sink, read_binary_trade_log
+from .backtest_engine_test import write_candles, create_strategy
+
+class ListSink(TradeSink):
+  def __init__(self):
+    self.fills = []
+    self.closed = False
+
+  def write(self, fill):
+    self.fills.append(fill)
+
+  def close(self):
+    self.closed = True
+
+def run_backtest(path, trade_log, trade_summary=20):
+  strategy = create_strategy()
+  Executor(strategy, timeframe='1m', show_chart=False, engine=BacktestEngine.FAST,
+    trade_log=trade_log, trade_summary=trade_summary).offline(file=path)
+  return strategy
+
+def test_every_fill_is_streamed(tmp_path, capsys):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path)
+  sink = ListSink()
+  strategy = run_backtest(path, sink, trade_summary=3)
+  orders = [o for p in strategy.closedPositions for o in p.orders.values()]
+  assert sink.closed
+  assert [(f[0], f[2], f[3]) for f in sink.fills] == [
+    (o.mts_create, o.amount_filled, o.price_avg) for o in orders]
+  position = strategy.closedPositions[0]
+  close = list(position.orders.values())[-1]
+  assert sink.fills[1][5] == position.realised_profit_loss[close.id]
+  # only the last trades are printed
+  assert "Last 3 of {} trades".format(len(orders)) in capsys.readouterr().out
+
+def test_trade_log_formats(tmp_path):
+  path = str(tmp_path / 'candles.json')
+  write_candles(path)
+  expected = ListSink()
+  run_backtest(path, expected, trade_summary=0)
+  run_backtest(path, str(tmp_path / 'trades.csv'))
+  run_backtest(path, str(tmp_path / 'trades.jsonl'))
+  run_backtest(path, str(tmp_path / 'trades.bin'))
+  with open(str(tmp_path / 'trades.csv')) as f:
+    rows = list(csv.DictReader(f))
+  with open(str(tmp_path / 'trades.jsonl')) as f:
+    lines = [json.loads(l) for l in f]
+  records = read_binary_trade_log(str(tmp_path / 'trades.bin'))
+  assert len(rows) == len(lines) == len(records) == len(expected.fills)
+  for fill, row, line, record in zip(expected.fills, rows, lines, records):
+    assert float(row['price']) == line['price'] == record['price'] == fill[3]
+    assert row['tag'] == line['tag'] == record['tag'].decode() == fill[6]
+    assert int(row['mts']) == line['mts'] == record['mts'] == fill[0]
+  with pytest.raises(ValueError):
+    create_trade_sink(str(tmp_path / 'trades.txt'))
+
+def test_sink_must_implement_write():
+  class NoWriteSink(TradeSink):
+    pass
+  with pytest.raises(TypeError):
+    NoWriteSink()
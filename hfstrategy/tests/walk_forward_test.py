@@ -0,0 +1,70 @@
+"""
+This script tests walk-forward optimization over rolling windows
+"""
+import pytest
+
+from ..utils.parameter_sweep import ParameterSweep
+from ..utils.walk_forward import WalkForward
+from .parameter_sweep_test import create_strategy, generate_candles
+
+PARAMETERS = { 'emaS': [3, 5], 'emaL': [10, 20] }
+
+def test_walk_forward_picks_in_sample_best():
+  candles = generate_candles(600)
+  wf = WalkForward(create_strategy, PARAMETERS, in_sample=200, out_of_sample=100,
+    timeframe='1m', max_workers=2)
+  assert wf.get_windows(len(candles)) == [
+    (0, 200, 300), (100, 300, 400), (200, 400, 500), (300, 500, 600)]
+  progress = []
+  results = wf.run(candles=candles, on_progress=lambda c, t: progress.append(c))
+  assert len(results) == 4
+  assert sorted(progress) == list(range(1, 21))
+  # the parameters of each window are the best of a sweep of its in-sample candles
+  sweep = ParameterSweep(create_strategy, PARAMETERS, timeframe='1m', max_workers=1)
+  best = sweep.run(candles=candles[100:300]).best('net_pl')
+  window = results[1]
+  assert (window['emaS'], window['emaL']) == (best['emaS'], best['emaL'])
+  assert window['in_sample_net_pl'] == best['net_pl']
+  assert window['in_sample_start'] == candles[100][0]
+  assert window['out_of_sample_start'] == candles[300][0]
+  # the equity curve is the out-of-sample windows stitched together
+  assert len(results.equity) == sum(r['positions'] for r in results)
+  assert list(results.equity_mts) == sorted(results.equity_mts)
+  assert results.get_net_profit_loss() == pytest.approx(sum(r['net_pl'] for r in results))
+  assert len(results.to_table().rows) == 4
+
+def test_walk_forward_validates_windows():
+  with pytest.raises(ValueError):
+    WalkForward(create_strategy, PARAMETERS, in_sample=200, out_of_sample=100, step=50)
+  with pytest.raises(ValueError):
+    WalkForward(create_strategy, PARAMETERS, 200, 100, metric='sharpe')
+  wf = WalkForward(create_strategy, PARAMETERS, in_sample=200, out_of_sample=100)
+  with pytest.raises(ValueError):
+    wf.run(candles=generate_candles(250))
+
+# must be defined at module level so the worker processes can unpickle it
+def create_failing_strategy(emaS, emaL):
+  strategy = create_strategy(emaS, emaL)
+
+  # every run fails on candle 450, runs with emaS 3 on candle 50 too
+  async def fail(update, position=None):
+    if update.mts == 451 * 60000 or (emaS == 3 and update.mts == 51 * 60000):
+      raise ValueError('Strategy failed')
+
+  strategy.on_enter(fail)
+  strategy.on_update(fail)
+
+  return strategy
+
+def test_walk_forward_skips_failed_runs():
+  candles = generate_candles(600)
+  wf = WalkForward(create_failing_strategy, PARAMETERS, in_sample=200, out_of_sample=100,
+    timeframe='1m', max_workers=2)
+  progress = []
+  results = wf.run(candles=candles, on_progress=lambda c, t: progress.append((c, t)))
+  # candle 450 is in the out-of-sample candles of window 2 and every
+  # in-sample run of window 3
+  assert results.skipped_windows == [2, 3]
+  assert [r['window'] for r in results] == [0, 1]
+  assert results[0]['emaS'] == 5
+  assert sorted(progress)[-1] == (19, 19)
@@ -0,0 +1,129 @@
+from ..models import Events
+
+class BacktestStatistics:
+  """
+  Summary statistics of a backtest, updated as each position is closed so
+  that they take the same memory whatever the number of positions and
+  nothing has to be recalculated once the backtest is complete.
+
+  The drawdown is measured on the net P/L after each closed position,
+  starting from zero.
+  """
+
+  def __init__(self):
+    self.positions = 0
+    self.trades = 0
+    self.gross_pl = 0.0
+    self.net_pl = 0.0
+    self.fees = 0.0
+    self.volume = 0.0
+    self.min_pl = 0.0
+    self.max_pl = 0.0
+    self.gains = 0
+    self.total_gains = 0.0
+    self.losses = 0
+    self.total_losses = 0.0
+    self.peak_pl = 0.0
+    self.max_drawdown = 0.0
+
+  def add_position(self, position):
+    """
+    @param position: the closed Position
+    """
+    profit_loss = position.get_profit_loss()
+    gross = profit_loss['gross']
+    self.positions += 1
+    self.trades += len(position.orders)
+    self.gross_pl += gross
+    self.net_pl += profit_loss['net']
+    self.fees += position.total_fees
+    self.volume += position.volume
+    self.min_pl = min(self.min_pl, gross)
+    self.max_pl = max(self.max_pl, gross)
+    if gross < 0:
+      self.losses += 1
+      self.total_losses += gross
+    else:
+      self.gains += 1
+      self.total_gains += gross
+    self.peak_pl = max(self.peak_pl, self.net_pl)
+    self.max_drawdown = max(self.max_drawdown, self.peak_pl - self.net_pl)
+
+  def attach(self, strategy):
+    """
+    Add the positions the strategy has already closed then every position
+    it closes until detach() is called
+
+    @param strategy: Strategy
+    """
+    for position in strategy.closedPositions:
+      self.add_position(position)
+    strategy.on_position_close(self.add_position)
+    return self
+
+  def detach(self, strategy):
+    strategy.events.remove_listener(Events.ON_POSITION_CLOSE, self.add_position)
+
+  def get_win_rate(self):
+    """
+    @return fraction of positions with a gross P/L of zero or more
+    """
+    return self.gains / self.positions if self.positions else 0.0
+
+  def get_average_pl(self):
+    """
+    @return gross P/L per trade
+    """
+    return self.gross_pl / self.trades if self.trades else 0.0
+
+  def to_dict(self):
+    return {
+      'net_pl': self.net_pl,
+      'gross_pl': self.gross_pl,
+      'fees': self.fees,
+      'volume': self.volume,
+      'positions': self.positions,
+      'trades': self.trades,
+      'win_rate': self.get_win_rate(),
+      'max_drawdown': self.max_drawdown,
+      'min_pl': self.min_pl,
+      'max_pl': self.max_pl,
+      'average_pl': self.get_average_pl(),
+      'gains': self.gains,
+      'total_gains': self.total_gains,
+      'losses': self.losses,
+      'total_losses': self.total_losses,
+    }
+
+class BacktestResult:
+  """
+  The outcome of a backtest, returned by the offline executors
+  """
+
+  def __init__(self, strategy, statistics, equity=None):
+    """
+    @param strategy: the backtested Strategy
+    @param statistics: BacktestStatistics of its closed positions
+    @param equity: optional EquityCurve sampled at every candle
+    """
+    self.strategy = strategy
+    self.statistics = statistics
+    self.equity = equity
+
+  def get_positions(self):
+    """
+    @return list of closed Positions in the order they were closed
+    """
+    return self.strategy.closedPositions
+
+  def get_risk_metrics(self, starting_balance=None, periods_per_year=None):
+    """
+    @return dict of risk metrics, see EquityCurve.get_risk_metrics, or None if
+      the equity curve was not recorded
+    """
+    if self.equity is None:
+      return None
+    return self.equity.get_risk_metrics(starting_balance, periods_per_year)
+
+  def to_dict(self):
+    return self.statistics.to_dict()
@@ -0,0 +1,88 @@
+import random
+import asyncio
+
+import numpy as np
+
+from ..utils.executor import Executor, _read_candle_file
+from ..utils.candle_file import CandleFile, is_candle_file
+
+METRICS = ['net_pl', 'gross_pl', 'fees', 'volume', 'positions', 'trades',
+  'win_rate', 'max_drawdown']
+
+# the candles backtested by this worker process, loaded once by init_worker
+_worker_candles = None
+
+def get_metrics(statistics):
+  """
+  @param statistics: BacktestStatistics
+  @return dict containing every key of METRICS
+  """
+  summary = statistics.to_dict()
+  return { m: summary[m] for m in METRICS }
+
+def load_candles(file, candles):
+  """
+  Load the candles to share with the worker processes
+
+  @param file: path to a json or memory-mapped candle file, used if candles
+    is None
+  @param candles: list, NumPy array or CandleFile of
+    [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows sorted oldest first
+  @return NumPy array or CandleFile
+  """
+  if candles is None:
+    if not file:
+      raise KeyError("Expected 'file' or 'candles' in parameters.")
+    if is_candle_file(file):
+      # pickled by path so every worker maps the file rather than receiving
+      # a copy of the candles
+      return CandleFile(file)
+    candles = _read_candle_file(file)
+  if isinstance(candles, CandleFile):
+    return candles
+  return np.asarray(candles, dtype=np.float64)
+
+def init_worker(candles):
+  """
+  Initializer of a worker process of a ProcessPoolExecutor
+
+  @param candles: the result of load_candles
+  """
+  global _worker_candles
+  _worker_candles = candles.rows if isinstance(candles, CandleFile) else candles
+  # a forked worker must not share the event loop of the parent process
+  asyncio.set_event_loop(asyncio.new_event_loop())
+
+def backtest(strategy_factory, params, seed, timeframe, engine, start=0, stop=None,
+    warmup=0):
+  """
+  Backtest a new strategy on a slice of the candles of the worker
+
+  @param strategy_factory: function called with params to create the strategy
+  @param seed: seed of random and numpy.random for the run
+  @param start: index of the first candle
+  @param stop: index after the last candle, None for the end
+  @param warmup: number of candles before start used to seed the indicators
+  @return BacktestResult
+  """
+  # seed per run rather than per worker so results don't depend on which
+  # worker picked the run up
+  random.seed(seed)
+  np.random.seed(seed % 2**32)
+  strategy = strategy_factory(**params)
+  strategy.logger.disabled = True
+  exe = Executor(strategy, timeframe=timeframe, show_chart=False, engine=engine,
+    record_equity=False)
+  # slices of the shared array are views so no candles are copied
+  seedData = _worker_candles[max(0, start - warmup):start] if warmup else None
+  return exe.offline_candles(_worker_candles[start:stop], report=False, seedData=seedData)
+
+def run_backtest(strategy_factory, params, seed, timeframe, engine, start=0, stop=None):
+  """
+  The same as backtest but only returns the METRICS, which are cheaper to
+  send back to the parent process than the BacktestResult
+
+  @return dict containing every key of METRICS
+  """
+  result = backtest(strategy_factory, params, seed, timeframe, engine, start, stop)
+  return get_metrics(result.statistics)
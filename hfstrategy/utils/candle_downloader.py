@@ -0,0 +1,137 @@
+import time
+import asyncio
+
+from bfxapi import Client
+
+# Bitfinex allows 30 requests a minute to the public candles endpoint
+CANDLES_RATE_LIMIT = 30 / 60
+
+class TokenBucket:
+  """
+  Rate limiter shared by the concurrent requests of a CandleDownloader. The
+  bucket holds up to capacity tokens and is refilled at rate tokens per
+  second, each request takes a token or waits for the next one.
+  """
+
+  def __init__(self, rate, capacity):
+    """
+    @param rate: tokens added per second
+    @param capacity: maximum number of tokens, i.e the size of a burst
+    """
+    self.rate = rate
+    self.capacity = capacity
+    self.tokens = capacity
+    self.updated = time.monotonic()
+
+  def _refill(self):
+    now = time.monotonic()
+    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+    self.updated = now
+
+  async def acquire(self):
+    while True:
+      self._refill()
+      if self.tokens >= 1:
+        self.tokens -= 1
+        return
+      await asyncio.sleep((1 - self.tokens) / self.rate)
+
+  def drain(self):
+    """
+    Empty the bucket, i.e once the server has rejected a request
+    """
+    self._refill()
+    self.tokens = min(self.tokens, 0)
+
+class CandleDownloader:
+  """
+  Fetches pages of candles from the Bitfinex REST API concurrently over a
+  single client. Requests go through a TokenBucket and failed requests are
+  retried with an exponential backoff. Each page is passed to on_page as
+  soon as it arrives so a download which is interrupted keeps every page
+  fetched so far.
+  """
+
+  def __init__(self, client=None, rest_host=None, concurrency=4,
+      rate=CANDLES_RATE_LIMIT, burst=1, max_retries=8, backoff=1, max_backoff=60,
+      page_size=10000):
+    """
+    @param client: optional bfxapi Client, one is created for rest_host if
+      not given
+    @param rest_host: optional REST url, i.e of a local stand-in for the api
+    @param concurrency: maximum number of requests in flight
+    @param rate: requests per second
+    @param burst: requests which can be sent at once before being limited,
+      any minute holds up to burst - 1 + 60 * rate requests so the default
+      of 1 keeps to the rate limit from the first request
+    @param max_retries: attempts of a page after the first before giving up
+    @param backoff: seconds waited after the first failure of a page, doubled
+      after each further failure
+    @param max_backoff: maximum seconds waited between attempts
+    @param page_size: maximum number of candles per request
+    """
+    if client is None:
+      kwargs = { 'rest_host': rest_host } if rest_host else {}
+      client = Client(logLevel='INFO', **kwargs)
+    self.client = client
+    self.concurrency = concurrency
+    self.bucket = TokenBucket(rate, burst)
+    self.max_retries = max_retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.page_size = page_size
+
+  async def fetch_page(self, symbol, tf, start, end):
+    """
+    @return list of [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] candles from start
+      to end, inclusive
+    """
+    attempt = 0
+    while True:
+      await self.bucket.acquire()
+      try:
+        candles = await self.client.rest.get_public_candles(symbol=symbol,
+          start=start, end=end, tf=tf, limit=self.page_size, sort=1)
+        # the api may answer a rate limited request with an error message
+        if candles and candles[0] == 'error':
+          raise Exception('Candles request failed - {}'.format(candles))
+        return candles
+      except Exception as e:
+        if attempt >= self.max_retries:
+          raise
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        attempt += 1
+        print(f'{e} | Retrying in {delay}s...')
+        self.bucket.drain()
+        await asyncio.sleep(delay)
+
+  async def download(self, symbol, tf, pages, on_page):
+    """
+    Fetch the pages concurrently, in no particular order
+
+    @param pages: list of (start, end) mts ranges of at most page_size
+      candles each
+    @param on_page: function called with the start, end and candles of each
+      page as it arrives
+    @return number of candles fetched
+    """
+    queue = list(reversed(pages))
+    fetched = 0
+
+    async def worker():
+      nonlocal fetched
+      while queue:
+        start, end = queue.pop()
+        candles = await self.fetch_page(symbol, tf, start, end)
+        on_page(start, end, candles)
+        fetched += len(candles)
+
+    workers = [asyncio.ensure_future(worker())
+               for _ in range(min(self.concurrency, len(pages)))]
+    try:
+      await asyncio.gather(*workers)
+    finally:
+      # stop the other requests once one of them has failed
+      for w in workers:
+        w.cancel()
+    return fetched
@@ -0,0 +1,173 @@
+import numpy as np
+
+from ..utils.candle_loader import iter_json_row_chunks, count_json_rows
+
+MAGIC = b'HFCANDLE'
+VERSION = 1
+COLUMNS = ('mts', 'open', 'close', 'high', 'low', 'volume')
+HEADER = np.dtype([
+  ('magic', 'S8'),
+  ('version', '<u4'),
+  ('columns', '<u4'),
+  ('count', '<u8'),
+  ('symbol', 'S32'),
+  ('tf', 'S8'),
+])
+# the columns start on a 64 byte boundary
+HEADER_SIZE = 64
+
+def is_candle_file(path):
+  """
+  @return True if the file starts with the candle file magic bytes
+  """
+  with open(path, 'rb') as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+def iter_array_rows(candles, chunk_size=8192):
+  """
+  Iterate an (n, 6) NumPy array of candles as rows of Python numbers,
+  converting a block of rows at a time rather than each row on its own
+
+  @param candles: NumPy array of [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows
+  @return generator of (mts, open, close, high, low, volume) tuples
+  """
+  for start in range(0, len(candles), chunk_size):
+    block = candles[start:start + chunk_size]
+    # the mts is stored as a float alongside the prices
+    mts = block[:, 0].astype(np.int64).tolist()
+    yield from zip(mts, *[block[:, i].tolist() for i in range(1, len(COLUMNS))])
+
+class CandleFile:
+  """
+  A binary file of candles for a single symbol and timeframe, opened with
+  numpy.memmap. The file is a 64 byte header (magic, version, column count,
+  candle count, symbol and tf) followed by one little-endian float64 column
+  per field of COLUMNS, oldest candle first. A float64 holds any mts exactly
+  so every column has the same width and the candles can be read as an
+  (n, 6) array view of the mapped file without copying.
+
+  Pages are loaded on demand and shared through the page cache, so any
+  number of processes can map the same file and only the candles being
+  read take up memory. CandleFiles are pickled by path, each process maps
+  the file itself.
+  """
+
+  def __init__(self, path, mode='r'):
+    """
+    @param path: path to the candle file
+    @param mode: numpy.memmap mode, 'r' or 'r+'
+    """
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if not len(header) or header['magic'][0] != MAGIC:
+      raise ValueError("'{}' is not a candle file".format(path))
+    if header['version'][0] != VERSION:
+      raise ValueError("Unsupported candle file version {}".format(header['version'][0]))
+    self.path = path
+    self.symbol = header['symbol'][0].decode('ascii')
+    self.tf = header['tf'][0].decode('ascii')
+    count = int(header['count'][0])
+    if count:
+      self._data = np.memmap(path, dtype='<f8', mode=mode, offset=HEADER_SIZE,
+        shape=(len(COLUMNS), count))
+    else:
+      # a zero length file can't be mapped
+      self._data = np.empty((len(COLUMNS), 0), dtype='<f8')
+    self.rows = self._data.T
+
+  def __reduce__(self):
+    return (CandleFile, (self.path,))
+
+  def __len__(self):
+    return self.rows.shape[0]
+
+  def __getitem__(self, index):
+    return self.rows[index]
+
+  def column(self, name):
+    """
+    @param name: one of COLUMNS
+    @return read-only view of the column
+    """
+    return self._data[COLUMNS.index(name)]
+
+  def iter_rows(self, start=0, stop=None, chunk_size=8192):
+    """
+    @return generator of (mts, open, close, high, low, volume) tuples
+    """
+    return iter_array_rows(self.rows[start:stop], chunk_size)
+
+  def flush(self):
+    if isinstance(self._data, np.memmap):
+      self._data.flush()
+
+def _encode(value, size, name):
+  encoded = value.encode('ascii')
+  if len(encoded) > size:
+    raise ValueError("Candle file {} '{}' is longer than {} characters".format(
+      name, value, size))
+  return encoded
+
+def create_candle_file(path, count, symbol, tf):
+  """
+  Create a candle file of count zeroed candles to be filled in
+
+  @param path: path of the new file, replaced if it exists
+  @param count: number of candles
+  @param symbol: string symbol i.e 'tBTCUSD'
+  @param tf: string timeframe i.e '1h'
+  @return CandleFile opened for writing
+  """
+  header = np.zeros(1, dtype=HEADER)
+  header['magic'] = MAGIC
+  header['version'] = VERSION
+  header['columns'] = len(COLUMNS)
+  header['count'] = count
+  header['symbol'] = _encode(symbol, HEADER['symbol'].itemsize, 'symbol')
+  header['tf'] = _encode(tf, HEADER['tf'].itemsize, 'tf')
+  with open(path, 'wb') as f:
+    f.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+    f.truncate(HEADER_SIZE + count * len(COLUMNS) * 8)
+  return CandleFile(path, mode='r+')
+
+def write_candle_chunks(path, chunks, count, symbol, tf):
+  """
+  Write chunks of candles, sorted oldest first, to a new candle file
+
+  @param chunks: iterable of lists or NumPy arrays of
+    [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows
+  @param count: total number of candles in the chunks
+  @return CandleFile
+  """
+  candle_file = create_candle_file(path, count, symbol, tf)
+  written = 0
+  for chunk in chunks:
+    rows = np.asarray(chunk, dtype=np.float64).reshape(-1, len(COLUMNS))
+    if written + len(rows) > count:
+      raise ValueError("Expected {} candles, got more".format(count))
+    candle_file.rows[written:written + len(rows)] = rows
+    written += len(rows)
+  if written != count:
+    raise ValueError("Expected {} candles, got {}".format(count, written))
+  candle_file.flush()
+  return CandleFile(path)
+
+def save_candle_file(path, candles, symbol, tf):
+  """
+  @param candles: list or NumPy array of [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME]
+    rows sorted oldest first
+  @return CandleFile
+  """
+  return write_candle_chunks(path, [candles], len(candles), symbol, tf)
+
+def json_to_candle_file(json_path, path, symbol, tf, chunk_size=1 << 20):
+  """
+  Convert a json candle file, sorted either newest or oldest first, to a
+  candle file. The json file is streamed so it doesn't need to fit in memory.
+
+  @param json_path: path to the json candle file
+  @param path: path of the new candle file
+  @return CandleFile
+  """
+  count = count_json_rows(json_path, chunk_size)
+  chunks = iter_json_row_chunks(json_path, chunk_size=chunk_size)
+  return write_candle_chunks(path, chunks, count, symbol, tf)
@@ -0,0 +1,105 @@
+import os
+import re
+import json
+
+# a flat, non-empty array of numbers, i.e one candle or trade
+_ROW = re.compile(rb'\[\s*([^\[\]\s][^\[\]]*)\]')
+
+def _parse_rows(rows):
+  # one json.loads call per chunk rather than per row
+  return json.loads(b'[[' + b'],['.join(rows) + b']]')
+
+def _iter_rows_forward(f, chunk_size):
+  buf = b''
+  while True:
+    data = f.read(chunk_size)
+    if not data:
+      return
+    buf += data
+    # rows are flat so the last ']' closes the last complete row (or the
+    # outer array at the end of the file)
+    end = buf.rfind(b']') + 1
+    if end == 0:
+      continue
+    rows = _ROW.findall(buf, 0, end)
+    buf = buf[end:]
+    if rows:
+      yield _parse_rows(rows)
+
+def _iter_rows_backward(f, size, chunk_size):
+  buf = b''
+  pos = size
+  while pos > 0:
+    start = max(0, pos - chunk_size)
+    f.seek(start)
+    buf = f.read(pos - start) + buf
+    pos = start
+    # everything after the first '[' has been read so every row which
+    # starts after it is complete, the text before it is part of a row
+    begin = buf.find(b'[')
+    if begin < 0:
+      continue
+    rows = _ROW.findall(buf, begin)
+    buf = buf[:begin]
+    if rows:
+      rows.reverse()
+      yield _parse_rows(rows)
+
+def _first_row(chunks):
+  for rows in chunks:
+    return rows[0]
+  return None
+
+def iter_json_row_chunks(file, key=0, chunk_size=1 << 20):
+  """
+  Read a json file holding an array of flat arrays of numbers, such as the
+  candle ([MTS, OPEN, CLOSE, HIGH, LOW, VOLUME]) and trade
+  ([ID, MTS, AMOUNT, PRICE]) files of the Bitfinex REST api, a chunk at a
+  time. The rows are returned sorted by row[key] ascending, if the file is
+  sorted descending it is read backwards rather than loaded and reversed, so
+  memory use depends on chunk_size and not on the size of the file.
+
+  @param file: path to the json file
+  @param key: index of the column the file is sorted by
+  @param chunk_size: number of bytes read at a time
+  @return generator of lists of rows
+  """
+  size = os.path.getsize(file)
+  with open(file, 'rb') as f:
+    first = _first_row(_iter_rows_forward(f, chunk_size))
+    last = _first_row(_iter_rows_backward(f, size, chunk_size))
+    if first is None:
+      return
+    f.seek(0)
+    if first[key] > last[key]:
+      yield from _iter_rows_backward(f, size, chunk_size)
+    else:
+      yield from _iter_rows_forward(f, chunk_size)
+
+def count_json_rows(file, chunk_size=1 << 20):
+  """
+  Count the rows of a json file, see iter_json_row_chunks, without parsing
+  them
+
+  @return int
+  """
+  count = 0
+  buf = b''
+  with open(file, 'rb') as f:
+    while True:
+      data = f.read(chunk_size)
+      if not data:
+        return count
+      buf += data
+      end = buf.rfind(b']') + 1
+      count += len(_ROW.findall(buf, 0, end))
+      buf = buf[end:]
+
+def iter_json_rows(file, key=0, chunk_size=1 << 20):
+  """
+  Same as iter_json_row_chunks but yields one row at a time
+
+  @return generator of rows
+  """
+  for rows in iter_json_row_chunks(file, key, chunk_size):
+    yield from rows
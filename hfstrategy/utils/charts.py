@@ -1,33 +1,117 @@
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
-import datetime
-
-def show_orders_chart(pricesDict, strategy):
-  prices = [(pricesDict[l], l) for l in pricesDict.keys()]
-  positions = [pos for pos in strategy.closedPositions]
-  # sort the candles by timestamp
-  prices.sort(key=lambda x: x[1])
-  # Plot price data
-  t = [ datetime.datetime.fromtimestamp(p[1]/1000) for p in prices ]
-  s = [ p[0] for p in prices ]
-  line, = plt.plot(t, s, zorder=2)
-  line.set_color('lightblue')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# number of price points drawn, longer price series are downsampled
+MAX_POINTS = 4000
+
+# marker class -> (marker, color)
+_MARKERS = {
+  'long': ('^', 'green'),
+  'short': ('v', 'red'),
+  'close': ('.', 'blue'),
+}
 
-  # Plot order data
-  for pos in positions:
+def lttb(x, y, threshold):
+  """
+  Largest-Triangle-Three-Buckets downsampling. The points between the first
+  and the last are split into threshold - 2 buckets and the point of each
+  bucket which forms the largest triangle with the previously kept point and
+  the average of the next bucket is kept, preserving the peaks and troughs
+  of the series.
+
+  @param x: NumPy array of x values sorted ascending
+  @param y: NumPy array of y values
+  @param threshold: number of points to keep
+  @return NumPy array of the indexes of the kept points
+  """
+  n = len(x)
+  if threshold >= n or threshold < 3:
+    return np.arange(n)
+  x = np.asarray(x, dtype=np.float64)
+  y = np.asarray(y, dtype=np.float64)
+  every = (n - 2) / (threshold - 2)
+  edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+  edges[-1] = n - 1
+  kept = np.empty(threshold, dtype=np.int64)
+  kept[0] = 0
+  kept[-1] = n - 1
+  a = 0
+  for i in range(threshold - 2):
+    start, end = edges[i], edges[i + 1]
+    if i + 2 < len(edges):
+      next_x = x[end:edges[i + 2]].mean()
+      next_y = y[end:edges[i + 2]].mean()
+    else:
+      next_x, next_y = x[-1], y[-1]
+    # twice the area of the triangle formed with each point of the bucket
+    area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) -
+                  (x[a] - x[start:end]) * (next_y - y[a]))
+    a = start + int(np.argmax(area))
+    kept[i + 1] = a
+  return kept
+
+def get_order_markers(strategy):
+  """
+  @param strategy: Strategy whose closed positions are drawn
+  @return dict of marker class -> (mts, price) NumPy arrays of its orders
+  """
+  points = { name: ([], []) for name in _MARKERS }
+  for pos in strategy.closedPositions:
     orders = list(pos.orders.values())
     for index, order in enumerate(orders):
-      if order.amount_filled > 0:
-        marker = "^"
-        color = "green"
+      # the last order closes the position
+      if index == len(orders) - 1:
+        name = 'close'
       else:
-        marker = "v"
-        color = "red"
-      # if order closes position
-      if index == len(orders) -1:
-        marker = "."
-        color = "blue"
-      plt.scatter(datetime.datetime.fromtimestamp(order.mts_create/1000), order.price_avg, s=50,
-                  c=color, marker=marker, zorder=5)
+        name = 'long' if order.amount_filled > 0 else 'short'
+      points[name][0].append(order.mts_create)
+      points[name][1].append(order.price_avg)
+  return { name: (np.array(mts, dtype='datetime64[ms]'), np.array(prices, dtype=np.float64))
+           for name, (mts, prices) in points.items() }
+
+def draw_orders_chart(ax, mts, prices, strategy, max_points=MAX_POINTS):
+  """
+  Draw the prices, downsampled to max_points, and one scatter of each class
+  of order marker onto the axes
+
+  @param ax: matplotlib Axes
+  @param mts: candle timestamps sorted oldest first
+  @param prices: close price of each candle
+  @param strategy: Strategy whose closed positions are drawn
+  """
+  mts = np.asarray(mts, dtype=np.int64)
+  prices = np.asarray(prices, dtype=np.float64)
+  kept = lttb(mts, prices, max_points)
+  line, = ax.plot(mts[kept].astype('datetime64[ms]'), prices[kept], zorder=2)
+  line.set_color('lightblue')
+  for name, (order_mts, order_prices) in get_order_markers(strategy).items():
+    if len(order_mts):
+      marker, color = _MARKERS[name]
+      ax.scatter(order_mts, order_prices, s=50, c=color, marker=marker, zorder=5)
+
+def save_orders_chart(file, mts, prices, strategy, max_points=MAX_POINTS,
+    size=(16, 9), dpi=100):
+  """
+  Render the chart without a display, the format is taken from the file
+  extension i.e .png or .svg
+
+  @param file: path of the chart
+  """
+  # a Figure on an Agg canvas, rather than pyplot, needs no gui backend
+  fig = Figure(figsize=size, dpi=dpi)
+  FigureCanvasAgg(fig)
+  draw_orders_chart(fig.subplots(), mts, prices, strategy, max_points)
+  fig.savefig(file)
+
+def show_orders_chart(mts, prices, strategy, max_points=MAX_POINTS):
+  """
+  @param mts: candle timestamps sorted oldest first
+  @param prices: close price of each candle
+  @param strategy: Strategy whose closed positions are drawn
+  """
+  # only import pyplot, which picks a gui backend, when a window is shown
+  import matplotlib.pyplot as plt
+  _, ax = plt.subplots()
+  draw_orders_chart(ax, mts, prices, strategy, max_points)
   plt.show()
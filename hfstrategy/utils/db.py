@@ -1,9 +1,37 @@
 from peewee import *
-import math
+import sqlite3
 import datetime
-from bfxapi import Client
+import numpy as np
 
-db = SqliteDatabase('bfx-hf-strategy.db')
+from ..utils.candle_file import write_candle_chunks
+from ..utils.candle_downloader import CandleDownloader
+
+DB_PATH = 'bfx-hf-strategy.db'
+# WAL lets any number of backtest processes read while a fetch writes, and
+# with it synchronous=normal only syncs at checkpoints without risking
+# corruption. 64MB page cache and up to 1GB of the file memory-mapped.
+DB_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64 * 1024,
+    'mmap_size': 1 << 30,
+}
+# candles inserted per transaction by store_candles
+STORE_BATCH_SIZE = 50000
+
+db = SqliteDatabase(DB_PATH, pragmas=DB_PRAGMAS)
+
+def configure_db(path=DB_PATH, pragmas=None):
+    """
+    Point the candle database at another file and/or change its pragmas,
+    closing the current connection
+
+    @param path: path of the SQLite database file
+    @param pragmas: optional dict of pragmas which override DB_PRAGMAS
+    """
+    if not db.is_closed():
+        db.close()
+    db.init(path, pragmas=dict(DB_PRAGMAS, **(pragmas or {})))
 
 class BaseModel(Model):
     class Meta:
@@ -19,6 +47,11 @@ class Candle(BaseModel):
     low = FloatField()
     volume = FloatField()
 
+    class Meta:
+        indexes = (
+            (('symbol', 'tf', 'mts'), True),
+        )
+
     def to_dict(self):
         return {
             'mts': self.mts,
@@ -49,7 +82,10 @@ def tf_to_minutes(tf):
     }
     return converter[tf]
 
-def list_to_chunks(lst, n=999):
+def tf_to_mts(tf):
+    return tf_to_minutes(tf) * 60 * 1000
+
+def list_to_chunks(lst, n=STORE_BATCH_SIZE):
     for i in range(0, len(lst), n):
         yield lst[i:i + n]
 
@@ -60,110 +96,284 @@ def mts_to_datetime(mts):
 def datetime_to_mts(dt):
     return int(dt.timestamp() * 1000)
 
-def store_candles(candles, symbol, tf):
-    data_source = [{
-        'symbol': symbol,
-        'tf': tf,
-        'mts': candle[0],
-        'open': candle[1],
-        'close': candle[2],
-        'high': candle[3],
-        'low': candle[4],
-        'volume': candle[5]
-    } for candle in candles]
-
-    for chunk in list_to_chunks(data_source):
-        with db.atomic():
-            Candle.insert_many(chunk).execute()
+class ConflictResolution:
+    """ What store_candles() does with a candle that is already stored """
+    # overwrite the stored candle, i.e when the last candle was still open
+    REPLACE = 'REPLACE'
+    # keep the stored candle
+    IGNORE = 'IGNORE'
+
+def _insert_candle_sql(on_conflict):
+    """
+    @return the parameterized INSERT statement of a single candle, as
+      generated by peewee, for the given ConflictResolution
+    """
+    fields = [Candle.symbol, Candle.tf, Candle.mts, Candle.open, Candle.close,
+              Candle.high, Candle.low, Candle.volume]
+    query = Candle.insert_many([('', '', 0, 0, 0, 0, 0, 0)], fields=fields)
+    if on_conflict == ConflictResolution.REPLACE:
+        query = query.on_conflict_replace()
+    elif on_conflict == ConflictResolution.IGNORE:
+        query = query.on_conflict_ignore()
+    else:
+        raise ValueError("Unknown conflict resolution {}".format(on_conflict))
+    sql, _ = query.sql()
+    return sql
+
+def store_candles(candles, symbol, tf, on_conflict=ConflictResolution.REPLACE,
+                  batch_size=STORE_BATCH_SIZE):
+    """
+    Upsert candles on the unique (symbol, tf, mts) index so overlapping
+    fetches don't store duplicates. The rows are bound to a single prepared
+    statement with executemany, batch_size rows per transaction, which is
+    an order of magnitude faster than Candle.insert_many.
+
+    @param candles: list of [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows
+    @param on_conflict: ConflictResolution
+    """
+    database = Candle._meta.database
+    sql = _insert_candle_sql(on_conflict)
+    for chunk in list_to_chunks(candles, batch_size):
+        with database.atomic():
+            database.cursor().executemany(
+                sql, [(symbol, tf, c[0], c[1], c[2], c[3], c[4], c[5]) for c in chunk])
 
     print(f"Database updated")
 
-def find_fetched_candles_intervals(symbol, tf):
-    minutes = tf_to_minutes(tf)
-    candles = [candle for candle in
-               Candle.select().where(symbol == symbol, tf == tf).order_by(
-                   Candle.mts)]
+# LAG() and the other window functions were added in SQLite 3.25.0
+SQLITE_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+# the gaps between consecutive candles of more than one timeframe, LAG pairs
+# each candle with the one before it while walking the (symbol, tf, mts) index
+CANDLE_GAPS_SQL = """
+SELECT previous, mts FROM (
+    SELECT mts, LAG(mts) OVER (ORDER BY mts) AS previous
+    FROM {table} WHERE symbol = ? AND tf = ? AND mts BETWEEN ? AND ?
+) WHERE mts - previous > ?
+"""
+
+def find_fetched_candles_intervals(symbol, tf, from_date=None, end_date=None):
+    """
+    Find the intervals of consecutive candles stored for a symbol and
+    timeframe. SQLite finds the gaps between them on the (symbol, tf, mts)
+    index so only the interval boundaries are read, not the candles. On
+    SQLite older than 3.25 the gaps are found by reading every candle.
+
+    @param from_date: optional mts, only candles from it are considered
+    @param end_date: optional mts, only candles up to it are considered
+    @return list of {'start': mts, 'end': mts} sorted by start
+    """
+    from_date = -2 ** 63 if from_date is None else from_date
+    end_date = 2 ** 63 - 1 if end_date is None else end_date
+    query = Candle.select(fn.MIN(Candle.mts), fn.MAX(Candle.mts)).where(
+        Candle.symbol == symbol, Candle.tf == tf,
+        Candle.mts.between(from_date, end_date))
+    first, last = query.tuples().get()
+    if first is None:
+        return []
+    if SQLITE_WINDOW_FUNCTIONS:
+        sql = CANDLE_GAPS_SQL.format(table=Candle._meta.table_name)
+        gaps = Candle._meta.database.execute_sql(
+            sql, (symbol, tf, from_date, end_date, tf_to_mts(tf)))
+    else:
+        gaps = _scan_candle_gaps(symbol, tf, from_date, end_date)
     intervals = []
-    interval = []
-    previous_candle_dt = None
-    for candle in candles:
-        candle_dt = mts_to_datetime(candle.mts)
-        if not previous_candle_dt:
-            interval.append(candle)
-        else:
-            if (candle_dt - previous_candle_dt).total_seconds() / 60 == minutes:
-                interval.append(candle)
-            elif (candle_dt - previous_candle_dt).total_seconds() / 60 > minutes:
-                intervals.append(interval)
-                interval = [candle]
-        previous_candle_dt = candle_dt
-    intervals.append(interval)
-
-    clean_intervals = []
-    for interval in intervals:
-        if len(interval) > 0:
-            start = mts_to_datetime(interval[0].mts)
-            end = mts_to_datetime(interval[-1].mts)
-            clean_intervals.append({'start': start, 'end': end})
+    start = first
+    for previous, mts in gaps:
+        intervals.append({'start': start, 'end': previous})
+        start = mts
+    intervals.append({'start': start, 'end': last})
+    return intervals
 
-    return clean_intervals
+def _scan_candle_gaps(symbol, tf, from_date, end_date):
+    # reads every candle of the range, for SQLite versions without LAG()
+    step = tf_to_mts(tf)
+    query = Candle.select(Candle.mts).where(
+        Candle.symbol == symbol, Candle.tf == tf,
+        Candle.mts.between(from_date, end_date)).order_by(Candle.mts)
+    previous = None
+    for (mts,) in query.tuples().iterator():
+        if previous is not None and mts - previous > step:
+            yield previous, mts
+        previous = mts
 
 def get_missing_candles_intervals(from_date, end_date, symbol, tf):
-    minutes = tf_to_minutes(tf)
-    fetched_intervals = find_fetched_candles_intervals(symbol, tf)
+    step = tf_to_mts(tf)
+    fetched_intervals = find_fetched_candles_intervals(symbol, tf, from_date, end_date)
     missing_intervals = []
 
     for interval in fetched_intervals:
-        if (interval['start'] - mts_to_datetime(from_date)).total_seconds() / 60 > minutes:
-            missing_intervals.append({'start': from_date, 'end': datetime_to_mts(interval['start'])})
-        from_date = datetime_to_mts(interval['end'])
+        if interval['start'] - from_date > step:
+            missing_intervals.append({'start': from_date, 'end': interval['start']})
+        from_date = max(from_date, interval['end'])
 
-        if end_date < from_date:
-            break
-
-    if from_date < end_date and (mts_to_datetime(end_date) - mts_to_datetime(from_date)).total_seconds() / 60 > minutes:
+    if end_date - from_date > step:
         missing_intervals.append({'start': from_date, 'end': end_date})
 
     return missing_intervals
 
-async def fetch_candles(from_date, end_date, symbol, tf):
-    bfx = Client(logLevel='DEBUG')
-    candles = []
-    minutes = tf_to_minutes(tf)
+def get_candle_pages(intervals, tf, page_size=10000):
+    """
+    Split intervals into the ranges of at most page_size candles which are
+    requested from the api, ranges in the future are cut at the current time
+
+    @param intervals: list of {'start': mts, 'end': mts}
+    @return list of (start, end) mts
+    """
+    step = tf_to_mts(tf)
+    now = datetime_to_mts(datetime.datetime.now())
+    pages = []
+    for interval in intervals:
+        start, end = interval['start'], min(interval['end'], now)
+        while start <= end:
+            pages.append((start, min(start + (page_size - 1) * step, end)))
+            start += page_size * step
+    return pages
+
+async def fetch_intervals(intervals, symbol, tf, downloader=None):
+    """
+    Download the candles of the intervals and store each page of candles as
+    it arrives. As every page is stored, fetching missing candles again after
+    an interruption carries on from the pages which were downloaded.
+
+    @param downloader: optional CandleDownloader, i.e to share its client
+      and rate limit between symbols
+    @return number of candles fetched
+    """
+    downloader = downloader or CandleDownloader()
+    pages = get_candle_pages(intervals, tf, downloader.page_size)
+    done = 0
+
+    def on_page(start, end, candles):
+        nonlocal done
+        done += 1
+        store_candles(candles, symbol, tf)
+        print(f'Fetched {len(candles)} candles from {mts_to_datetime(start)} to {mts_to_datetime(end)} | {symbol} | {tf} | page {done}/{len(pages)}')
+
+    return await downloader.download(symbol, tf, pages, on_page)
+
+async def fetch_candles(from_date, end_date, symbol, tf, downloader=None):
     print(f'Fetching from {mts_to_datetime(from_date)} to {mts_to_datetime(end_date)} | {symbol} | {tf}')
-    step = math.floor(10000 * minutes)
-    while from_date < end_date:
-        end_of_interval = mts_to_datetime(from_date) + datetime.timedelta(minutes=step)
-        now = datetime.datetime.now()
-
-        if end_of_interval > now:
-            end_of_interval_ts = datetime_to_mts(now)
-        else:
-            end_of_interval_ts = datetime_to_mts(end_of_interval)
-        response = None
-        while not response:
-            try:
-                response = await bfx.rest.get_public_candles(symbol=symbol, start=from_date, end=end_of_interval_ts,
-                                                             tf=tf, limit=10000)
-                print(f'Fetched {len(response)} candles')
-            except:
-                print('Rate limit reached | Sleeping and trying again...')
-        candles += response
-        from_date = end_of_interval_ts
-    store_candles(candles, symbol, tf)
-    return candles
-
-async def get_candles(from_date, end_date, symbol, tf):
+    return await fetch_intervals([{'start': from_date, 'end': end_date}], symbol, tf, downloader)
+
+async def fetch_missing_candles(from_date, end_date, symbol, tf, downloader=None):
+    """
+    Fetch and store the candles of the range which aren't in the database,
+    the missing intervals are downloaded concurrently
+
+    @param downloader: optional CandleDownloader
+    """
     print(f"Getting candles from {mts_to_datetime(from_date)} to {mts_to_datetime(end_date)}")
     missing_intervals = get_missing_candles_intervals(from_date, end_date, symbol, tf)
     for interval in missing_intervals:
         print(f"Data missing - Fetching -> Interval start: {mts_to_datetime(interval['start'])} | Interval end: {mts_to_datetime(interval['end'])}")
-        await fetch_candles(interval['start'], interval['end'], symbol, tf)
-    candles = [candle.to_list() for candle in
-               Candle.select().where(from_date <= Candle.mts <= end_date, Candle.symbol == symbol, Candle.tf == tf).order_by(
-                   Candle.mts)]
-    return candles
-
-async def initialize_db():
-    db.connect()
+    if missing_intervals:
+        await fetch_intervals(missing_intervals, symbol, tf, downloader)
+
+def _candles_query(symbol, tf, from_date=None, end_date=None):
+    query = Candle.select(Candle.mts, Candle.open, Candle.close, Candle.high,
+                          Candle.low, Candle.volume).where(
+        Candle.symbol == symbol, Candle.tf == tf)
+    if from_date is not None:
+        query = query.where(Candle.mts >= from_date)
+    if end_date is not None:
+        query = query.where(Candle.mts <= end_date)
+    return query.order_by(Candle.mts)
+
+def iter_candle_batches(from_date, end_date, symbol, tf, batch_size=10000):
+    """
+    Read the stored candles of a range straight from the database cursor,
+    batch_size rows at a time, without creating a Candle model per row
+
+    @param from_date: mts of the first candle, or None
+    @param end_date: mts of the last candle, or None
+    @return generator of lists of (mts, open, close, high, low, volume)
+      tuples sorted oldest first
+    """
+    cursor = Candle._meta.database.execute(
+        _candles_query(symbol, tf, from_date, end_date))
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+def iter_candles(from_date, end_date, symbol, tf, batch_size=10000):
+    """
+    @return generator of (mts, open, close, high, low, volume) tuples sorted
+      oldest first, see iter_candle_batches
+    """
+    for rows in iter_candle_batches(from_date, end_date, symbol, tf, batch_size):
+        yield from rows
+
+def iter_candle_arrays(from_date, end_date, symbol, tf, batch_size=10000):
+    """
+    @return generator of (n, 6) float64 NumPy arrays of
+      [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows, see iter_candle_batches
+    """
+    for rows in iter_candle_batches(from_date, end_date, symbol, tf, batch_size):
+        yield np.array(rows, dtype=np.float64)
+
+async def get_candles(from_date, end_date, symbol, tf, downloader=None):
+    """
+    @return list of [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] lists, use
+      iter_candles to stream long ranges
+    """
+    await fetch_missing_candles(from_date, end_date, symbol, tf, downloader)
+    return [list(row) for row in iter_candles(from_date, end_date, symbol, tf)]
+
+def export_candle_file(path, symbol, tf, from_date=None, end_date=None, chunk_size=10000):
+    """
+    Write the stored candles of a symbol and timeframe to a memory-mapped
+    candle file, reading chunk_size rows from the database at a time
+
+    @param path: path of the new candle file
+    @param from_date: optional mts of the first candle
+    @param end_date: optional mts of the last candle
+    @return CandleFile
+    """
+    count = _candles_query(symbol, tf, from_date, end_date).count()
+    chunks = iter_candle_batches(from_date, end_date, symbol, tf, chunk_size)
+    return write_candle_chunks(path, chunks, count, symbol, tf)
+
+def deduplicate_candles(database=db):
+    """
+    One-shot migration of databases created before the (symbol, tf, mts)
+    index was unique: keeps the last stored copy of every duplicated candle
+    and replaces a non-unique index. Does nothing once the unique index
+    exists.
+
+    @return number of duplicate candles deleted
+    """
+    table = Candle._meta.table_name
+    if not database.table_exists(table):
+        return 0
+    index_name = '{}_symbol_tf_mts'.format(table)
+    for index in database.get_indexes(table):
+        if index.name == index_name:
+            if index.unique:
+                return 0
+            database.execute_sql('DROP INDEX "{}"'.format(index_name))
+    with database.atomic():
+        cursor = database.execute_sql(
+            'DELETE FROM "{0}" WHERE id NOT IN '
+            '(SELECT MAX(id) FROM "{0}" GROUP BY symbol, tf, mts)'.format(table))
+        deleted = cursor.rowcount
+        database.execute_sql('CREATE UNIQUE INDEX "{}" ON "{}" (symbol, tf, mts)'.format(
+            index_name, table))
+    if deleted:
+        print(f"Removed {deleted} duplicate candles")
+    return deleted
+
+async def initialize_db(path=None):
+    """
+    @param path: optional path of the database file, see configure_db
+    """
+    if path is not None:
+        configure_db(path)
+    db.connect(reuse_if_open=True)
+    deduplicate_candles(db)
     db.create_tables([Candle])
@@ -0,0 +1,218 @@
+from array import array
+
+import numpy as np
+
+from ..models import Events
+
+# milliseconds in a year, used to annualise the per candle ratios
+YEAR_MTS = 365 * 24 * 60 * 60 * 1000
+
+class EquityCurve:
+  """
+  The mark-to-market equity of a backtest sampled at the close of every
+  candle of the strategy's default symbol, as NumPy arrays:
+
+  mts, price (close), high, low: the candles
+  amount, entry: the size and average price of the open position of the
+    default symbol after the candle, zero if there was none
+  equity: net P/L of the closed positions, plus the realised P/L less fees
+    and the unrealised P/L of the open default symbol position. Positions in
+    other symbols count once they are closed
+  mae, mfe: maximum adverse and favorable excursion of each default symbol
+    position, in the order they were opened (and closed), measured on the
+    high/low of the candles the position was held over. The candle a
+    position was opened on only counts its close.
+
+  Every metric is calculated with NumPy so they stay fast on backtests of
+  millions of candles.
+  """
+
+  def __init__(self, mts, price, high, low, amount, entry, equity, mae, mfe):
+    self.mts = mts
+    self.price = price
+    self.high = high
+    self.low = low
+    self.amount = amount
+    self.entry = entry
+    self.equity = equity
+    self.mae = mae
+    self.mfe = mfe
+
+  def __len__(self):
+    return len(self.mts)
+
+  def get_drawdown(self):
+    """
+    @return NumPy array of the drawdown from the highest equity so far at
+      each candle, the equity starts at zero which is also a peak
+    """
+    peak = np.maximum.accumulate(np.maximum(self.equity, 0))
+    return peak - self.equity
+
+  def get_drawdown_durations(self):
+    """
+    @return NumPy array of the time, in ms, since the equity was last at its
+      peak at each candle
+    """
+    if not len(self):
+      return np.zeros(0, dtype=np.int64)
+    peak = np.maximum.accumulate(np.maximum(self.equity, 0))
+    at_peak = np.where(self.equity >= peak, np.arange(len(self)), 0)
+    return self.mts - self.mts[np.maximum.accumulate(at_peak)]
+
+  def get_returns(self, starting_balance=None):
+    """
+    @param starting_balance: optional balance, when given the returns are a
+      fraction of the balance at the start of each candle rather than P/L
+    @return NumPy array of the return over each candle
+    """
+    equity = np.concatenate(([0.0], self.equity))
+    if starting_balance is None:
+      return np.diff(equity)
+    balance = starting_balance + equity
+    return np.diff(balance) / balance[:-1]
+
+  def get_periods_per_year(self):
+    if len(self) < 2:
+      return 0.0
+    return YEAR_MTS / float(np.median(np.diff(self.mts)))
+
+  def get_risk_metrics(self, starting_balance=None, periods_per_year=None):
+    """
+    @param starting_balance: optional balance used to calculate the returns,
+      see get_returns
+    @param periods_per_year: candles per year used to annualise the Sharpe and
+      Sortino ratios, defaults to the median candle interval
+    @return dict of sharpe, sortino, max_drawdown, max_drawdown_duration (ms),
+      exposure (fraction of candles with an open position) and the average
+      mae and mfe
+    """
+    returns = self.get_returns(starting_balance)
+    if periods_per_year is None:
+      periods_per_year = self.get_periods_per_year()
+    scale = np.sqrt(periods_per_year)
+    mean = returns.mean() if len(returns) else 0.0
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2)) if len(returns) else 0.0
+    drawdown = self.get_drawdown()
+    durations = self.get_drawdown_durations()
+    return {
+      'sharpe': float(mean / std * scale) if std > 0 else 0.0,
+      'sortino': float(mean / downside * scale) if downside > 0 else 0.0,
+      'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+      'max_drawdown_duration': int(durations.max()) if len(durations) else 0,
+      'exposure': float(np.mean(self.amount != 0)) if len(self) else 0.0,
+      'average_mae': float(self.mae.mean()) if len(self.mae) else 0.0,
+      'average_mfe': float(self.mfe.mean()) if len(self.mfe) else 0.0,
+    }
+
+class EquityRecorder:
+  """
+  Records the candles of the default symbol and every change of the strategy's
+  positions during a backtest, into compact arrays which are turned into an
+  EquityCurve once the backtest is complete. Only a few values are appended
+  per candle, the equity itself is calculated afterwards with NumPy.
+  """
+
+  def __init__(self, strategy, statistics):
+    """
+    @param strategy: the backtested Strategy
+    @param statistics: BacktestStatistics attached to the strategy, used for
+      the net P/L of the closed positions
+    """
+    self.strategy = strategy
+    self.symbol = strategy.symbol
+    self.statistics = statistics
+    self._mts = array('q')
+    self._price = array('d')
+    self._high = array('d')
+    self._low = array('d')
+    # the position state from the candle at index onwards
+    self._index = array('q')
+    self._amount = array('d')
+    self._entry = array('d')
+    self._fixed = array('d')
+    self._trade = array('q')
+    self._position = None
+    self._trades = 0
+    # realised P/L less fees of the open default symbol position
+    self._open_pl = 0.0
+    self._record_state(0.0, 0.0, -1)
+
+  def _record_state(self, amount, entry, trade):
+    self._index.append(len(self._mts))
+    self._amount.append(amount)
+    self._entry.append(entry)
+    self._fixed.append(self.statistics.net_pl + self._open_pl)
+    self._trade.append(trade)
+
+  def add_candle(self, candle):
+    if candle['symbol'] != self.symbol:
+      return
+    self._mts.append(int(candle['mts']))
+    self._price.append(candle['close'])
+    self._high.append(candle['high'])
+    self._low.append(candle['low'])
+
+  def on_position_update(self, position):
+    if position.symbol != self.symbol:
+      # closing a position in another symbol changes the closed net P/L
+      if not position.is_open():
+        self._record_state(self._amount[-1], self._entry[-1], self._trade[-1])
+      return
+    if not position.is_open():
+      self._position = None
+      self._open_pl = 0.0
+      self._record_state(0.0, 0.0, -1)
+      return
+    if position is not self._position:
+      self._position = position
+      self._trades += 1
+    self._open_pl = position.get_realised_profit_loss() - position.total_fees
+    self._record_state(position.amount, position.price, self._trades - 1)
+
+  def attach(self):
+    self.strategy.on_position_update(self.on_position_update)
+    return self
+
+  def detach(self):
+    self.strategy.events.remove_listener(Events.ON_POSITION_UPDATE, self.on_position_update)
+
+  def get_curve(self):
+    """
+    @return EquityCurve
+    """
+    mts = np.frombuffer(self._mts, dtype=np.int64)
+    price = np.frombuffer(self._price, dtype=np.float64)
+    high = np.frombuffer(self._high, dtype=np.float64)
+    low = np.frombuffer(self._low, dtype=np.float64)
+    # the last state recorded at or before each candle
+    state = np.searchsorted(np.frombuffer(self._index, dtype=np.int64),
+      np.arange(len(mts)), side='right') - 1
+    amount = np.frombuffer(self._amount, dtype=np.float64)[state]
+    entry = np.frombuffer(self._entry, dtype=np.float64)[state]
+    fixed = np.frombuffer(self._fixed, dtype=np.float64)[state]
+    trade = np.frombuffer(self._trade, dtype=np.int64)[state]
+    equity = fixed + amount * (price - entry)
+    mae, mfe = self._get_excursions(price, high, low, amount, entry, trade)
+    return EquityCurve(mts, price, high, low, amount, entry, equity, mae, mfe)
+
+  def _get_excursions(self, price, high, low, amount, entry, trade):
+    mae = np.zeros(self._trades)
+    mfe = np.zeros(self._trades)
+    held = np.flatnonzero(trade >= 0)
+    if not len(held):
+      return mae, mfe
+    trade = trade[held]
+    starts = np.flatnonzero(np.diff(trade, prepend=-1))
+    high = high[held].copy()
+    low = low[held].copy()
+    # the candle a position was opened on may have moved before the entry
+    high[starts] = low[starts] = price[held][starts]
+    from_high = amount[held] * (high - entry[held])
+    from_low = amount[held] * (low - entry[held])
+    worst = np.minimum(from_high, from_low)
+    best = np.maximum(from_high, from_low)
+    mae[trade[starts]] = np.minimum(np.minimum.reduceat(worst, starts), 0)
+    mfe[trade[starts]] = np.maximum(np.maximum.reduceat(best, starts), 0)
+    return mae, mfe
@@ -1,29 +1,81 @@
-import json
+import os
+import time
+import heapq
+import datetime
 import asyncio
+import numpy as np
 import websockets
 import signal
 import sys
 
-from prettytable import PrettyTable
 from bfxapi import Client
 from pyee import EventEmitter
 
 from ..utils.db import *
 from ..utils.custom_logger import CustomLogger
-from ..utils.mock_websocket_client import MockClient
+from ..utils.mock_websocket_client import MockClient, InlineMockWebsocket
 from ..utils.mock_order_manager import MockOrderManager
 from ..strategy.order_manager import OrderManager
-from ..utils.charts import show_orders_chart
+from ..strategy.event_dispatcher import DispatchMode
+from ..strategy.trade_candle_builder import TradeCandleBuilder
+from ..utils.charts import show_orders_chart, save_orders_chart
+from ..utils.backtest_result import BacktestStatistics, BacktestResult
+from ..utils.equity_curve import EquityRecorder
+from ..utils.trade_log import TradeLog, create_trade_sink
+from ..utils.candle_downloader import CandleDownloader
+from ..utils.candle_loader import iter_json_rows, iter_json_row_chunks
+from ..utils.candle_file import CandleFile, is_candle_file, iter_array_rows
 
 logger = CustomLogger('HFExecutor', logLevel='INFO')
 
-async def _process_candle_batch(strategy, candles):
+class BacktestEngine:
+  """ How an offline backtest drives the strategy """
+  # fills are scheduled on the event loop, which is given a turn after each
+  # candle/trade until they have been processed
+  EVENT_LOOP = 'EVENT_LOOP'
+  # step through the data without returning to the event loop, listeners
+  # run one after another and fills are processed as soon as they happen
+  FAST = 'FAST'
+
+async def _next_step(strategy, engine):
+  # only return to the loop while fills scheduled on the mock socket are
+  # being processed so positions are up to date before the next candle
+  if engine == BacktestEngine.EVENT_LOOP and strategy.orderManager.ws.has_pending():
+    await asyncio.sleep(0)
+
+async def _process_candle_batch(strategy, candles, engine=BacktestEngine.EVENT_LOOP,
+    on_candle=None):
   await strategy._ready()
   for c in candles:
     await strategy._process_new_candle(c)
+    if on_candle:
+      on_candle(c)
+    await _next_step(strategy, engine)
+  await _finish_batch(strategy)
+
+async def _process_trade_with_candles(strategy, builder, trade, on_candle=None):
+  # completed candles belong to an earlier period than the trade
+  for candle in builder.add(trade):
+    await strategy._process_new_candle(candle)
+    if on_candle:
+      on_candle(candle)
+  await strategy._process_new_trade(trade)
+
+async def _process_trade_batch(strategy, trades, builder, on_candle=None,
+    engine=BacktestEngine.EVENT_LOOP):
+  await strategy._ready()
+  for t in trades:
+    await _process_trade_with_candles(strategy, builder, t, on_candle)
+    await _next_step(strategy, engine)
+  for candle in builder.flush():
+    await strategy._process_new_candle(candle)
+    if on_candle:
+      on_candle(candle)
+  await _finish_batch(strategy)
+
+async def _finish_batch(strategy):
   async def call_finish():
     await strategy.close_open_positions()
-    _finish(strategy)
   # call via event emitter so it scheduled correctly
   strategy.on("done", call_finish)
   await strategy._emit("done")
@@ -40,101 +92,258 @@ def _format_candle(mts, open, close, high, low, volume, symbol, tf):
     'tf': tf,
   }
 
-def _logTrades(positions):
-  x = PrettyTable()
-  x.field_names = ["Date", "Symbol", "Direction", "Amount", "Price", "Fee", "P&L", "Label"]
-  for pos in positions:
-    for i, o in enumerate(list(pos.orders.values())):
-      # lastItem = i+1 == len(pos.orders)
-      direction = "SHORT" if o.amount_filled < 0 else "LONG"
-      pl = pos.realised_profit_loss.get(o.id, 0)
-      x.add_row([o.date, pos.symbol, direction, o.amount_filled, round(o.price_avg, 2),
-                round(o.fee, 2), pl, o.tag])
-  print(x)
-
-def _finish(strategy):
+def _format_candles(rows, symbol, tf):
+  for mts, open, close, high, low, volume in rows:
+    yield _format_candle(mts, open, close, high, low, volume, symbol, tf)
+
+def _get_event_loop():
+  try:
+    return asyncio.get_event_loop()
+  except RuntimeError:
+    # the loop of this thread has been closed and unset, i.e by asyncio.run()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+def _read_candle_file(file):
+  """
+  Load a json file of candles, sorted either newest or oldest first
+
+  @return NumPy array of [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows sorted
+    oldest first
+  """
+  chunks = [np.array(rows, dtype=np.float64) for rows in iter_json_row_chunks(file)]
+  if not chunks:
+    return np.empty((0, 6))
+  return np.concatenate(chunks)
+
+def _candle_rows(candleData):
+  if isinstance(candleData, CandleFile):
+    return candleData.iter_rows()
+  if isinstance(candleData, np.ndarray):
+    return iter_array_rows(candleData)
+  return candleData
+
+def _format_trade(mts, amount, price, symbol):
+  return {
+    'mts': mts,
+    'amount': amount,
+    'price': price,
+    'symbol': symbol,
+  }
+
+def _finish(strategy, statistics=None, equity=None, trade_logger=None):
+  """
+  Print the last trades and a summary of the closed positions
+
+  @param statistics: BacktestStatistics of the closed positions, calculated
+    from strategy.closedPositions if not given
+  @param equity: optional EquityCurve of the backtest
+  @param trade_logger: optional TradeLog whose last fills are printed
+  """
   print ("\nBacktesting complete: \n")
-  total_gross_profit_loss = 0
-  total_net_profit_loss = 0
-  total_fees = 0
-  totalTrades = 0
-  totalVolume = 0
-  positions = strategy.closedPositions
-  minProfitLoss = 0
-  maxProfitLoss = 0
-  totalLossesCount = 0
-  totalLosses = 0
-  totalGainersCount = 0
-  totalGainers = 0
-
-  for pos in positions:
-    current_gross_pl = pos.get_profit_loss()['gross']
-    total_gross_profit_loss += current_gross_pl
-    total_net_profit_loss += pos.get_profit_loss()['net']
-    total_fees += pos.total_fees
-    totalTrades += len(pos.orders)
-    totalVolume += pos.volume
-    net_pl = pos.get_realised_profit_loss()
-
-    if current_gross_pl < 0:
-      totalLossesCount += 1
-      totalLosses += current_gross_pl
-    else:
-      totalGainersCount += 1
-      totalGainers += current_gross_pl
-    minProfitLoss = current_gross_pl if current_gross_pl < minProfitLoss else minProfitLoss
-    maxProfitLoss = current_gross_pl if current_gross_pl > maxProfitLoss else maxProfitLoss
-  
-  if not positions:
+  if statistics is None:
+    statistics = BacktestStatistics().attach(strategy)
+    statistics.detach(strategy)
+
+  if not statistics.positions:
     logger.info("No closed positions recorded.")
     return
 
-  _logTrades(positions)
-  print('')
+  if trade_logger is not None and trade_logger.get_last_fills():
+    print("Last {} of {} trades:".format(
+      len(trade_logger.get_last_fills()), trade_logger.fills))
+    print(trade_logger.to_table())
+    print('')
 
   logger.info("Net P/L {} | Gross P/L {} | Vol {} | Fees {}".format(
-    round(total_net_profit_loss, 2), round(total_gross_profit_loss, 2),
-    round(totalVolume, 2), round(total_fees, 2)))
+    round(statistics.net_pl, 2), round(statistics.gross_pl, 2),
+    round(statistics.volume, 2), round(statistics.fees, 2)))
   logger.info("Min P/L {} | Max P/L {} | Avg P/L {}".format(
-    round(minProfitLoss, 2), round(maxProfitLoss, 2), 
-    round(total_gross_profit_loss / totalTrades, 2)))
+    round(statistics.min_pl, 2), round(statistics.max_pl, 2),
+    round(statistics.get_average_pl(), 2)))
   logger.info("Losses {} (total {}) | Gains {} (total {})".format(
-    totalLossesCount, round(totalLosses, 2), totalGainersCount,
-    round(totalGainers, 2)))
-  logger.info("{} Positions | {} Trades".format(len(positions), totalTrades))
-
-async def _seed_candles(strategy, bfxapi, tf):
-  seed_candles = await bfxapi.rest.get_seed_candles(strategy.symbol, tf=tf)
-  candles = map(lambda candleArray: _format_candle(
-    candleArray[0], candleArray[1], candleArray[2], candleArray[3],
-    candleArray[4], candleArray[5], strategy.symbol, tf
-  ), seed_candles)
-  for candle in candles:
-    strategy._process_new_seed_candle(candle)
+    statistics.losses, round(statistics.total_losses, 2), statistics.gains,
+    round(statistics.total_gains, 2)))
+  logger.info("{} Positions | {} Trades".format(statistics.positions, statistics.trades))
+  if equity is not None:
+    metrics = equity.get_risk_metrics()
+    logger.info("Sharpe {} | Sortino {} | Exposure {}%".format(
+      round(metrics['sharpe'], 2), round(metrics['sortino'], 2),
+      round(metrics['exposure'] * 100, 2)))
+    logger.info("Max drawdown {} ({}) | Avg MAE {} | Avg MFE {}".format(
+      round(metrics['max_drawdown'], 2),
+      datetime.timedelta(milliseconds=metrics['max_drawdown_duration']),
+      round(metrics['average_mae'], 2), round(metrics['average_mfe'], 2)))
+
+async def _seed_candles(strategy, bfxapi, tf, resume_from=None):
+  """
+  Seed the strategy with historical candles, oldest first. If resume_from (a
+  dict of symbol to the mts of the last candle restored from a checkpoint)
+  contains a symbol only the candles after that mts are fetched.
+  """
+  resume_from = resume_from or {}
+  now = int(round(time.time() * 1000))
+  for symbol in strategy.get_symbols():
+    last_mts = resume_from.get(symbol)
+    if last_mts:
+      seed_candles = await bfxapi.rest.get_seed_candles(
+        symbol, tf=tf, start=last_mts + 1, end=now, sort=1)
+    else:
+      # the latest candles come newest first, sort=1 would fetch the oldest
+      seed_candles = await bfxapi.rest.get_seed_candles(symbol, tf=tf)
+    # indicators and timeframe candles have to be built oldest first
+    seed_candles = sorted(seed_candles, key=lambda candleArray: candleArray[0])
+    candles = map(lambda candleArray: _format_candle(
+      candleArray[0], candleArray[1], candleArray[2], candleArray[3],
+      candleArray[4], candleArray[5], symbol, tf
+    ), seed_candles)
+    for candle in candles:
+      strategy._process_new_seed_candle(candle)
 
 class Executor:
+  Engine = BacktestEngine()
 
-  def __init__(self, strategy, timeframe='1hr', show_chart=True):
+  def __init__(self, strategy, timeframe='1hr', show_chart=True, trade_candles=None,
+      trade_coalescer=None, checkpoint=None, checkpoint_interval=60,
+      engine=BacktestEngine.EVENT_LOOP, record_equity=True, trade_log=None,
+      trade_summary=20, chart_file=None):
+    """
+    @param strategy: the Strategy to execute
+    @param timeframe: string timeframe of the candles i.e '1h'
+    @param show_chart: draw the orders chart once the backtest is complete
+    @param trade_candles: optional TradeCandleBuilder, when set live/backtest_live
+      build candles from the trades channel instead of subscribing to candles
+    @param trade_coalescer: optional TradeCoalescer, when set live/backtest_live
+      pass bursts of trades to the strategy in batches
+    @param checkpoint: optional file path, when set live/backtest_live restore the
+      strategy from it on start and save to it periodically and on SIGINT
+    @param checkpoint_interval: seconds between checkpoints, None to only save
+      on SIGINT
+    @param engine: BacktestEngine used by offline/offline_trades/with_local_database
+    @param record_equity: record the equity curve of offline backtests, see
+      BacktestResult.equity
+    @param trade_log: optional path of a .csv, .jsonl or .bin file, or a
+      TradeSink, which every fill is written to as it happens. The sink is
+      closed once the backtest is complete
+    @param trade_summary: number of the last trades printed in the report,
+      0 to not print any
+    @param chart_file: optional .png or .svg path, when set the chart is saved
+      to it without a display instead of being shown
+    """
     self.strategy = strategy
     self.stored_prices = {}
     self.timeframe = timeframe
     self.show_chart = show_chart
+    self.trade_candles = trade_candles
+    self.trade_coalescer = trade_coalescer
+    self.checkpoint = checkpoint
+    self.checkpoint_interval = checkpoint_interval
+    self.engine = engine
+    self.record_equity = record_equity
+    self.trade_log = trade_log
+    self.trade_summary = trade_summary
+    self.chart_file = chart_file
+    self.statistics = None
+    self.equity_recorder = None
+    self.trade_logger = None
 
   def _store_candle_price(self, candle):
-    self.stored_prices[candle['mts']] = candle['close']
+    # the chart only shows the price of the default symbol
+    if candle['symbol'] == self.strategy.symbol:
+      self.stored_prices[candle['mts']] = candle['close']
 
-  def _draw_chart(self):
-    if (self.show_chart):
-      show_orders_chart(self.stored_prices, self.strategy)
+  def _draw_chart(self, equity=None):
+    if not self.show_chart:
+      return
+    if equity is not None:
+      mts, prices = equity.mts, equity.price
+    else:
+      mts = sorted(self.stored_prices)
+      prices = [self.stored_prices[m] for m in mts]
+    if self.chart_file:
+      save_orders_chart(self.chart_file, mts, prices, self.strategy)
+    else:
+      show_orders_chart(mts, prices, self.strategy)
+
+  def _create_trade_logger(self):
+    if isinstance(self.trade_log, str):
+      sinks = [create_trade_sink(self.trade_log)]
+    else:
+      sinks = [self.trade_log] if self.trade_log else []
+    return TradeLog(self.strategy, sinks, self.trade_summary).attach()
 
   def _kill_signal_handler(self, sig, frame):
-    _finish(self.strategy)
+    if self.trade_coalescer:
+      self.trade_coalescer.stop()
+    if self.checkpoint:
+      self.strategy.save_checkpoint(self.checkpoint)
+    if self.trade_logger is not None:
+      self.trade_logger.close()
+    _finish(self.strategy, self.statistics, None, self.trade_logger)
     self._draw_chart()
     sys.exit(0)
 
   def _register_log_on_sigkill(self):
     signal.signal(signal.SIGINT, self._kill_signal_handler)
 
+  async def _checkpoint_loop(self):
+    while True:
+      await asyncio.sleep(self.checkpoint_interval)
+      self.strategy.save_checkpoint(self.checkpoint)
+
+  def _restore_checkpoint(self):
+    if not self.checkpoint or not os.path.exists(self.checkpoint):
+      return None
+    return self.strategy.load_checkpoint(self.checkpoint)
+
+  def _set_backtest_order_manager(self):
+    if self.engine == BacktestEngine.FAST:
+      bfx = MockClient(ws=InlineMockWebsocket())
+    else:
+      bfx = MockClient()
+    bfxOrderManager = MockOrderManager(bfx, logLevel=self.strategy.logLevel)
+    self.strategy.set_order_manager(bfxOrderManager)
+    self.strategy.backtesting = True
+
+  def _start_backtest(self):
+    """
+    Prepare the strategy for an offline backtest
+
+    @return function to call with each candle once it has been processed
+    """
+    self._set_backtest_order_manager()
+    self.stored_prices = {}
+    self.statistics = BacktestStatistics().attach(self.strategy)
+    self.trade_logger = self._create_trade_logger()
+    self.equity_recorder = None
+    if self.record_equity:
+      self.equity_recorder = EquityRecorder(self.strategy, self.statistics).attach()
+      # the recorded prices are also used to draw the chart
+      return self.equity_recorder.add_candle
+    return self._store_candle_price if self.show_chart else None
+
+  async def _run_backtest(self, coroutine, report=True):
+    mode = self.strategy.events.mode
+    if self.engine == BacktestEngine.FAST:
+      # gather would need a loop round trip per event to run the listeners
+      self.strategy.events.mode = DispatchMode.SEQUENTIAL
+    try:
+      await coroutine
+    finally:
+      self.strategy.events.mode = mode
+      self.statistics.detach(self.strategy)
+      self.trade_logger.detach()
+      self.trade_logger.close()
+      if self.equity_recorder is not None:
+        self.equity_recorder.detach()
+    equity = None
+    if self.equity_recorder is not None:
+      equity = self.equity_recorder.get_curve()
+    if report:
+      _finish(self.strategy, self.statistics, equity, self.trade_logger)
+    return BacktestResult(self.strategy, self.statistics, equity)
+
   def _start_bfx_ws(self, API_KEY=None, API_SECRET=None, backtesting=False):
     bfx = Client(
       API_KEY,
@@ -155,64 +364,158 @@ class Executor:
       bfxOrderManager = OrderManager(bfx, logLevel=self.strategy.logLevel)
       bfx.ws.on('authenticated', self.strategy._ready)
     self.strategy.set_order_manager(bfxOrderManager)
+    # restore the previous state so only newer candles need to be seeded
+    resume_from = self._restore_checkpoint()
+    self.statistics = BacktestStatistics().attach(self.strategy)
+    self.trade_logger = self._create_trade_logger()
     # Start seeding cancles
-    t = asyncio.ensure_future(_seed_candles(self.strategy, bfx, self.timeframe))
+    t = asyncio.ensure_future(_seed_candles(
+      self.strategy, bfx, self.timeframe, resume_from=resume_from))
     asyncio.get_event_loop().run_until_complete(t)
+    if self.checkpoint and self.checkpoint_interval:
+      asyncio.ensure_future(self._checkpoint_loop())
     async def subscribe():
-      await bfx.ws.subscribe('candles', self.strategy.symbol, timeframe=self.timeframe)
-      await bfx.ws.subscribe('trades', self.strategy.symbol)
-      await bfx.ws.subscribe('book', self.strategy.symbol)
+      # all symbols share the one client, bfxapi spreads the channels
+      # over as few sockets as the per-connection limit allows
+      for symbol in self.strategy.get_symbols():
+        if not self.trade_candles:
+          await bfx.ws.subscribe('candles', symbol, timeframe=self.timeframe)
+        await bfx.ws.subscribe('trades', symbol)
+        await bfx.ws.subscribe('book', symbol)
+    async def process_trade(trade):
+      await _process_trade_with_candles(
+        self.strategy, self.trade_candles, trade, self._store_candle_price)
+    async def process_trades(trades):
+      if self.trade_candles:
+        for trade in trades:
+          for candle in self.trade_candles.add(trade):
+            self._store_candle_price(candle)
+            await self.strategy._process_new_candle(candle)
+      await self.strategy._process_new_trades(trades)
     # bind events
     bfx.ws.on('connected', subscribe)
     bfx.ws.on('connected', self.strategy._connected)
-    bfx.ws.on('new_candle', self.strategy._process_new_candle)
-    bfx.ws.on('new_candle', self._store_candle_price)
-    bfx.ws.on('new_trade', self.strategy._process_new_trade)
+    if not self.trade_candles:
+      bfx.ws.on('new_candle', self.strategy._process_new_candle)
+      bfx.ws.on('new_candle', self._store_candle_price)
+    if self.trade_coalescer:
+      self.trade_coalescer.handler = process_trades
+      bfx.ws.on('new_trade', self.trade_coalescer.push)
+    elif self.trade_candles:
+      bfx.ws.on('new_trade', process_trade)
+    else:
+      bfx.ws.on('new_trade', self.strategy._process_new_trade)
     bfx.ws.run()
 
-  async def with_local_database(self, fromDate, toDate):
-    bfx = MockClient()
-    bfxOrderManager = MockOrderManager(bfx, logLevel=self.strategy.logLevel)
-    self.strategy.set_order_manager(bfxOrderManager)
-    self.strategy.backtesting = True
+  async def with_local_database(self, fromDate, toDate, batch_size=10000,
+      downloader=None):
+    """
+    Backtest on the candles stored in the local database, fetching the
+    missing ones first. The candles are streamed from the database
+    batch_size rows at a time so any range can be backtested.
+
+    @param fromDate: mts of the first candle
+    @param toDate: mts of the last candle
+    @param downloader: optional CandleDownloader used to fetch the missing
+      candles of every symbol concurrently
+    @return BacktestResult
+    """
+    on_candle = self._start_backtest()
     await initialize_db()
-    data = await get_candles(fromDate, toDate, self.strategy.symbol, self.timeframe)
-    candles = [_format_candle(
+    downloader = downloader or CandleDownloader()
+    await asyncio.gather(*[
+      fetch_missing_candles(fromDate, toDate, symbol, self.timeframe, downloader)
+      for symbol in self.strategy.get_symbols()])
+    symbol_candles = []
+    for symbol in self.strategy.get_symbols():
+      rows = iter_candles(fromDate, toDate, symbol, self.timeframe, batch_size)
+      symbol_candles.append(_format_candles(rows, symbol, self.timeframe))
+    # interleave the symbols in time order
+    candles = heapq.merge(*symbol_candles, key=lambda c: c['mts'])
+    result = await self._run_backtest(
+      _process_candle_batch(self.strategy, candles, self.engine, on_candle))
+    self._draw_chart(result.equity)
+    return result
+
+  def offline(self, file=None):
+    """
+    Backtest on a json candle file or a memory-mapped candle file (see
+    utils.candle_file)
+
+    @param file: path to the candle file
+    @return BacktestResult
+    """
+    if not file:
+      raise KeyError("Expected 'file' in parameters.")
+    if is_candle_file(file):
+      candle_file = CandleFile(file)
+      if (candle_file.symbol, candle_file.tf) != (self.strategy.symbol, self.timeframe):
+        logger.warning("Candle file {} {} does not match strategy {} {}".format(
+          candle_file.symbol, candle_file.tf, self.strategy.symbol, self.timeframe))
+      return self.offline_candles(candle_file)
+    # the file is streamed, only a chunk of it is in memory at a time
+    return self.offline_candles(iter_json_rows(file))
+
+  def offline_candles(self, candleData, report=True, seedData=None):
+    """
+    Backtest on candles which have already been loaded, i.e so that the same
+    data can be shared between many backtests
+
+    @param candleData: list, iterable, NumPy array or CandleFile of
+      [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows sorted oldest first
+    @param report: print the results of the backtest once complete
+    @param seedData: optional candles, in the same format, from before
+      candleData which are only used to seed the indicators
+    @return BacktestResult
+    """
+    on_candle = self._start_backtest()
+    if seedData is not None:
+      for candleArray in _candle_rows(seedData):
+        self.strategy._process_new_seed_candle(_format_candle(
+          candleArray[0], candleArray[1], candleArray[2], candleArray[3],
+          candleArray[4], candleArray[5], self.strategy.symbol, self.timeframe))
+    candles = (_format_candle(
       candleArray[0], candleArray[1], candleArray[2], candleArray[3],
       candleArray[4], candleArray[5], self.strategy.symbol, self.timeframe
-    ) for candleArray in data]
-    # save candles so we can draw a chart later on
-    for c in candles:
-      self.stored_prices[c['mts']] = c['close']
+    ) for candleArray in _candle_rows(candleData))
     # run async event loop
-    loop = asyncio.get_event_loop()
-    task = asyncio.ensure_future(_process_candle_batch(self.strategy, candles))
-    loop.run_until_complete(task)
-    self._draw_chart()
+    loop = _get_event_loop()
+    task = asyncio.ensure_future(self._run_backtest(
+      _process_candle_batch(self.strategy, candles, self.engine, on_candle), report))
+    result = loop.run_until_complete(task)
+    self._draw_chart(result.equity)
+    return result
 
-  def offline(self, file=None):
-    bfx = MockClient()
-    bfxOrderManager = MockOrderManager(bfx, logLevel=self.strategy.logLevel)
-    self.strategy.set_order_manager(bfxOrderManager)
-    self.strategy.backtesting = True
-    if file:
-      with open(file, 'r') as f:
-        candleData = json.load(f)
-        candleData.reverse()
-        candles = [_format_candle(
-          candleArray[0], candleArray[1], candleArray[2], candleArray[3],
-          candleArray[4], candleArray[5], self.strategy.symbol, self.timeframe
-        ) for candleArray in candleData]
-        # save candles so we can draw a chart later on
-        for c in candles:
-          self.stored_prices[c['mts']] = c['close']
-        # run async event loop
-        loop = asyncio.get_event_loop()
-        task = asyncio.ensure_future(_process_candle_batch(self.strategy, candles))
-        loop.run_until_complete(task)
-        self._draw_chart()
-    else:
+  def offline_trades(self, file=None, tf=None, volume=None):
+    """
+    Backtest on a file of recorded trades in the Bitfinex REST format
+    [[ID, MTS, AMOUNT, PRICE], ...], sorted either newest or oldest first.
+    Candles are built from the trades using either time bars of the given
+    tf or volume bars of the given volume, defaulting to the trade_candles
+    builder of the executor and then time bars of the executor timeframe.
+
+    @param file: path to the json trades file
+    @param tf: optional string timeframe of the candles i.e '1m'
+    @param volume: optional volume of each candle
+    @return BacktestResult
+    """
+    if not file:
       raise KeyError("Expected 'file' in parameters.")
+    if tf or volume:
+      builder = TradeCandleBuilder(tf=tf, volume=volume)
+    else:
+      builder = self.trade_candles or TradeCandleBuilder(tf=self.timeframe)
+    on_candle = self._start_backtest()
+    symbol = self.strategy.symbol
+    trades = (_format_trade(t[1], t[2], t[3], symbol)
+              for t in iter_json_rows(file, key=1))
+    # run async event loop
+    loop = _get_event_loop()
+    task = asyncio.ensure_future(self._run_backtest(_process_trade_batch(
+      self.strategy, trades, builder, on_candle, self.engine)))
+    result = loop.run_until_complete(task)
+    self._draw_chart(result.equity)
+    return result
 
   def backtest_live(self):
     self.strategy.backtesting = True
@@ -5,8 +5,17 @@ import asyncio
 from ..utils.custom_logger import CustomLogger
 from bfxapi.models import Order, Trade
 
+_last_order_id = 0
+
+def _generate_order_id():
+  # time based like the exchange ids but several orders can be created within
+  # the same millisecond and a repeated id would replace the previous order
+  global _last_order_id
+  _last_order_id = max(int(round(time.time() * 1000)), _last_order_id + 1)
+  return _last_order_id
+
 def generate_fake_data(symbol, price, amount, mts_create, market_type, *args, gid=None, **kwargs):
-  order_id = int(round(time.time() * 1000))
+  order_id = _generate_order_id()
   d = [order_id, gid, 3, symbol, mts_create, mts_create, 0, amount, market_type, market_type,
       None, None, None, "EXECUTED @ {}({})".format(price, amount), None, None, price,
       price, 0, 0, None, None, None, 0, 0, None, None, None, "API>BFX", None, None, None]
@@ -3,10 +3,37 @@ import asyncio
 
 from pyee import AsyncIOEventEmitter
 
+from ..strategy.event_dispatcher import EventDispatcher, DispatchMode
+
+class PendingEventEmitter(AsyncIOEventEmitter):
+  """
+  An AsyncIOEventEmitter which counts the coroutine listeners that it has
+  scheduled and which have not completed yet
+  """
+
+  def __init__(self, loop=None):
+    super(PendingEventEmitter, self).__init__(loop=loop)
+    self.pending = 0
+
+  def _emit_run(self, f, args, kwargs):
+    def run(*args, **kwargs):
+      result = f(*args, **kwargs)
+      if asyncio.iscoroutine(result):
+        self.pending += 1
+        return self._run_pending(result)
+      return result
+    super(PendingEventEmitter, self)._emit_run(run, args, kwargs)
+
+  async def _run_pending(self, coroutine):
+    try:
+      return await coroutine
+    finally:
+      self.pending -= 1
+
 class MockWebsocket():
 
   def __init__(self):
-    self.events = AsyncIOEventEmitter()
+    self.events = PendingEventEmitter()
     self.saved_items = []
     self.emitted_items = []
 
@@ -17,6 +44,10 @@ class MockWebsocket():
     self.events.once(*args, **kwargs)
 
   def _emit(self, event, *args, **kwargs):
+    self._save_emitted_item(event, *args, **kwargs)
+    self.events.emit(event, *args,  **kwargs)
+
+  def _save_emitted_item(self, event, *args, **kwargs):
     # save published items for testing
     self.emitted_items += [{
       'time': int(round(time.time() * 1000)),
@@ -26,7 +57,6 @@ class MockWebsocket():
         'kwargs': kwargs
       }
     }]
-    self.events.emit(event, *args,  **kwargs)
 
   def remove_all_listeners(self, *args, **kwargs):
     self.events.remove_all_listeners(*args, **kwargs)
@@ -37,6 +67,12 @@ class MockWebsocket():
   def submit_order(self, *args, **kawargs):
     pass
 
+  def has_pending(self):
+    """
+    @return True if listeners scheduled by _emit are still running
+    """
+    return self.events.pending > 0
+
   def get_emitted_items(self):
     return self.emitted_items
 
@@ -46,5 +82,28 @@ class MockWebsocket():
   def get_emitted_items_count(self):
     return len(self.emitted_items)
 
+class InlineMockWebsocket(MockWebsocket):
+  """
+  A MockWebsocket which runs the listeners of an event, in the order they
+  were added, before _emit returns instead of scheduling them on the event
+  loop. Used by the fast backtest engine so that a fill is processed by the
+  strategy straight away.
+  """
+
+  def __init__(self):
+    super(InlineMockWebsocket, self).__init__()
+    self.events = EventDispatcher(mode=DispatchMode.SEQUENTIAL)
+
+  async def _emit(self, event, *args, **kwargs):
+    self._save_emitted_item(event, *args, **kwargs)
+    await self.events.dispatch(event, *args, **kwargs)
+
+  def has_pending(self):
+    return False
+
 class MockClient:
-  ws = MockWebsocket()
+
+  def __init__(self, ws=None):
+    # each client needs its own socket, otherwise the listeners of every
+    # strategy in the process receive each others orders
+    self.ws = ws or MockWebsocket()
@@ -0,0 +1,173 @@
+import os
+import concurrent.futures
+
+import numpy as np
+from prettytable import PrettyTable
+
+from ..strategy.position import Position
+
+class ResampleMethod:
+  """ How the trade sequence of each Monte Carlo run is built """
+  # draw len(trades) trades with replacement
+  BOOTSTRAP = 'BOOTSTRAP'
+  # use every trade exactly once in a random order, the net P/L of every run
+  # is the same so only the drawdown and risk of ruin vary
+  SHUFFLE = 'SHUFFLE'
+
+def get_trade_profit_losses(positions):
+  """
+  @param positions: list of closed Positions i.e strategy.closedPositions
+  @return NumPy array of the net P/L of each position
+  """
+  return np.array([p.get_profit_loss()['net'] for p in positions], dtype=np.float64)
+
+class MonteCarloResults:
+  """
+  The outcome of every Monte Carlo run: NumPy arrays of the net P/L and max
+  drawdown of each run and, if a starting balance was given, whether the run
+  was ruined. original holds the same figures for the trades in the order
+  they actually happened.
+  """
+
+  def __init__(self, net_pl, max_drawdown, ruined, original):
+    self.net_pl = net_pl
+    self.max_drawdown = max_drawdown
+    self.ruined = ruined
+    self.original = original
+
+  def __len__(self):
+    return len(self.net_pl)
+
+  def confidence_interval(self, name, level=0.95):
+    """
+    @param name: 'net_pl' or 'max_drawdown'
+    @param level: fraction of the runs within the interval
+    @return tuple (low, high)
+    """
+    values = getattr(self, name)
+    tail = (1 - level) / 2 * 100
+    low, high = np.percentile(values, [tail, 100 - tail])
+    return float(low), float(high)
+
+  def get_risk_of_ruin(self):
+    """
+    @return fraction of the runs which were ruined or None if no starting
+      balance was given
+    """
+    if self.ruined is None:
+      return None
+    return float(self.ruined.mean())
+
+  def to_table(self, levels=(0.9, 0.95, 0.99)):
+    """
+    @return PrettyTable of the median and confidence intervals of each metric
+    """
+    x = PrettyTable()
+    x.field_names = ['Metric', 'Original', 'Median'] + [
+      '{}% CI'.format(round(level * 100, 2)) for level in levels]
+    for name in ['net_pl', 'max_drawdown']:
+      intervals = ['{} - {}'.format(*[round(v, 2) for v in self.confidence_interval(name, l)])
+                   for l in levels]
+      x.add_row([name, round(self.original[name], 2),
+                 round(float(np.median(getattr(self, name))), 2)] + intervals)
+    risk_of_ruin = self.get_risk_of_ruin()
+    if risk_of_ruin is not None:
+      x.add_row(['risk_of_ruin', self.original['ruined'], risk_of_ruin] + [''] * len(levels))
+    return x
+
+class MonteCarlo:
+  """
+  Monte Carlo resampling of the trades of a backtest, to see how much of its
+  result is down to the order the trades happened in. Every run is a new
+  sequence of the trades (see ResampleMethod) whose net P/L, max drawdown and
+  ruin are calculated with NumPy in blocks of runs, which are small enough to
+  stay in the cpu cache and are spread over a pool of threads (NumPy releases
+  the GIL). Each block has its own random generator spawned from the seed so
+  the results don't depend on the number of threads.
+
+  A run is ruined if its balance drops to starting_balance * (1 - ruin) or
+  below at any point.
+  """
+  Method = ResampleMethod()
+
+  def __init__(self, trades, resamples=10000, method=ResampleMethod.BOOTSTRAP, seed=None,
+      starting_balance=None, ruin=0.5, block_size=250000, max_workers=None):
+    """
+    @param trades: list of closed Positions or of trade net P/L values
+    @param resamples: number of runs
+    @param method: ResampleMethod
+    @param seed: optional int seed of the random generator
+    @param starting_balance: optional balance used to calculate the risk of ruin
+    @param ruin: fraction of the starting balance lost to be ruined
+    @param block_size: number of trades resampled at once by a thread
+    @param max_workers: number of threads, defaults to the cpu count
+    """
+    if len(trades) and isinstance(trades[0], Position):
+      trades = get_trade_profit_losses(trades)
+    self.trades = np.asarray(trades, dtype=np.float64)
+    self.resamples = resamples
+    self.method = method
+    self.seed = seed
+    self.starting_balance = starting_balance
+    self.ruin = ruin
+    self.block_size = block_size
+    self.max_workers = max_workers
+
+  def _get_ruin_level(self):
+    if self.starting_balance is None:
+      return None
+    return -self.starting_balance * self.ruin
+
+  def _evaluate(self, sequences):
+    """
+    @param sequences: 2d array of one trade sequence per row, overwritten
+      with the balance after each trade
+    @return tuple of net P/L, max drawdown and min balance arrays
+    """
+    equity = np.cumsum(sequences, axis=1, out=sequences)
+    peak = np.maximum.accumulate(equity, axis=1)
+    drawdown = np.subtract(peak, equity, out=peak).max(axis=1)
+    # the balance starts at zero which is also a peak
+    low = np.minimum(equity.min(axis=1), 0)
+    return equity[:, -1].copy(), np.maximum(drawdown, -low), low
+
+  def _resample(self, rng, rows):
+    n = len(self.trades)
+    if self.method == ResampleMethod.SHUFFLE:
+      return rng.permuted(np.tile(self.trades, (rows, 1)), axis=1)
+    return self.trades[rng.integers(0, n, size=(rows, n))]
+
+  def run(self):
+    """
+    @return MonteCarloResults
+    """
+    n = len(self.trades)
+    if n == 0:
+      raise ValueError("Expected at least one trade")
+    net_pl = np.empty(self.resamples)
+    max_drawdown = np.empty(self.resamples)
+    min_balance = np.empty(self.resamples)
+    rows = max(1, self.block_size // n)
+    blocks = [(start, min(start + rows, self.resamples))
+              for start in range(0, self.resamples, rows)]
+    seeds = np.random.SeedSequence(self.seed).spawn(len(blocks))
+
+    def run_block(block, seed):
+      start, stop = block
+      sequences = self._resample(np.random.default_rng(seed), stop - start)
+      net_pl[start:stop], max_drawdown[start:stop], min_balance[start:stop] = (
+        self._evaluate(sequences))
+
+    workers = self.max_workers or os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+      # list() so that an exception in a block is raised here
+      list(pool.map(run_block, blocks, seeds))
+    net, drawdown, low = self._evaluate(self.trades[np.newaxis, :].copy())
+    ruin_level = self._get_ruin_level()
+    original = {
+      'net_pl': float(net[0]),
+      'max_drawdown': float(drawdown[0]),
+      'ruined': None if ruin_level is None else bool(low[0] <= ruin_level),
+    }
+    ruined = None if ruin_level is None else min_balance <= ruin_level
+    return MonteCarloResults(net_pl, max_drawdown, ruined, original)
@@ -0,0 +1,182 @@
+import os
+import random
+import itertools
+import concurrent.futures
+
+from prettytable import PrettyTable
+
+from ..utils.custom_logger import CustomLogger
+from ..utils.executor import BacktestEngine
+from ..utils.backtest_result import BacktestStatistics
+from ..utils.backtest_worker import (METRICS, get_metrics, load_candles, init_worker,
+  run_backtest)
+
+def get_backtest_metrics(positions):
+  """
+  Summarise the closed positions of a backtest
+
+  @param positions: list of closed Positions in the order they were closed
+  @return dict containing every key of METRICS
+  """
+  statistics = BacktestStatistics()
+  for position in positions:
+    statistics.add_position(position)
+  return get_metrics(statistics)
+
+class SweepResults:
+  """
+  The metrics of every run of a ParameterSweep, one row (dict) per run
+  containing the run number, its parameters and its METRICS.
+  """
+
+  def __init__(self, parameter_names, rows=None, cancelled=False):
+    self.parameter_names = list(parameter_names)
+    self.rows = rows or []
+    self.cancelled = cancelled
+
+  def __len__(self):
+    return len(self.rows)
+
+  def __iter__(self):
+    return iter(self.rows)
+
+  def __getitem__(self, index):
+    return self.rows[index]
+
+  def sort(self, key='net_pl', reverse=True):
+    """
+    @param key: metric or parameter name to sort by
+    @param reverse: largest first
+    @return new SweepResults
+    """
+    rows = sorted(self.rows, key=lambda r: r[key], reverse=reverse)
+    return SweepResults(self.parameter_names, rows, self.cancelled)
+
+  def best(self, key='net_pl', reverse=True):
+    """
+    @return the row with the largest (or smallest if not reverse) key
+    """
+    if not self.rows:
+      return None
+    return self.sort(key, reverse).rows[0]
+
+  def to_table(self, limit=None):
+    """
+    @param limit: optional maximum number of rows
+    @return PrettyTable
+    """
+    x = PrettyTable()
+    x.field_names = ['Run'] + self.parameter_names + METRICS
+    for row in self.rows[:limit]:
+      metrics = [round(row[m], 4) if isinstance(row[m], float) else row[m]
+                 for m in METRICS]
+      x.add_row([row['run']] + [row[p] for p in self.parameter_names] + metrics)
+    return x
+
+class ParameterSweep:
+  """
+  Backtests a strategy over a grid of parameters. The candles are loaded once
+  and shared with a pool of worker processes (one per core by default) which
+  each build a fresh strategy per run by calling
+  strategy_factory(**params).
+
+  The factory must be picklable, i.e a function defined at the top level of
+  a module, and scripts should start the sweep from within an
+  `if __name__ == '__main__':` block.
+
+  Every run seeds `random` and `numpy.random` with seed + run number so a
+  sweep is reproducible. If samples is set then only that many runs, picked
+  from the grid using the seed, are backtested.
+  """
+
+  def __init__(self, strategy_factory, parameters, timeframe='1hr', max_workers=None,
+      seed=0, samples=None, engine=BacktestEngine.FAST, logLevel='INFO'):
+    """
+    @param strategy_factory: function returning a new Strategy for the given
+      keyword parameters
+    @param parameters: dict of parameter name -> list of values
+    @param timeframe: string timeframe of the candles i.e '1h'
+    @param max_workers: number of worker processes, defaults to the cpu count
+    @param seed: int seed of the runs
+    @param samples: optional number of runs to pick at random from the grid
+    @param engine: BacktestEngine used by the runs
+    """
+    self.strategy_factory = strategy_factory
+    self.parameters = parameters
+    self.timeframe = timeframe
+    self.max_workers = max_workers
+    self.seed = seed
+    self.samples = samples
+    self.engine = engine
+    self.logger = CustomLogger('HFParameterSweep', logLevel=logLevel)
+    self._cancelled = False
+
+  def get_runs(self):
+    """
+    @return list of the parameter dicts that will be backtested
+    """
+    names = list(self.parameters)
+    runs = [dict(zip(names, values)) for values in
+            itertools.product(*[self.parameters[n] for n in names])]
+    if self.samples is not None and self.samples < len(runs):
+      runs = random.Random(self.seed).sample(runs, self.samples)
+    return runs
+
+  def cancel(self):
+    """
+    Stop the sweep, runs which have not started yet are skipped and run()
+    returns the results collected so far. Can be called from on_progress
+    or from another thread.
+    """
+    self._cancelled = True
+
+  def run(self, file=None, candles=None, on_progress=None):
+    """
+    Run the sweep on either a json candle file or preloaded candles
+
+    @param file: path to the json or memory-mapped candle file
+    @param candles: list, NumPy array or CandleFile of
+      [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows sorted oldest first
+    @param on_progress: optional function(completed, total, row) called in
+      this process as each run completes
+    @return SweepResults sorted by run number
+    """
+    candles = load_candles(file, candles)
+    runs = self.get_runs()
+    names = list(self.parameters)
+    rows = []
+    self._cancelled = False
+    workers = max(1, min(self.max_workers or os.cpu_count() or 1, len(runs)))
+    self.logger.info("Backtesting {} runs on {} candles with {} workers".format(
+      len(runs), len(candles), workers))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(candles,)) as pool:
+      futures = {}
+      for n, params in enumerate(runs):
+        future = pool.submit(run_backtest, self.strategy_factory, params,
+          self.seed + n, self.timeframe, self.engine)
+        futures[future] = (n, params)
+      try:
+        for future in concurrent.futures.as_completed(futures):
+          n, params = futures[future]
+          try:
+            metrics = future.result()
+          except Exception as e:
+            self.logger.error("Run {} {} failed: {}".format(n, params, e))
+            continue
+          row = { 'run': n, **params, **metrics }
+          rows.append(row)
+          if on_progress:
+            on_progress(len(rows), len(runs), row)
+          if self._cancelled:
+            break
+      except KeyboardInterrupt:
+        self._cancelled = True
+      finally:
+        if self._cancelled:
+          self.logger.info("Sweep cancelled after {} of {} runs".format(
+            len(rows), len(runs)))
+          for future in futures:
+            future.cancel()
+    rows.sort(key=lambda r: r['run'])
+    return SweepResults(names, rows, cancelled=self._cancelled)
@@ -0,0 +1,195 @@
+import os
+import abc
+import csv
+import json
+import datetime
+import collections
+
+import numpy as np
+from prettytable import PrettyTable
+
+from ..models import Events
+
+# the fields of every logged fill, in order
+FIELDS = ('mts', 'symbol', 'amount', 'price', 'fee', 'pl', 'tag')
+# record of a BINARY trade log, longer symbols/tags are truncated
+RECORD = np.dtype([
+  ('mts', '<i8'),
+  ('symbol', 'S16'),
+  ('amount', '<f8'),
+  ('price', '<f8'),
+  ('fee', '<f8'),
+  ('pl', '<f8'),
+  ('tag', 'S32'),
+])
+
+class TradeLogFormat:
+  """ File formats of a trade log """
+  # comma separated values with a header row
+  CSV = 'CSV'
+  # one json object per line
+  JSONL = 'JSONL'
+  # fixed size RECORDs, read back with read_binary_trade_log()
+  BINARY = 'BINARY'
+
+class TradeSink(abc.ABC):
+  """
+  Receives every fill of a backtest as it happens. Subclasses implement
+  write() and, if they hold a file, close().
+  """
+
+  @abc.abstractmethod
+  def write(self, fill):
+    """
+    @param fill: tuple of the FIELDS of the fill
+    """
+
+  def close(self):
+    pass
+
+class CsvTradeSink(TradeSink):
+  def __init__(self, path, buffer_size=1 << 16):
+    self._file = open(path, 'w', newline='', buffering=buffer_size)
+    self._writer = csv.writer(self._file)
+    self._writer.writerow(FIELDS)
+
+  def write(self, fill):
+    self._writer.writerow(fill)
+
+  def close(self):
+    self._file.close()
+
+class JsonlTradeSink(TradeSink):
+  def __init__(self, path, buffer_size=1 << 16):
+    self._file = open(path, 'w', buffering=buffer_size)
+
+  def write(self, fill):
+    self._file.write(json.dumps(dict(zip(FIELDS, fill))) + '\n')
+
+  def close(self):
+    self._file.close()
+
+class BinaryTradeSink(TradeSink):
+  """
+  Collects fills into a NumPy array of RECORDs which is written to the file
+  each time it fills up
+  """
+
+  def __init__(self, path, buffer_size=4096):
+    self._file = open(path, 'wb')
+    self._buffer = np.zeros(buffer_size, dtype=RECORD)
+    self._count = 0
+
+  def write(self, fill):
+    mts, symbol, amount, price, fee, pl, tag = fill
+    self._buffer[self._count] = (mts, symbol.encode('utf-8')[:16], amount, price,
+      fee, pl, tag.encode('utf-8')[:32])
+    self._count += 1
+    if self._count == len(self._buffer):
+      self.flush()
+
+  def flush(self):
+    self._buffer[:self._count].tofile(self._file)
+    self._count = 0
+
+  def close(self):
+    self.flush()
+    self._file.close()
+
+def read_binary_trade_log(path):
+  """
+  @return NumPy array of RECORDs
+  """
+  return np.fromfile(path, dtype=RECORD)
+
+_EXTENSIONS = {
+  '.csv': TradeLogFormat.CSV,
+  '.jsonl': TradeLogFormat.JSONL,
+  '.bin': TradeLogFormat.BINARY,
+}
+
+_SINKS = {
+  TradeLogFormat.CSV: CsvTradeSink,
+  TradeLogFormat.JSONL: JsonlTradeSink,
+  TradeLogFormat.BINARY: BinaryTradeSink,
+}
+
+def create_trade_sink(path, format=None):
+  """
+  @param path: path of the trade log, replaced if it exists
+  @param format: TradeLogFormat, defaults to the format of the extension
+    (.csv, .jsonl or .bin)
+  @return TradeSink
+  """
+  if format is None:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _EXTENSIONS:
+      raise ValueError("Unknown trade log extension '{}', expected one of {}".format(
+        extension, ', '.join(_EXTENSIONS)))
+    format = _EXTENSIONS[extension]
+  return _SINKS[format](path)
+
+class TradeLog:
+  """
+  Listens to the order fills of a strategy and passes each one to the sinks
+  as it happens, keeping only the last summary_size fills in memory for the
+  console summary.
+  """
+
+  def __init__(self, strategy, sinks=None, summary_size=20):
+    """
+    @param strategy: Strategy
+    @param sinks: list of TradeSinks
+    @param summary_size: number of fills kept for to_table()
+    """
+    self.strategy = strategy
+    self.sinks = sinks or []
+    self.fills = 0
+    self._last = collections.deque(maxlen=summary_size or 0)
+
+  def _get_profit_loss(self, order):
+    position = self.strategy.get_position(order.symbol)
+    if position is None or order.id not in position.orders:
+      # the order closed the position
+      position = next((p for p in reversed(self.strategy.closedPositions)
+                       if order.id in p.orders), None)
+    if position is None:
+      return 0
+    return position.realised_profit_loss.get(order.id, 0)
+
+  def on_order_fill(self, order):
+    fill = (order.mts_create, order.symbol, order.amount_filled, order.price_avg,
+            order.fee, self._get_profit_loss(order), order.tag)
+    for sink in self.sinks:
+      sink.write(fill)
+    self._last.append(fill)
+    self.fills += 1
+
+  def attach(self):
+    self.strategy.on_order_fill(self.on_order_fill)
+    return self
+
+  def detach(self):
+    self.strategy.events.remove_listener(Events.ON_ORDER_FILL, self.on_order_fill)
+
+  def close(self):
+    for sink in self.sinks:
+      sink.close()
+
+  def get_last_fills(self):
+    """
+    @return list of the last summary_size fills, oldest first
+    """
+    return list(self._last)
+
+  def to_table(self):
+    """
+    @return PrettyTable of the last summary_size fills
+    """
+    x = PrettyTable()
+    x.field_names = ["Date", "Symbol", "Direction", "Amount", "Price", "Fee", "P&L", "Label"]
+    for mts, symbol, amount, price, fee, pl, tag in self._last:
+      direction = "SHORT" if amount < 0 else "LONG"
+      x.add_row([datetime.datetime.fromtimestamp(mts / 1000.0), symbol, direction,
+                 amount, round(price, 2), round(fee, 2), pl, tag])
+    return x
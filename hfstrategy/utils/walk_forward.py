@@ -0,0 +1,247 @@
+import os
+import concurrent.futures
+
+import numpy as np
+from prettytable import PrettyTable
+
+from ..utils.custom_logger import CustomLogger
+from ..utils.executor import BacktestEngine
+from ..utils.parameter_sweep import ParameterSweep
+from ..utils.backtest_worker import (METRICS, get_metrics, load_candles, init_worker,
+  backtest, run_backtest)
+
+def _get_close_mts(position):
+  return list(position.orders.values())[-1].mts_create
+
+def _run_out_of_sample(strategy_factory, params, seed, timeframe, engine, start, stop,
+    warmup):
+  result = backtest(
+    strategy_factory, params, seed, timeframe, engine, start, stop, warmup)
+  closes = [(_get_close_mts(p), p.get_profit_loss()['net']) for p in result.get_positions()]
+  return get_metrics(result.statistics), closes
+
+class WalkForwardResults:
+  """
+  The report of a WalkForward run: one row (dict) per window containing the
+  window number, the mts range of its in-sample and out-of-sample candles,
+  the parameters picked on the in-sample candles, the in-sample value of the
+  metric used to pick them and the out-of-sample METRICS.
+
+  equity_mts/equity hold the out-of-sample equity curve of every window
+  stitched together, i.e the cumulative net P/L after each out-of-sample
+  position was closed.
+
+  skipped_windows holds the numbers of the windows which have no row because
+  every in-sample run or the out-of-sample run failed.
+  """
+
+  def __init__(self, parameter_names, metric, rows, equity_mts, equity,
+      skipped_windows=None):
+    self.parameter_names = list(parameter_names)
+    self.metric = metric
+    self.rows = rows
+    self.equity_mts = equity_mts
+    self.equity = equity
+    self.skipped_windows = skipped_windows or []
+
+  def __len__(self):
+    return len(self.rows)
+
+  def __iter__(self):
+    return iter(self.rows)
+
+  def __getitem__(self, index):
+    return self.rows[index]
+
+  def get_net_profit_loss(self):
+    """
+    @return float total out-of-sample net P/L
+    """
+    return float(self.equity[-1]) if len(self.equity) else 0.0
+
+  def to_table(self):
+    """
+    @return PrettyTable
+    """
+    x = PrettyTable()
+    x.field_names = (['Window', 'In sample', 'Out of sample'] + self.parameter_names +
+      ['IS ' + self.metric] + METRICS)
+    for row in self.rows:
+      metrics = [round(row[m], 4) if isinstance(row[m], float) else row[m]
+                 for m in METRICS]
+      x.add_row([row['window'],
+        '{} - {}'.format(row['in_sample_start'], row['in_sample_end']),
+        '{} - {}'.format(row['out_of_sample_start'], row['out_of_sample_end'])] +
+        [row[p] for p in self.parameter_names] +
+        [round(row['in_sample_' + self.metric], 4)] + metrics)
+    return x
+
+class WalkForward:
+  """
+  Walk-forward optimization of a strategy. The candles are split into
+  windows of in_sample candles followed by out_of_sample candles, each window
+  starting step candles after the previous one. For every window the
+  parameter grid is backtested on the in-sample candles, then the parameters
+  with the best metric are backtested on the out-of-sample candles.
+
+  The in-sample runs of every window are independent so they all run in
+  parallel, followed by the out-of-sample run of every window, on the same
+  process pool as a ParameterSweep. The candles are loaded into the workers
+  once and every run backtests a view of them. Before an out-of-sample run
+  the warmup candles preceding it (the in-sample candles by default) are used
+  to seed the indicators.
+
+  Like a ParameterSweep, runs which raise are logged and left out. A window
+  without a successful in-sample run, or whose out-of-sample run failed, is
+  skipped and listed in WalkForwardResults.skipped_windows.
+  """
+
+  def __init__(self, strategy_factory, parameters, in_sample, out_of_sample, step=None,
+      timeframe='1hr', metric='net_pl', reverse=True, warmup=None, max_workers=None,
+      seed=0, engine=BacktestEngine.FAST, logLevel='INFO'):
+    """
+    @param strategy_factory: function returning a new Strategy for the given
+      keyword parameters, see ParameterSweep
+    @param parameters: dict of parameter name -> list of values
+    @param in_sample: number of candles to optimize on
+    @param out_of_sample: number of candles to evaluate the best parameters on
+    @param step: number of candles between windows, defaults to out_of_sample
+    @param timeframe: string timeframe of the candles i.e '1h'
+    @param metric: one of METRICS used to pick the best parameters
+    @param reverse: pick the largest metric, False to pick the smallest
+    @param warmup: number of candles used to seed the out-of-sample indicators,
+      defaults to in_sample
+    @param max_workers: number of worker processes, defaults to the cpu count
+    @param seed: int seed of the runs
+    @param engine: BacktestEngine used by the runs
+    """
+    if metric not in METRICS:
+      raise ValueError("Unknown metric '{}', expected one of {}".format(
+        metric, ', '.join(METRICS)))
+    if step and step < out_of_sample:
+      raise ValueError(
+        "Expected step >= out_of_sample, the out-of-sample windows would overlap")
+    self.strategy_factory = strategy_factory
+    self.parameters = parameters
+    self.in_sample = in_sample
+    self.out_of_sample = out_of_sample
+    self.step = step or out_of_sample
+    self.timeframe = timeframe
+    self.metric = metric
+    self.reverse = reverse
+    self.warmup = in_sample if warmup is None else warmup
+    self.max_workers = max_workers
+    self.seed = seed
+    self.engine = engine
+    self.logger = CustomLogger('HFWalkForward', logLevel=logLevel)
+
+  def get_windows(self, candle_count):
+    """
+    @return list of (in-sample start, out-of-sample start, out-of-sample stop)
+      candle indexes
+    """
+    windows = []
+    start = 0
+    while start + self.in_sample + self.out_of_sample <= candle_count:
+      windows += [(start, start + self.in_sample,
+                   start + self.in_sample + self.out_of_sample)]
+      start += self.step
+    return windows
+
+  def _is_better(self, value, best):
+    return value > best if self.reverse else value < best
+
+  def run(self, file=None, candles=None, on_progress=None):
+    """
+    @param file: path to the json or memory-mapped candle file
+    @param candles: list, NumPy array or CandleFile of
+      [MTS, OPEN, CLOSE, HIGH, LOW, VOLUME] rows sorted oldest first
+    @param on_progress: optional function(completed, total) called as each
+      run completes
+    @return WalkForwardResults
+    """
+    candles = load_candles(file, candles)
+    windows = self.get_windows(len(candles))
+    if not windows:
+      raise ValueError("Expected at least {} candles, got {}".format(
+        self.in_sample + self.out_of_sample, len(candles)))
+    runs = ParameterSweep(self.strategy_factory, self.parameters).get_runs()
+    total = len(windows) * (len(runs) + 1)
+    completed = 0
+    workers = max(1, min(self.max_workers or os.cpu_count() or 1, len(windows) * len(runs)))
+    self.logger.info("Walking forward {} windows of {} runs with {} workers".format(
+      len(windows), len(runs), workers))
+    best = [None] * len(windows)
+    oos = [None] * len(windows)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(candles,)) as pool:
+      futures = {}
+      for w, (start, oos_start, _) in enumerate(windows):
+        for n, params in enumerate(runs):
+          future = pool.submit(run_backtest, self.strategy_factory, params,
+            self.seed + n, self.timeframe, self.engine, start, oos_start)
+          futures[future] = (w, n)
+      for future in concurrent.futures.as_completed(futures):
+        w, n = futures[future]
+        completed += 1
+        try:
+          value = future.result()[self.metric]
+        except Exception as e:
+          self.logger.error("Window {} run {} {} failed: {}".format(w, n, runs[n], e))
+        else:
+          # ties go to the earliest run so the result doesn't depend on timing
+          if (best[w] is None or self._is_better(value, best[w][1]) or
+              (value == best[w][1] and n < best[w][0])):
+            best[w] = (n, value)
+        if on_progress:
+          on_progress(completed, total)
+      futures = {}
+      for w, (_, oos_start, stop) in enumerate(windows):
+        if best[w] is None:
+          self.logger.error("Window {} skipped, every in-sample run failed".format(w))
+          total -= 1
+          continue
+        future = pool.submit(_run_out_of_sample, self.strategy_factory,
+          runs[best[w][0]], self.seed + best[w][0], self.timeframe, self.engine,
+          oos_start, stop, self.warmup)
+        futures[future] = w
+      for future in concurrent.futures.as_completed(futures):
+        w = futures[future]
+        completed += 1
+        try:
+          oos[w] = future.result()
+        except Exception as e:
+          self.logger.error("Window {} skipped, out-of-sample run {} failed: {}".format(
+            w, runs[best[w][0]], e))
+        if on_progress:
+          on_progress(completed, total)
+    return self._create_results(candles, windows, runs, best, oos)
+
+  def _create_results(self, candles, windows, runs, best, oos):
+    rows = []
+    equity_mts = []
+    equity = []
+    skipped = []
+    balance = 0.0
+    for w, (start, oos_start, stop) in enumerate(windows):
+      if oos[w] is None:
+        skipped.append(w)
+        continue
+      metrics, closes = oos[w]
+      rows += [{
+        'window': w,
+        'in_sample_start': int(candles[start][0]),
+        'in_sample_end': int(candles[oos_start - 1][0]),
+        'out_of_sample_start': int(candles[oos_start][0]),
+        'out_of_sample_end': int(candles[stop - 1][0]),
+        **runs[best[w][0]],
+        'in_sample_' + self.metric: best[w][1],
+        **metrics,
+      }]
+      # each window starts where the previous one finished
+      for mts, net in closes:
+        balance += net
+        equity_mts += [mts]
+        equity += [balance]
+    return WalkForwardResults(self.parameters, self.metric, rows,
+      np.array(equity_mts, dtype=np.int64), np.array(equity, dtype=np.float64), skipped)
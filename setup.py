@@ -68,7 +68,7 @@ setup(
     # For an analysis of "install_requires" vs pip's requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=['eventemitter', 'asyncio', 'websockets', 'pylint', 'bitfinex-api-py', 'peewee', 'nest-asyncio',
-                      'pyee', 'aiohttp'],  # Optional
+                      'pyee', 'aiohttp', 'numpy>=1.20'],  # Optional
 
     project_urls={  # Optional
         'Bug Reports': 'https://github.com/bitfinexcom/bfx-hf-strategy-py/issues',